@@ -10,12 +10,27 @@
     >>> api = AliyunDriveApi()
     >>> api.upload_file("./test.txt")
 
+asyncio 用法 (需要安装 httpx):
+
+    >>> from aliyundrive import AsyncAliyunDriveApi
+    >>> async with AsyncAliyunDriveApi() as api:
+    ...     await api.upload_file("./test.txt")
+
 :copyright: (c) 2024 by __LittleQ__
 :license: MIT, see LICENSE for more details.
 """
 
 from .api import AliyunDriveApi
 
+
+def __getattr__(name):
+    # AsyncAliyunDriveApi 依赖可选的 httpx, 用到时才导入
+    if name == 'AsyncAliyunDriveApi':
+        from .aio import AsyncAliyunDriveApi
+        return AsyncAliyunDriveApi
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 __title__ = 'aliyundrive'
 __version__ = '0.1.0'
 __author__ = '__LittleQ__' 
\ No newline at end of file
@@ -0,0 +1,587 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+阿里云盘 API 的 asyncio 实现
+
+依赖 httpx, 需要通过 ``pip install aliyundrive-api[async]`` 安装。
+
+基本用法:
+
+    >>> from aliyundrive.aio import AsyncAliyunDriveApi
+    >>> async with AsyncAliyunDriveApi() as api:
+    ...     async for file in api.iter_files():
+    ...         print(file['name'])
+"""
+
+import asyncio
+import os
+import time
+from typing import Union
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    raise ImportError('AsyncAliyunDriveApi 依赖 httpx, 请运行: pip install aliyundrive-api[async]')
+
+from .api import AliyunDriveApi, MAX_LIST_PAGE_SIZE, READ_ONLY_APIS
+from .auth import AliyundriveAuth
+from .token import REFRESH_MARGIN, RETRY_INTERVAL
+from .download import (DOWNLOAD_HEADERS, DEFAULT_CHECKPOINT_SIZE, DEFAULT_SEGMENT_SIZE, DEFAULT_DOWNLOAD_WORKERS,
+                       MAX_SEGMENT_RETRIES, split_ranges)
+from .upload import DEFAULT_PART_SIZE, DEFAULT_UPLOAD_WORKERS, calc_part_size
+from .utils.config import Config
+from .utils.file import PositionalFile
+from .utils.hashing import HashCache, pre_hash_file, get_proof_code
+from .utils.journal import DownloadJournal
+from .utils.http import API_HEADERS, DEFAULT_POOL_SIZE
+from .utils.retry import API_READ_RETRY, API_WRITE_RETRY, TRANSFER_RETRY, AsyncAdaptiveLimiter, is_throttled
+
+# 上传时每次从文件读取的字节数
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def should_retry_error(policy, error):
+    """
+    RetryPolicy.should_retry_error 的 httpx 版本
+    :param policy: RetryPolicy
+    :param error: httpx.TransportError
+    :return: bool
+    """
+    if isinstance(error, httpx.ConnectTimeout):
+        return True
+    return policy.idempotent and isinstance(error, httpx.TransportError)
+
+
+class AsyncTokenManager:
+    """
+    TokenManager 的 asyncio 版本
+
+    同样在过期前主动刷新, 多个协程同时需要刷新时只发送一次刷新请求。
+    """
+
+    def __init__(self, api, access_token, refresh_token, expires_at=None, on_refresh=None):
+        """
+        :param api: AsyncAliyunDriveApi 实例, 使用其连接池和 token_api
+        :param access_token: 当前的 access token
+        :param refresh_token: 当前的 refresh token
+        :param expires_at: access token 的过期时间戳, 未知时第一次使用前会先刷新
+        :param on_refresh: 刷新成功后调用, 参数为 (access_token, refresh_token, expires_at), 用于保存到配置文件
+        """
+        self.api = api
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.expires_at = expires_at
+        self.on_refresh = on_refresh
+        self._lock = asyncio.Lock()
+        self._retry_at = 0
+
+    async def get_token(self):
+        """
+        获取可用的 access token, 即将过期时先刷新
+        :return: str
+        """
+        if self._expiring() and time.time() >= self._retry_at:
+            async with self._lock:
+                # 等待锁的期间其他协程可能已经刷新, 持有锁后重新检查
+                if self._expiring() and time.time() >= self._retry_at and not await self._request_token():
+                    self._retry_at = time.time() + RETRY_INTERVAL
+        return self.access_token
+
+    def _expiring(self):
+        """access token 是否即将过期"""
+        return self.expires_at is None or self.expires_at - REFRESH_MARGIN <= time.time()
+
+    async def refresh(self, expired_token=None):
+        """
+        刷新 access token
+        :param expired_token: 调用方认为已失效的 token, 若已被其他协程刷新则直接返回
+        :return: bool, 是否刷新成功
+        """
+        async with self._lock:
+            if expired_token is not None and expired_token != self.access_token:
+                return True
+            return await self._request_token()
+
+    async def _request_token(self):
+        """发送刷新请求并更新 token, 调用时需持有锁"""
+        try:
+            # 与同步版本一样按写接口的策略重试, 避免重复使用同一个 refresh token
+            res = await self.api._post_json(self.api.token_api, {"refresh_token": self.refresh_token},
+                                            API_HEADERS, API_WRITE_RETRY)
+        except (httpx.HTTPError, ValueError):
+            return False
+        if not res.get('access_token'):
+            return False
+        self.expires_at = time.time() + int(res.get('expires_in', 7200))
+        self.access_token = res['access_token']
+        self.refresh_token = res.get('refresh_token') or self.refresh_token
+        if self.on_refresh:
+            self.on_refresh(self.access_token, self.refresh_token, self.expires_at)
+        return True
+
+
+class AsyncAliyunDriveApi:
+    """
+    阿里云盘 API 的 asyncio 封装类, 接口与 AliyunDriveApi 对应
+
+    请求的重试策略与 AliyunDriveApi 相同, 并发由 AsyncAdaptiveLimiter 控制。
+    与 AliyunDriveApi 不同, 接口返回错误码时抛出 RuntimeError, 而不是返回错误响应。
+    """
+
+    base_api = AliyunDriveApi.base_api
+    token_api = AliyunDriveApi.token_api
+    build_search_query = staticmethod(AliyunDriveApi.build_search_query)
+    # 请求数据与同步客户端使用相同的生成方法
+    _list_request = AliyunDriveApi._list_request
+    _search_request = AliyunDriveApi._search_request
+    _create_file_request = AliyunDriveApi._create_file_request
+
+    def __init__(self, config_path='./config.ini', pool_size=DEFAULT_POOL_SIZE,
+                 part_size=DEFAULT_PART_SIZE, upload_workers=DEFAULT_UPLOAD_WORKERS,
+                 download_workers=DEFAULT_DOWNLOAD_WORKERS):
+        """
+        初始化 API 客户端, 使用前需要 ``async with`` 或调用 ``await api.init()``
+        :param config_path: 配置文件路径
+        :param pool_size: 最大连接数, 所有请求共享同一个连接池
+        :param part_size: 上传分片大小
+        :param upload_workers: 单个文件并发上传的分片数
+        :param download_workers: 单个文件并发下载的分段数
+        """
+        self.config = Config(config_path)
+        self.part_size = part_size
+        self.upload_workers = upload_workers
+        self.download_workers = download_workers
+        self.hash_cache = HashCache()
+        self.auth = AliyundriveAuth()
+        self.tokens = self.auth.get_config()
+        self.drive_id = self.tokens['default_drive_id']
+
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.client = httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(60.0))
+        self.api_limiter = AsyncAdaptiveLimiter(pool_size)
+        self.oss_limiter = AsyncAdaptiveLimiter(pool_size)
+
+        # 配置文件中记录的过期时间只对同一个 token 有效
+        expires_at = self.config.expires_at if self.config.access_token == self.tokens['access_token'] else None
+        self.token_manager = AsyncTokenManager(self, self.tokens['access_token'], self.tokens['refresh_token'],
+                                               expires_at=expires_at, on_refresh=self._save_tokens)
+
+    async def init(self):
+        """如果没有配置drive_id, 首先请求一下drive_id"""
+        if not self.drive_id:
+            await self.get_user_info()
+        return self
+
+    async def aclose(self):
+        """关闭连接池"""
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return await self.init()
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+    def _save_tokens(self, access_token, refresh_token, expires_at):
+        """将刷新后的 token 保存到配置文件"""
+        self.config.update_tokens(access_token, refresh_token, expires_at)
+        self.auth.update_tokens(access_token, refresh_token)
+
+    async def do_refresh_token(self, expired_token=None):
+        """
+        刷新 access token, 多个请求同时发现 token 失效时只刷新一次
+        :param expired_token: 失效的 access token
+        """
+        return await self.token_manager.refresh(expired_token)
+
+    async def _post_json(self, url, data, headers, policy):
+        """
+        发送 JSON 请求, 限流、服务端错误和超时时按策略退避重试, 与 HttpSession.post_json 对应
+        :param url: 请求地址
+        :param data: 请求数据
+        :param headers: 请求头
+        :param policy: RetryPolicy
+        :return: 响应的 JSON
+        """
+        limiter = self.api_limiter
+        for attempt in range(policy.max_retries + 1):
+            try:
+                async with limiter.slot():
+                    res = await self.client.post(url, headers=headers, json=data)
+            except httpx.TransportError as e:
+                if attempt >= policy.max_retries or not should_retry_error(policy, e):
+                    raise
+                if isinstance(e, httpx.TimeoutException):
+                    limiter.on_throttle()
+                await asyncio.sleep(policy.delay(attempt))
+                continue
+            if attempt < policy.max_retries and policy.should_retry(res):
+                if is_throttled(res):
+                    limiter.on_throttle()
+                await asyncio.sleep(policy.delay(attempt, res))
+                continue
+            if res.is_success:
+                limiter.on_success()
+            return res.json()
+
+    async def _post(self, uri, data, expected_codes=()):
+        """
+        调用 API 接口, access token 失效时自动刷新并重试
+        :param uri: 接口路径, 如 file/list
+        :param data: 请求数据
+        :param expected_codes: 作为正常结果返回的错误码, 如 PreHashMatched
+        :return: dict
+        """
+        token = await self.token_manager.get_token()
+        headers = dict(API_HEADERS, authorization=token)
+        policy = API_READ_RETRY if uri in READ_ONLY_APIS else API_WRITE_RETRY
+        res = await self._post_json(self.base_api + uri, data, headers, policy)
+        code = res.get('code')
+        if code == 'AccessTokenInvalid':
+            # 多个协程同时收到 AccessTokenInvalid 时只有一个会发送刷新请求
+            if await self.do_refresh_token(token):
+                return await self._post(uri, data, expected_codes)
+            raise RuntimeError('Refresh Token Failed!')
+        if code and code not in expected_codes:
+            raise RuntimeError(f"{uri} 失败: {res.get('message') or code}")
+        return res
+
+    async def get_user_info(self):
+        """获取用户信息"""
+        res = await self._post('user/get', {})
+        self.drive_id = res.get('default_drive_id')
+        self.config.update_drive_id(self.drive_id)
+        return res
+
+    async def iter_files(self, parent_file_id='root', page_size=MAX_LIST_PAGE_SIZE, fields='*'):
+        """
+        逐页获取文件列表
+        :param parent_file_id: 父文件夹ID，默认为root
+        :param page_size: 每页数量
+        :param fields: 返回的字段
+        :return: 文件信息的异步生成器
+        """
+        marker = None
+        while True:
+            res = await self._post('file/list', self._list_request(parent_file_id, page_size, fields, marker))
+            for item in res.get('items', []):
+                yield item
+            marker = res.get('next_marker')
+            if not marker:
+                return
+
+    async def list_files(self, parent_file_id='root'):
+        """
+        获取文件列表
+        :param parent_file_id: 父文件夹ID，默认为root
+        :return: 文件列表
+        """
+        return [item async for item in self.iter_files(parent_file_id)]
+
+    async def iter_search(self, query, limit=100, order_by='updated_at', order_direction='DESC'):
+        """
+        按 query 表达式搜索整个云盘, 逐页获取
+        :return: 文件信息的异步生成器
+        """
+        marker = None
+        while True:
+            res = await self._post('file/search', self._search_request(query, limit, order_by, order_direction, marker))
+            for item in res.get('items', []):
+                yield item
+            marker = res.get('next_marker')
+            if not marker:
+                return
+
+    def search_file(self, name, **filters):
+        """
+        搜索文件
+        :param name: 文件名
+        :param filters: 其他过滤条件, 见 AliyunDriveApi.build_search_query
+        :return: 文件信息的异步生成器
+        """
+        return self.iter_search(self.build_search_query(name, **filters))
+
+    async def get_file_by_path(self, path: str):
+        """
+        通过路径获取文件信息, 文件名不区分大小写
+        :param path: 文件路径，格式：folder1/folder2/file.txt
+        :return: 文件信息或 None
+        """
+        parts = [part for part in path.strip('/').split('/') if part]
+        if not parts:
+            return None
+        current_id = 'root'
+        for i, part in enumerate(parts):
+            found = None
+            async for file in self.iter_files(current_id):
+                if file['name'].lower() == part.lower():
+                    found = file
+                    break
+            if found is None or (i < len(parts) - 1 and found['type'] != 'folder'):
+                return None
+            current_id = found['file_id']
+        return found
+
+    async def create_folder(self, name, parent_file_id="root"):
+        """
+        创建文件夹
+        :param name: 文件夹名称
+        :param parent_file_id: 父文件夹的ID, 默认为root
+        :return: dict
+        """
+        data = {
+            "drive_id": self.drive_id,
+            "parent_file_id": parent_file_id,
+            "name": name,
+            "check_name_mode": "refuse",
+            "type": "folder"
+        }
+        return await self._post('file/create', data)
+
+    async def _get_parent_file_id(self, parent: str) -> str:
+        """获取父文件夹ID, 不存在的文件夹会被创建"""
+        parent_file_id = 'root'
+        for name in [part for part in parent.strip('/').split('/') if part]:
+            res = await self.create_folder(name, parent_file_id)
+            if not res.get('file_id'):
+                raise RuntimeError(f"创建文件夹失败: {name}: {res.get('message') or res.get('code')}")
+            parent_file_id = res['file_id']
+        return parent_file_id
+
+    async def get_upload_url(self, file_id, upload_id, part_numbers):
+        """重新获取分片上传地址"""
+        data = {
+            "drive_id": self.drive_id,
+            "file_id": file_id,
+            "upload_id": upload_id,
+            "part_info_list": [{"part_number": i} for i in part_numbers],
+        }
+        return (await self._post('file/get_upload_url', data))['part_info_list']
+
+    async def on_complete(self, file_id, upload_id):
+        """完成文件上传"""
+        data = {
+            "drive_id": self.drive_id,
+            "file_id": file_id,
+            "upload_id": upload_id,
+        }
+        return await self._post('file/complete', data)
+
+    async def _create_file(self, filepath, parent_file_id, check_name_mode='auto_rename'):
+        """先提交 pre_hash, 服务端可能存在相同文件时再计算完整 SHA1 尝试秒传"""
+        loop = asyncio.get_running_loop()
+        name = os.path.basename(filepath)
+        size = os.path.getsize(filepath)
+        content_hash = await loop.run_in_executor(None, self.hash_cache.get, filepath)
+        if content_hash is None:
+            pre_hash = await loop.run_in_executor(None, pre_hash_file, filepath)
+            data = self._create_file_request(parent_file_id, name, size, pre_hash=pre_hash,
+                                             check_name_mode=check_name_mode)
+            res = await self._post('file/create', data, expected_codes=('PreHashMatched',))
+            if res.get('code') != 'PreHashMatched':
+                return res
+            content_hash = await loop.run_in_executor(None, self.hash_cache.sha1, filepath)
+        token = await self.token_manager.get_token()
+        proof_code = await loop.run_in_executor(None, get_proof_code, filepath, size, token)
+        return await self._post('file/create', self._create_file_request(
+            parent_file_id, name, size, content_hash=content_hash, proof_code=proof_code,
+            check_name_mode=check_name_mode
+        ))
+
+    async def upload_file(self, filepath, parent: Union[None, str] = None, check_name_mode='auto_rename'):
+        """
+        上传文件, 分片并发上传
+        :param filepath: 文件路径
+        :param parent: 父文件夹路径，格式：xxx/xxx/xxx
+        :param check_name_mode: 同名文件的处理方式: auto_rename 自动重命名, overwrite 覆盖, refuse 不创建
+        :return: file/complete 的结果, 秒传时返回 True
+        """
+        parent_file_id = await self._get_parent_file_id(parent) if parent else 'root'
+        create_res = await self._create_file(filepath, parent_file_id, check_name_mode)
+        if create_res.get('rapid_upload'):
+            return True
+
+        file_id = create_res['file_id']
+        upload_id = create_res['upload_id']
+        size = os.path.getsize(filepath)
+        part_size = calc_part_size(size, self.part_size)
+        semaphore = asyncio.Semaphore(self.upload_workers)
+
+        async def upload_part(part):
+            async with semaphore:
+                await self._upload_part(filepath, file_id, upload_id, part, part_size, size)
+
+        await asyncio.gather(*(upload_part(part) for part in create_res['part_info_list']))
+        return await self.on_complete(file_id, upload_id)
+
+    async def _upload_part(self, filepath, file_id, upload_id, part, part_size, file_size):
+        """
+        上传单个分片
+
+        上传地址过期时刷新地址, 限流、服务端错误和网络错误时按 TRANSFER_RETRY 退避重试。
+        """
+        offset = (part['part_number'] - 1) * part_size
+        length = min(part_size, file_size - offset)
+        upload_url = part['upload_url']
+        limiter = self.oss_limiter
+        for attempt in range(TRANSFER_RETRY.max_retries + 1):
+            retry = attempt < TRANSFER_RETRY.max_retries
+            try:
+                async with limiter.slot():
+                    res = await self.client.put(upload_url, content=self._aiter_file(filepath, offset, length),
+                                                headers={'Content-Length': str(length)})
+            except httpx.TransportError as e:
+                if not retry or not should_retry_error(TRANSFER_RETRY, e):
+                    raise
+                if isinstance(e, httpx.TimeoutException):
+                    limiter.on_throttle()
+                await asyncio.sleep(TRANSFER_RETRY.delay(attempt))
+                continue
+            # 409 表示分片已经上传过
+            if res.is_success or res.status_code == 409:
+                limiter.on_success()
+                return
+            if retry and res.status_code == 403:
+                upload_url = (await self.get_upload_url(file_id, upload_id, [part['part_number']]))[0]['upload_url']
+            elif retry and TRANSFER_RETRY.should_retry(res):
+                if is_throttled(res):
+                    limiter.on_throttle()
+                await asyncio.sleep(TRANSFER_RETRY.delay(attempt, res))
+            else:
+                res.raise_for_status()
+        raise IOError(f"分片 {part['part_number']} 上传失败")
+
+    @staticmethod
+    async def _aiter_file(filepath, offset, length, buffer_size=READ_CHUNK_SIZE):
+        """
+        在线程池中读取文件, 避免阻塞事件循环
+
+        用 readinto 把数据读入同一个缓冲区, 逐块返回其 memoryview, 不会为每一块创建新的 bytes 对象。
+        返回的 memoryview 在下一次迭代时会被覆盖, httpx 在取下一块之前会发送完当前块。
+        """
+        loop = asyncio.get_running_loop()
+        view = memoryview(bytearray(min(buffer_size, length)))
+        with open(filepath, 'rb', buffering=0) as f:
+            await loop.run_in_executor(None, f.seek, offset)
+            while length > 0:
+                n = await loop.run_in_executor(None, f.readinto, view[:min(len(view), length)])
+                if not n:
+                    raise IOError(f'文件长度不足, 还差 {length} 字节')
+                length -= n
+                yield view[:n]
+
+    async def get_download_url(self, file_id):
+        """获取文件下载地址"""
+        return await self._post('file/get_download_url', {"drive_id": self.drive_id, "file_id": file_id})
+
+    async def download_file(self, file_id: str, save_path: str = None):
+        """
+        下载文件, 分段并发下载, 支持断点续传
+        :param file_id: 文件ID
+        :param save_path: 保存路径，默认为当前目录
+        :return: 本地文件路径
+        """
+        file_info = await self._post('file/get', {"drive_id": self.drive_id, "file_id": file_id})
+        if file_info.get('type') == 'folder':
+            raise ValueError('不能下载文件夹！')
+        url = (await self.get_download_url(file_id))['url']
+
+        save_path = save_path or os.getcwd()
+        os.makedirs(save_path, exist_ok=True)
+        save_file_path = os.path.join(save_path, file_info.get('name', file_id))
+        part_path = save_file_path + '.part'
+        size = file_info['size']
+        content_hash = file_info.get('content_hash')
+        journal = DownloadJournal.load(part_path + '.json', file_id, size, content_hash)
+        if not os.path.exists(part_path):
+            journal.ranges = []
+
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.download_workers)
+        state = {'url': url}
+
+        async def fetch(start, end):
+            async with semaphore:
+                await self._download_segment(file_id, file, start, end, journal, state)
+
+        with PositionalFile(part_path, size) as file:
+            segments = [(start + s, start + e) for start, end in journal.missing_ranges()
+                        for s, e in split_ranges(end - start, DEFAULT_SEGMENT_SIZE)]
+            await asyncio.gather(*(fetch(start, end) for start, end in segments))
+
+        if content_hash:
+            sha1 = await loop.run_in_executor(None, AliyunDriveApi.get_sha1_hash, part_path)
+            if sha1.upper() != content_hash.upper():
+                os.remove(part_path)
+                journal.remove()
+                raise IOError(f'文件校验失败: {save_file_path}')
+        os.replace(part_path, save_file_path)
+        journal.remove()
+        return save_file_path
+
+    async def _download_segment(self, file_id, file, start, end, journal, state):
+        """
+        下载 [start, end) 区间, 已写入的部分定期记录到 journal
+
+        下载地址过期时重新获取, 限流、服务端错误和网络错误时按 TRANSFER_RETRY 退避重试,
+        重试从已写入的位置继续。
+        """
+        loop = asyncio.get_running_loop()
+        limiter = self.oss_limiter
+        offset = start
+        try:
+            for attempt in range(MAX_SEGMENT_RETRIES + 1):
+                url = state['url']
+                headers = dict(DOWNLOAD_HEADERS, Range=f'bytes={offset}-{end - 1}')
+                retry = attempt < MAX_SEGMENT_RETRIES
+                failed = None
+                try:
+                    async with limiter.slot(), self.client.stream('GET', url, headers=headers) as res:
+                        if retry and (res.status_code == 403 or TRANSFER_RETRY.should_retry(res)):
+                            failed = res
+                        else:
+                            res.raise_for_status()
+                            if res.status_code != 206 and offset != 0:
+                                raise IOError('下载服务器不支持 Range 请求')
+                            checkpoint = offset
+                            async for chunk in res.aiter_bytes(READ_CHUNK_SIZE):
+                                await loop.run_in_executor(None, file.write_at, chunk, offset)
+                                offset += len(chunk)
+                                if offset - checkpoint >= DEFAULT_CHECKPOINT_SIZE:
+                                    journal.add_range(start, offset)
+                                    checkpoint = offset
+                except httpx.TransportError as e:
+                    if not retry or not should_retry_error(TRANSFER_RETRY, e):
+                        raise
+                    if isinstance(e, httpx.TimeoutException):
+                        limiter.on_throttle()
+                    await asyncio.sleep(TRANSFER_RETRY.delay(attempt))
+                    continue
+                # 刷新地址和等待都在释放并发名额之后进行
+                if failed is None:
+                    limiter.on_success()
+                elif failed.status_code == 403:
+                    if state['url'] == url:
+                        state['url'] = (await self.get_download_url(file_id))['url']
+                else:
+                    if is_throttled(failed):
+                        limiter.on_throttle()
+                    await asyncio.sleep(TRANSFER_RETRY.delay(attempt, failed))
+                if offset >= end:
+                    return
+            raise IOError(f'下载区间 {start}-{end - 1} 失败')
+        finally:
+            journal.add_range(start, offset)
+
+    async def download_by_path(self, path: str, save_path: str = None):
+        """
+        通过路径下载文件
+        :param path: 文件路径，格式：folder1/folder2/file.txt
+        :param save_path: 保存路径，默认为当前目录
+        :return: 本地文件路径, 未找到文件时返回 None
+        """
+        file_info = await self.get_file_by_path(path)
+        if not file_info:
+            return None
+        return await self.download_file(file_info['file_id'], save_path)
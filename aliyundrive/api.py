@@ -6,146 +6,263 @@
 """
 
 import os
-import hashlib
+import time
 from typing import Union, List
-import requests
-from tqdm import tqdm
 
 from .utils.config import Config
-from .utils.file import ChunksIter
+from .utils.http import HttpSession, API_HEADERS, DEFAULT_POOL_SIZE
+from .utils.retry import API_READ_RETRY, API_WRITE_RETRY
+from .utils.metrics import Metrics
+from .utils.journal import UploadJournal
+from .utils.hashing import HashCache, sha1_file, pre_hash_file, get_proof_code
+from .upload import (MultipartUploader, FolderUploader, UploadResult, make_part_info_list,
+                     DEFAULT_PART_SIZE, DEFAULT_UPLOAD_WORKERS, DEFAULT_FOLDER_WORKERS)
+from .download import RangedDownloader, DEFAULT_DOWNLOAD_WORKERS
+from .resolver import RemotePathResolver
+from .index import DriveIndex
+from .walk import TreeWalker, DEFAULT_WALK_WORKERS
+from .batch import Batcher
+from .sync import DriveSync
+from .cache import FileCache
 from .auth import AliyundriveAuth
+from .token import TokenManager
+
+# file/list 每页最多返回 200 条
+MAX_LIST_PAGE_SIZE = 200
+# 只读接口, 超时和服务端错误时可以安全重试
+READ_ONLY_APIS = {
+    'user/get', 'file/list', 'file/search', 'file/get', 'file/get_download_url',
+    'file/get_upload_url', 'file/list_uploaded_parts',
+}
+
 
 class AliyunDriveApi:
     """阿里云盘 API 封装类"""
     
     base_api = 'https://api.aliyundrive.com/v2/'
+    token_api = 'https://websv.aliyundrive.com/token/refresh'
 
-    def __init__(self, config_path='./config.ini'):
+    def __init__(self, config_path='./config.ini', pool_size=DEFAULT_POOL_SIZE,
+                 part_size=DEFAULT_PART_SIZE, upload_workers=DEFAULT_UPLOAD_WORKERS,
+                 download_workers=DEFAULT_DOWNLOAD_WORKERS, use_index=False):
         """
         初始化 API 客户端
         :param config_path: 配置文件路径
+        :param pool_size: 每个域名的最大连接数
+        :param part_size: 上传分片大小
+        :param upload_workers: 单个文件并发上传的分片数
+        :param download_workers: 单个文件并发下载的分段数
+        :param use_index: 是否使用本地索引加速路径查找、列表和搜索
         """
         self.config = Config(config_path)
+        self.metrics = Metrics()
+        self.http = HttpSession(max(pool_size, upload_workers, download_workers), metrics=self.metrics)
+        self.part_size = part_size
+        self.upload_workers = upload_workers
+        self.download_workers = download_workers
+        self.upload_journal = UploadJournal()
+        self.hash_cache = HashCache()
+        self.file_cache = FileCache()
         self.auth = AliyundriveAuth()
         self.tokens = self.auth.get_config()
-        self.access_token = self.tokens['access_token']
-        self.refresh_token = self.tokens['refresh_token']
         self.drive_id = self.tokens['default_drive_id']
 
-        self.headers = {
-            "accept": "application/json, text/plain, */*",
-            "authorization": self.access_token,
-            "content-type": "application/json;charset=UTF-8",
-            "origin": "https://www.aliyundrive.com",
-            "referer": "https://www.aliyundrive.com/",
-            "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4389.128 Safari/537.36"
-        }
+        # 配置文件中记录的过期时间只对同一个 token 有效
+        expires_at = self.config.expires_at if self.config.access_token == self.tokens['access_token'] else None
+        self.token_manager = TokenManager(self, self.tokens['access_token'], self.tokens['refresh_token'],
+                                          expires_at=expires_at, on_refresh=self._save_tokens)
 
         # 如果没有配置drive_id, 首先请求一下drive_id
         if not self.drive_id:
             self.get_user_info()
 
-        self.root = []
+        self.resolver = RemotePathResolver(self)
+        self.index = DriveIndex(self.drive_id) if use_index else None
+
+    @property
+    def access_token(self):
+        """当前的 access token, 即将过期时会先刷新"""
+        return self.token_manager.get_token()
+
+    def _save_tokens(self, access_token, refresh_token, expires_at):
+        """将刷新后的 token 保存到配置文件"""
+        self.config.update_tokens(access_token, refresh_token, expires_at)
+        self.auth.update_tokens(access_token, refresh_token)
 
     def do_refresh_token(self):
         """刷新 access token"""
-        data = {
-            "refresh_token": self.refresh_token
-        }
-        res = requests.post("https://websv.aliyundrive.com/token/refresh", headers={
-            "content-type": "application/json;charset=UTF-8",
-            "origin": "https://www.aliyundrive.com",
-            "referer": "https://www.aliyundrive.com/",
-            "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4389.128 Safari/537.36"
-        }, json=data).json()
-
-        self.access_token = res.get('access_token')
-        self.headers['authorization'] = self.access_token
-        self.config.update_access_token(self.access_token)
-        return True
+        return self.token_manager.refresh()
 
-    def get_user_info(self):
-        """获取用户信息"""
-        res = requests.post(self.base_api + 'user/get', headers=self.headers, json={}).json()
+    def _post(self, uri, data):
+        """
+        调用 API 接口, access token 失效时自动刷新并重试
+        :param uri: 接口路径, 如 file/list
+        :param data: 请求数据
+        :return: dict
+        """
+        token = self.access_token
+        headers = dict(API_HEADERS, authorization=token)
+        policy = API_READ_RETRY if uri in READ_ONLY_APIS else API_WRITE_RETRY
+        res = self.http.post_json(self.base_api + uri, data, headers=headers, policy=policy, endpoint=uri)
         if res.get('code') == 'AccessTokenInvalid':
-            if self.do_refresh_token():
-                return self.get_user_info()
+            # 多个线程同时收到 AccessTokenInvalid 时只有一个会发送刷新请求
+            if self.token_manager.refresh(token):
+                return self._post(uri, data)
             else:
                 print('Refresh Token Failed!')
                 exit(-1)
+        return res
+
+    def get_user_info(self):
+        """获取用户信息"""
+        res = self._post('user/get', {})
         self.drive_id = res.get('default_drive_id')
         self.config.update_drive_id(self.drive_id)
         return res
 
     def list_files(self, parent_file_id='root', next_marker=None):
         """
-        获取文件列表
+        获取文件列表, 启用本地索引时优先从索引读取
         :param parent_file_id: 父文件夹ID，默认为root
-        :param next_marker: 分页标记
+        :param next_marker: 分页标记, 提供时从该位置开始获取
         :return: 文件列表
         """
+        if next_marker:
+            return list(self._iter_remote_files(parent_file_id, marker=next_marker))
+        return list(self.iter_files(parent_file_id))
+
+    def iter_files(self, parent_file_id='root', page_size=MAX_LIST_PAGE_SIZE, fields='*'):
+        """
+        逐页获取文件列表, 每获取一页就返回该页的文件
+        :param parent_file_id: 父文件夹ID，默认为root
+        :param page_size: 每页数量
+        :param fields: 返回的字段, 默认为全部
+        :return: 文件信息的生成器
+        """
+        if self.index is not None:
+            items = self.index.children(parent_file_id)
+            if items is not None:
+                yield from items
+                return
+
+        # 完整遍历后顺便写入索引, 获取出错或调用方提前停止时不写入
+        collected = [] if self.index is not None and fields == '*' else None
+        for item in self._iter_remote_files(parent_file_id, page_size, fields):
+            if collected is not None:
+                collected.append(item)
+            yield item
+        if collected is not None:
+            self.index.replace_children(parent_file_id, collected)
+
+    def _iter_remote_files(self, parent_file_id, page_size=MAX_LIST_PAGE_SIZE, fields='*', marker=None):
+        """从云盘逐页获取文件列表"""
+        while True:
+            res = self._post('file/list', self._list_request(parent_file_id, page_size, fields, marker))
+            # 出错时不能当作列表已结束, 否则调用方会把不完整的结果当作完整的文件夹内容
+            if res.get('code'):
+                raise RuntimeError(f"获取文件列表失败: {parent_file_id}: {res.get('message') or res['code']}")
+            yield from res.get('items', [])
+
+            marker = res.get('next_marker')
+            if not marker:
+                return
+
+    def _list_request(self, parent_file_id, page_size=MAX_LIST_PAGE_SIZE, fields='*', marker=None):
+        """生成 file/list 的请求数据, 同步和异步客户端共用"""
         data = {
             "drive_id": self.drive_id,
             "parent_file_id": parent_file_id,
-            "limit": 100,
+            "limit": page_size,
             "all": False,
-            "fields": "*",
+            "fields": fields,
             "order_by": "name",
             "order_direction": "ASC"
         }
-        if next_marker:
-            data["marker"] = next_marker
-
-        res = requests.post(self.base_api + 'file/list', headers=self.headers, json=data).json()
-        if res.get('code') == 'AccessTokenInvalid':
-            if self.do_refresh_token():
-                return self.list_files(parent_file_id, next_marker)
-            else:
-                print('Refresh Token Failed!')
-                exit(-1)
-
-        items = res.get('items', [])
-        next_marker = res.get('next_marker', None)
-
-        # 如果还有更多文件，继续获取
-        if next_marker:
-            items.extend(self.list_files(parent_file_id, next_marker))
+        if marker:
+            data["marker"] = marker
+        return data
 
-        return items
+    def _fetch_files(self, parent_file_id):
+        """从云盘获取完整的文件列表"""
+        return list(self._iter_remote_files(parent_file_id))
 
-    def search_file(self, name):
+    @staticmethod
+    def build_search_query(name=None, file_type=None, min_size=None, max_size=None,
+                           updated_after=None, updated_before=None, extension=None):
         """
-        搜索文件
-        :param name: 文件名
-        :return: 文件列表
+        生成 file/search 的 query 表达式
+        :param name: 文件名中包含的关键字
+        :param file_type: file 或 folder
+        :param min_size: 最小文件大小(字节)
+        :param max_size: 最大文件大小(字节)
+        :param updated_after: 更新时间下限, 如 2024-01-01T00:00:00
+        :param updated_before: 更新时间上限
+        :param extension: 文件扩展名, 如 mp4
+        :return: str
         """
+        def quote(value):
+            return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+        conditions = []
+        if name:
+            conditions.append(f'name match {quote(name)}')
+        if file_type:
+            conditions.append(f'type = {quote(file_type)}')
+        if min_size is not None:
+            conditions.append(f'size >= {int(min_size)}')
+        if max_size is not None:
+            conditions.append(f'size <= {int(max_size)}')
+        if updated_after:
+            conditions.append(f'updated_at >= {quote(updated_after)}')
+        if updated_before:
+            conditions.append(f'updated_at <= {quote(updated_before)}')
+        if extension:
+            conditions.append(f'file_extension = {quote(extension.lstrip("."))}')
+        return ' and '.join(conditions)
+
+    def iter_search(self, query, limit=100, order_by='updated_at', order_direction='DESC'):
+        """
+        按 query 表达式搜索整个云盘, 逐页获取
+        :param query: 搜索表达式, 可用 build_search_query 生成
+        :param limit: 每页数量, 最大 100
+        :param order_by: 排序字段
+        :param order_direction: ASC 或 DESC
+        :return: 文件信息的生成器
+        """
+        marker = None
+        while True:
+            res = self._post('file/search', self._search_request(query, limit, order_by, order_direction, marker))
+            if res.get('code'):
+                raise RuntimeError(f"搜索失败: {query}: {res.get('message') or res['code']}")
+            yield from res.get('items', [])
+            marker = res.get('next_marker')
+            if not marker:
+                return
+
+    def _search_request(self, query, limit=100, order_by='updated_at', order_direction='DESC', marker=None):
+        """生成 file/search 的请求数据, 同步和异步客户端共用"""
         data = {
             "drive_id": self.drive_id,
-            "limit": 100,
-            "type": "all",  # 搜索所有类型
-            "query": f"name match \"{name}\"",
-            "return_total_count": True,
+            "limit": limit,
+            "query": query,
             "fields": "*",
-            "order_by": "updated_at",
-            "order_direction": "DESC"
+            "order_by": f"{order_by} {order_direction}",
         }
+        if marker:
+            data["marker"] = marker
+        return data
 
-        # 先获取根目录文件列表
-        root_files = self.list_files()
-        results = []
-
-        # 在根目录中搜索
-        for file in root_files:
-            if name.lower() in file['name'].lower():
-                results.append(file)
-            # 如果是文件夹，��归搜索
-            if file['type'] == 'folder':
-                folder_files = self.list_files(file['file_id'])
-                for sub_file in folder_files:
-                    if name.lower() in sub_file['name'].lower():
-                        results.append(sub_file)
-
-        return results
+    def search_file(self, name, **filters):
+        """
+        搜索文件, 结果逐页返回
+        :param name: 文件名
+        :param filters: 其他过滤条件, 见 build_search_query
+        :return: 文件信息的生成器
+        """
+        # 索引已完整建立时直接在索引中搜索
+        if self.index is not None and self.index.built_at and not filters:
+            return iter(self.index.search(name))
+        return self.iter_search(self.build_search_query(name, **filters))
 
     def print_file_info(self, file_info, index=None, show_path=False):
         """
@@ -179,27 +296,16 @@ class AliyunDriveApi:
         :return: bool
         """
         # 获取文件信息
-        data = {
-            "drive_id": self.drive_id,
-            "file_id": file_id
-        }
-        file_info = requests.post(self.base_api + 'file/get', headers=self.headers, json=data).json()
-        
-        if file_info.get('code') == 'AccessTokenInvalid':
-            if self.do_refresh_token():
-                return self.download_file(file_id, save_path)
-            else:
-                print('Refresh Token Failed!')
-                exit(-1)
+        file_info = self.get_file(file_id)
 
-        # 如果是文件夹，不能下载
+        # 文件夹下载其中的所有文件
         if file_info.get('type') == 'folder':
-            print('不能下载文件夹！')
-            return False
+            results = self.download_folder(file_info, save_path)
+            return all(result.success for result in results)
 
         # 获取下载地址
-        res = requests.post(self.base_api + 'file/get_download_url', headers=self.headers, json=data).json()
-        
+        res = self.get_download_url(file_id)
+
         if not res.get('url'):
             print('获取下载地址失败！')
             return False
@@ -214,60 +320,72 @@ class AliyunDriveApi:
         save_file_path = os.path.join(save_path, file_name)
 
         # 开始下载
-        headers = {
-            'Referer': 'https://www.aliyundrive.com/',
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4389.128 Safari/537.36'
-        }
-        response = requests.get(res['url'], stream=True, headers=headers)
-        total_size = int(response.headers.get('content-length', 0))
-
-        with open(save_file_path, 'wb') as file, tqdm(
-            desc=f'Downloading {file_name}',
-            total=total_size,
-            unit='iB',
-            unit_scale=True,
-            unit_divisor=1024,
-        ) as progress_bar:
-            for data in response.iter_content(chunk_size=1024):
-                size = file.write(data)
-                progress_bar.update(size)
+        downloader = RangedDownloader(self, self.download_workers)
+        downloader.download(file_id, file_info['size'], save_file_path, url=res['url'],
+                            content_hash=file_info.get('content_hash'))
 
         print(f'文件已下载到: {save_file_path}')
         return True
 
+    def download_folder(self, folder_info, save_path=None, max_workers=DEFAULT_FOLDER_WORKERS):
+        """
+        并发下载文件夹, 在本地重建目录结构, 大小和 SHA1 都相同的本地文件会被跳过
+        :param folder_info: 文件夹信息, 如 get_file_by_path 的结果
+        :param save_path: 保存路径，默认为当前目录, 文件夹保存为其中的同名子目录
+        :param max_workers: 同时下载的文件数
+        :return: [SyncResult, ...]
+        """
+        local_root = os.path.join(save_path or os.getcwd(), folder_info['name'])
+        syncer = DriveSync(self, max_workers)
+        plan = syncer.plan_pull(None, local_root, folder_id=folder_info['file_id'])
+        os.makedirs(local_root, exist_ok=True)
+        return syncer.apply(plan)
+
+    def get_file(self, file_id):
+        """
+        获取云盘文件信息, 缓存未过期时不发送请求
+        :param file_id: 文件ID
+        :return: dict
+        """
+        file_info = self.file_cache.get_info(file_id)
+        if file_info is None:
+            data = {
+                "drive_id": self.drive_id,
+                "file_id": file_id
+            }
+            file_info = self._post('file/get', data)
+            if not file_info.get('code'):
+                self.file_cache.put_info(file_info)
+        return file_info
+
+    def get_download_url(self, file_id, use_cache=True):
+        """
+        获取文件下载地址, 缓存的地址在过期前直接返回
+        :param file_id: 文件ID
+        :param use_cache: 为 False 时总是重新获取, 用于缓存的地址已失效的情况
+        :return: dict, 包含 url 和 expiration
+        """
+        if use_cache:
+            res = self.file_cache.get_url(file_id)
+            if res is not None:
+                return res
+        data = {
+            "drive_id": self.drive_id,
+            "file_id": file_id
+        }
+        res = self._post('file/get_download_url', data)
+        self.file_cache.put_url(file_id, res)
+        return res
+
     def _get_parent_file_id(self, parent: str) -> str:
         """
-        获取父文件夹ID
+        获取父文件夹ID, 不存在的文件夹会被创建
         :param parent: parent格式 xxx/xxx/xxx
         :return: str
         """
         if not parent:
             return 'root'
-
-        dirs = parent.split('/')
-        parent_file_name = dirs[0]
-        parent_file_id = 'root'
-
-        for item in self.root:
-            if item['name'] == parent_file_name:
-                parent_file_id = item['file_id']
-
-        if parent_file_name != 'root' and parent_file_id == 'root':
-            parent_file_id = self.create_folder(parent_file_name)['file_id']
-
-        if len(dirs) == 1:
-            return parent_file_id
-
-        for index, parent_file_name in enumerate(dirs[1:]):
-            files = self.get_list(parent_file_id)['items']
-            flag = True
-            for item in files:
-                if item['name'] == parent_file_name:
-                    parent_file_id = item['file_id']
-                    flag = False
-            if flag:
-                parent_file_id = self.create_folder(parent_file_name, parent_file_id)['file_id']
-        return parent_file_id
+        return self.resolver.resolve(parent)
 
     def create_folder(self, name, parent_file_id="root"):
         """
@@ -285,32 +403,239 @@ class AliyunDriveApi:
         }
         return self._create(data)
 
+    def _run_batch(self, url, bodies):
+        """
+        通过 batch 接口执行一组同类子请求
+        :param url: 子请求的接口路径, 如 /file/move
+        :param bodies: 子请求数据列表
+        :return: 与 bodies 顺序一致的响应列表
+        """
+        with Batcher(self) as batcher:
+            futures = [batcher.submit(url, body) for body in bodies]
+        return [future.result() for future in futures]
+
+    def _forget_files(self, file_ids):
+        """文件被移动或删除后清理路径缓存、文件缓存和本地索引"""
+        self.resolver.forget_file_ids(file_ids)
+        self.file_cache.forget(file_ids)
+        if self.index is not None:
+            for file_id in file_ids:
+                file_info = self.index.get(file_id)
+                if file_info:
+                    self.index.invalidate(file_info['parent_file_id'])
+
+    @staticmethod
+    def _succeeded(file_ids, results):
+        """batch 子请求成功的文件ID"""
+        return [file_id for file_id, res in zip(file_ids, results)
+                if not res.get('code') and (res.get('status') or 200) < 400]
+
+    def batch_get(self, file_ids):
+        """
+        批量获取文件信息
+        :param file_ids: 文件ID列表
+        :return: 文件信息列表
+        """
+        return self._run_batch('/file/get', [
+            {"drive_id": self.drive_id, "file_id": file_id} for file_id in file_ids
+        ])
+
+    def bulk_move(self, file_ids, to_parent_file_id='root'):
+        """
+        批量移动文件/文件夹
+        :param file_ids: 文件ID列表
+        :param to_parent_file_id: 目标文件夹ID
+        :return: 每个文件的移动结果
+        """
+        results = self._run_batch('/file/move', [{
+            "drive_id": self.drive_id,
+            "file_id": file_id,
+            "to_drive_id": self.drive_id,
+            "to_parent_file_id": to_parent_file_id,
+            "auto_rename": True,
+        } for file_id in file_ids])
+        self._forget_files(file_ids)
+        if self.index is not None:
+            self.index.move(self._succeeded(file_ids, results), to_parent_file_id)
+            self.index.invalidate(to_parent_file_id)
+        return results
+
+    def bulk_trash(self, file_ids):
+        """
+        批量移入回收站
+        :param file_ids: 文件ID列表
+        :return: 每个文件的结果
+        """
+        results = self._run_batch('/recyclebin/trash', [
+            {"drive_id": self.drive_id, "file_id": file_id} for file_id in file_ids
+        ])
+        self._forget_files(file_ids)
+        if self.index is not None:
+            # 索引中的搜索直接读取 files 表, 已删除的条目及其子项必须立即移除
+            self.index.remove(self._succeeded(file_ids, results))
+        return results
+
+    def bulk_delete(self, file_ids):
+        """
+        批量彻底删除 (不进入回收站)
+        :param file_ids: 文件ID列表
+        :return: 每个文件的结果
+        """
+        results = self._run_batch('/file/delete', [
+            {"drive_id": self.drive_id, "file_id": file_id} for file_id in file_ids
+        ])
+        self._forget_files(file_ids)
+        if self.index is not None:
+            self.index.remove(self._succeeded(file_ids, results))
+        return results
+
+    def bulk_create_folders(self, paths):
+        """
+        批量创建多级文件夹, 同一层级的文件夹在一个 batch 请求中创建
+        :param paths: 文件夹路径列表，格式：xxx/xxx/xxx
+        :return: {路径: file_id}, 创建失败的路径对应 None
+        """
+        ids = {'': 'root'}
+        levels = {}
+        for path in paths:
+            parts = [part for part in path.strip('/').split('/') if part]
+            for depth in range(1, len(parts) + 1):
+                levels.setdefault(depth, set()).add('/'.join(parts[:depth]))
+
+        for depth in sorted(levels):
+            pending = []
+            for path in sorted(levels[depth]):
+                parent_path, _, name = path.rpartition('/')
+                cached = self.resolver.lookup(path)
+                if cached:
+                    ids[path] = cached
+                elif ids.get(parent_path):
+                    pending.append((path, name, ids[parent_path]))
+
+            results = self._run_batch('/file/create', [{
+                "drive_id": self.drive_id,
+                "parent_file_id": parent_file_id,
+                "name": name,
+                "check_name_mode": "refuse",
+                "type": "folder"
+            } for _, name, parent_file_id in pending])
+            for (path, _, parent_file_id), res in zip(pending, results):
+                ids[path] = res.get('file_id')
+                if ids[path]:
+                    self.resolver.remember(path, ids[path])
+                if self.index is not None:
+                    self.index.invalidate(parent_file_id)
+
+        return {path: ids.get('/'.join(part for part in path.strip('/').split('/') if part)) for path in paths}
+
     def _create(self, data):
         """创建文件/文件夹"""
-        res = requests.post(self.base_api + 'file/create', headers=self.headers, json=data).json()
-        if res.get('code') == 'AccessTokenInvalid':
-            if self.do_refresh_token():
-                print('Token Refresh Success!')
-                return self._create(data)
-            else:
-                print('Token Refresh Failed!')
-                exit(-1)
-        return res
+        if self.index is not None:
+            self.index.invalidate(data['parent_file_id'])
+        return self._post('file/create', data)
 
-    def _create_file(self, parent_file_id, content_hash, name, size):
-        """创建文件"""
+    def _create_file(self, parent_file_id, name, size, content_hash=None, pre_hash=None, proof_code=None,
+                     check_name_mode='auto_rename'):
+        """
+        创建文件
+        :param content_hash: 完整文件的 SHA1, 提供时服务端会尝试秒传
+        :param pre_hash: 文件开头 1KB 的 SHA1, 服务端可能存在相同文件时返回 PreHashMatched
+        :param proof_code: 秒传校验码, 与 content_hash 一起提供
+        :param check_name_mode: 同名文件的处理方式: auto_rename 自动重命名, overwrite 覆盖, refuse 不创建
+        """
+        return self._create(self._create_file_request(parent_file_id, name, size, content_hash, pre_hash,
+                                                      proof_code, check_name_mode))
+
+    def _create_file_request(self, parent_file_id, name, size, content_hash=None, pre_hash=None, proof_code=None,
+                             check_name_mode='auto_rename'):
+        """生成 file/create 的请求数据, 参数同 _create_file, 同步和异步客户端共用"""
         data = {
-            "auto_rename": True,
-            "content_hash": content_hash,
-            "content_hash_name": 'sha1',
+            "check_name_mode": check_name_mode,
             "drive_id": self.drive_id,
             "hidden": False,
             "name": name,
             "parent_file_id": parent_file_id,
             "type": "file",
             "size": size,
+            "part_info_list": make_part_info_list(size, self.part_size),
         }
-        return self._create(data)
+        if content_hash:
+            data.update({
+                "content_hash": content_hash,
+                "content_hash_name": 'sha1',
+                "proof_code": proof_code or '',
+                "proof_version": 'v1',
+            })
+        elif pre_hash:
+            data["pre_hash"] = pre_hash
+        return data
+
+    def _create_file_with_pre_hash(self, filepath, parent_file_id, check_name_mode='auto_rename'):
+        """
+        分两步创建文件, 避免为无法秒传的文件计算完整 SHA1
+
+        本地缓存中已有 SHA1 时直接尝试秒传; 否则先只提交 pre_hash,
+        服务端返回 PreHashMatched 时才计算完整 SHA1 和 proof_code 再次创建。
+        :return: file/create 的结果
+        """
+        name = os.path.basename(filepath)
+        size = os.path.getsize(filepath)
+        content_hash = self.hash_cache.get(filepath)
+        if content_hash is None:
+            with self.metrics.phase('hash'):
+                pre_hash = pre_hash_file(filepath)
+            with self.metrics.phase('create'):
+                create_res = self._create_file(parent_file_id, name, size, pre_hash=pre_hash,
+                                               check_name_mode=check_name_mode)
+            if create_res.get('code') != 'PreHashMatched':
+                return create_res
+            with self.metrics.phase('hash'):
+                content_hash = self.hash_cache.sha1(filepath)
+        proof_code = get_proof_code(filepath, size, self.access_token)
+        with self.metrics.phase('create'):
+            return self._create_file(parent_file_id, name, size, content_hash=content_hash,
+                                     proof_code=proof_code, check_name_mode=check_name_mode)
+
+    def list_uploaded_parts(self, file_id, upload_id):
+        """
+        获取服务端已收到的分片
+        :param file_id: 文件ID
+        :param upload_id: 上传ID
+        :return: uploaded_parts 列表, 上传任务不存在或已失效时返回 None
+        """
+        parts = []
+        marker = None
+        while True:
+            data = {
+                "drive_id": self.drive_id,
+                "file_id": file_id,
+                "upload_id": upload_id,
+            }
+            if marker:
+                data["part_number_marker"] = marker
+            res = self._post('file/list_uploaded_parts', data)
+            if res.get('code'):
+                return None
+            parts.extend(res.get('uploaded_parts', []))
+            marker = res.get('next_part_number_marker')
+            if not marker:
+                return parts
+
+    def get_upload_url(self, file_id, upload_id, part_numbers):
+        """
+        重新获取分片上传地址
+        :param file_id: 文件ID
+        :param upload_id: 上传ID
+        :param part_numbers: 分片序号列表
+        :return: part_info_list
+        """
+        data = {
+            "drive_id": self.drive_id,
+            "file_id": file_id,
+            "upload_id": upload_id,
+            "part_info_list": [{"part_number": i} for i in part_numbers],
+        }
+        return self._post('file/get_upload_url', data)['part_info_list']
 
     def on_complete(self, file_id, upload_id):
         """完成文件上传"""
@@ -319,32 +644,21 @@ class AliyunDriveApi:
             "file_id": file_id,
             "upload_id": upload_id,
         }
-        res = requests.post(self.base_api + 'file/complete', headers=self.headers, json=data).json()
-        if res.get('code') == 'AccessTokenInvalid':
-            if self.do_refresh_token():
-                print('Token Refresh Success!')
-                return self.on_complete(file_id, upload_id)
-            else:
-                print('Token Refresh Failed!')
-                exit(-1)
+        res = self._post('file/complete', data)
+        self.file_cache.forget([file_id])
+        if self.index is not None and res.get('parent_file_id'):
+            self.index.invalidate(res['parent_file_id'])
         return res
 
     @staticmethod
     def get_sha1_hash(filepath):
         """获取文件的 SHA1 哈希值"""
-        with open(filepath, 'rb') as f:
-            sha1 = hashlib.sha1()
-            while True:
-                chunk = f.readline()
-                if not chunk:
-                    break
-                sha1.update(chunk)
-            return sha1.hexdigest()
+        return sha1_file(filepath)
 
     def get_file_info(self, filepath):
         """获取文件信息"""
         name = os.path.basename(filepath)
-        content_hash = self.get_sha1_hash(filepath)
+        content_hash = self.hash_cache.sha1(filepath)
         size = os.path.getsize(filepath)
         return {
             "content_hash": content_hash,
@@ -352,42 +666,86 @@ class AliyunDriveApi:
             "size": size,
         }
 
-    def _upload_file(self, filepath, parent_file_id='root'):
+    def _upload_file(self, filepath, parent_file_id='root', check_name_mode='auto_rename'):
         """上传文件的内部实现"""
-        file_info = self.get_file_info(filepath)
-        create_res = self._create_file(parent_file_id, **file_info)
+        key = self.upload_journal.make_key(filepath)
+        entry = self.upload_journal.get(key)
+        if entry and entry['parent_file_id'] == parent_file_id:
+            res = self._resume_upload(filepath, key, entry)
+            if res is not None:
+                return res
+
+        stat = os.stat(filepath)
+        create_res = self._create_file_with_pre_hash(filepath, parent_file_id, check_name_mode)
         if create_res.get('rapid_upload'):
             print(f'秒传成功: {filepath}')
             return True
-        
-        upload_uri = create_res['part_info_list'][0]['upload_url']
+
         file_id = create_res['file_id']
         upload_id = create_res['upload_id']
-        
-        with open(filepath, 'rb') as f:
-            total_size = os.fstat(f.fileno()).st_size
-            f = tqdm.wrapattr(f, "read", desc='上传中...', miniters=1, total=total_size)
-            with f as f_iter:
-                res = requests.put(
-                    upload_uri,
-                    data=ChunksIter(f_iter, total_size=total_size)
-                )
-                res.raise_for_status()
-        
-        return self.on_complete(file_id, upload_id)
+        self.upload_journal.set(key, {
+            'file_id': file_id,
+            'upload_id': upload_id,
+            'parent_file_id': parent_file_id,
+            'part_size': self.part_size,
+        })
+
+        uploader = MultipartUploader(self, self.part_size, self.upload_workers)
+        with self.metrics.phase('put'):
+            uploader.upload(filepath, file_id, upload_id, create_res['part_info_list'], stat.st_size,
+                            on_part=lambda part_number: self.upload_journal.add_part(key, part_number))
+
+        with self.metrics.phase('complete'):
+            res = self.on_complete(file_id, upload_id)
+        self.upload_journal.remove(key)
+        # 服务端返回的 content_hash 即文件 SHA1, 写入缓存后下次无需再计算
+        if res.get('content_hash'):
+            self.hash_cache.put(filepath, res['content_hash'].lower(), stat)
+        return res
+
+    def _resume_upload(self, filepath, key, entry):
+        """
+        续传未完成的上传, 只上传服务端尚未收到的分片
+        :return: on_complete 的结果, 上传任务已失效时返回 None
+        """
+        file_id = entry['file_id']
+        upload_id = entry['upload_id']
+        uploaded_parts = self.list_uploaded_parts(file_id, upload_id)
+        if uploaded_parts is None:
+            self.upload_journal.remove(key)
+            return None
+
+        size = os.path.getsize(filepath)
+        uploaded = {part['part_number'] for part in uploaded_parts}
+        part_numbers = [part['part_number'] for part in make_part_info_list(size, entry['part_size'])
+                        if part['part_number'] not in uploaded]
+        print(f'继续上传: {filepath}')
+
+        if part_numbers:
+            part_info_list = self.get_upload_url(file_id, upload_id, part_numbers)
+            uploader = MultipartUploader(self, entry['part_size'], self.upload_workers)
+            with self.metrics.phase('put'):
+                uploader.upload(filepath, file_id, upload_id, part_info_list, size,
+                                on_part=lambda part_number: self.upload_journal.add_part(key, part_number))
+
+        with self.metrics.phase('complete'):
+            res = self.on_complete(file_id, upload_id)
+        self.upload_journal.remove(key)
+        return res
 
-    def upload_file(self, filepath, parent: Union[None, str] = None):
+    def upload_file(self, filepath, parent: Union[None, str] = None, check_name_mode='auto_rename'):
         """
         上传文件
         :param filepath: 文件路径
         :param parent: 父文件夹路径，格式：xxx/xxx/xxx
+        :param check_name_mode: 同名文件的处理方式: auto_rename 自动重命名, overwrite 覆盖
         :return: bool
         """
         parent_file_id = 'root'
         if parent is None:
-            return self._upload_file(filepath, parent_file_id)
+            return self._upload_file(filepath, parent_file_id, check_name_mode)
         parent_file_id = self._get_parent_file_id(parent)
-        return self._upload_file(filepath, parent_file_id)
+        return self._upload_file(filepath, parent_file_id, check_name_mode)
 
     def get_all_file(self, path) -> List:
         """获取目录下所有文件的路径"""
@@ -404,20 +762,64 @@ class AliyunDriveApi:
                 result.append(sub_dir)
         return result
 
-    def upload_folders(self, folder_path, parent: Union[None, str] = None):
+    def upload_folders(self, folder_path, parent: Union[None, str] = None,
+                       max_workers=DEFAULT_FOLDER_WORKERS) -> List[UploadResult]:
         """
-        上传文件夹
+        并发上传文件夹, 单个文件失败不影响其他文件
         :param folder_path: 文件夹路径
         :param parent: 父文件夹路径，格式：xxx/xxx/xxx
-        :return: None
+        :param max_workers: 同时上传的文件数
+        :return: 每个文件的上传结果
         """
-        files = self.get_all_file(folder_path)
-        for file in files:
-            full_paths = file.split('/')[1:-1]
-            if parent is None:
-                self.upload_file(file, '/'.join(full_paths))
-            else:
-                self.upload_file(file, parent + '/' + '/'.join(full_paths)) 
+        return FolderUploader(self, max_workers).upload(folder_path, parent)
+
+    def walk(self, root='root', max_workers=DEFAULT_WALK_WORKERS, max_depth=None):
+        """
+        并发遍历云盘目录树
+        :param root: 起始文件夹的路径或 file_id, 默认为根目录
+        :param max_workers: 同时获取的文件夹数
+        :param max_depth: 最大深度, 1 表示只返回直接子项, None 表示不限制
+        :return: (相对 root 的路径, 文件信息) 的生成器, 顺序不固定
+        """
+        folder_id = 'root'
+        if root not in ('', '/', 'root'):
+            file_info = self.get_file_by_path(root)
+            folder_id = file_info['file_id'] if file_info else root
+        return TreeWalker(self, max_workers).walk(folder_id, max_depth=max_depth)
+
+    def rebuild_index(self):
+        """
+        重新建立整个云盘的本地索引
+        :return: 索引的文件/文件夹数量
+        """
+        return self.index.rebuild(self._fetch_files)
+
+    def refresh_index(self):
+        """
+        重新获取索引中已过期的文件夹
+        :return: 重新获取的文件夹数量
+        """
+        return self.index.refresh(self._fetch_files)
+
+    def update_index(self):
+        """
+        增量更新本地索引: 按 updated_at 倒序获取水位线之后修改过的条目并合并
+
+        请求数只与变更的条目数有关, 与云盘大小无关。放入回收站或删除的条目不会出现在结果中,
+        仍由文件夹列表过期后的重新获取处理。
+        :return: 合并的条目数, 索引从未完整重建时返回 None
+        """
+        watermark = self.index.watermark
+        if watermark is None:
+            return None
+        started_at = time.time()
+        changes = []
+        query = self.build_search_query(updated_after=watermark)
+        for item in self.iter_search(query, order_by='updated_at', order_direction='DESC'):
+            if (item.get('updated_at') or '') < watermark:
+                break
+            changes.append(item)
+        return self.index.apply_changes(changes, max(watermark, self.index.make_watermark(started_at)))
 
     def get_file_by_path(self, path: str):
         """
@@ -439,6 +841,7 @@ class AliyunDriveApi:
                     current_id = file['file_id']
                     found = True
                     if i == len(parts) - 1:  # 最后一个部分
+                        self.file_cache.put_info(file)
                         return file
                     elif file['type'] == 'folder':  # 不是最后一个部分，必须是文件夹
                         current_files = self.list_files(current_id)
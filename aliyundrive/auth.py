@@ -58,6 +58,20 @@ class AliyundriveAuth:
         
         print(f"\n配置已保存到: {self.config_path}")
     
+    def update_tokens(self, access_token, refresh_token):
+        """刷新 token 后同步更新配置文件, 先写临时文件再替换"""
+        config = configparser.ConfigParser()
+        config.read(self.config_path)
+        if not config.has_section('account'):
+            return
+        config.set('account', 'access_token', access_token)
+        config.set('account', 'refresh_token', refresh_token)
+
+        tmp_path = self.config_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            config.write(f)
+        os.replace(tmp_path, self.config_path)
+
     def get_config(self):
         """获取配置，如果不存在则引导用户手动输入token"""
         if not os.path.exists(self.config_path):
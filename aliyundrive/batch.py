@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批量接口 (batch) 封装
+"""
+
+import itertools
+import threading
+from concurrent.futures import Future
+
+# batch 接口单次最多包含 100 个子请求
+MAX_BATCH_SIZE = 100
+
+
+class Batcher:
+    """
+    将多个子请求合并为 batch 请求
+
+    submit 返回 Future, 排队的请求达到 max_batch_size 时自动发送, 其余的在 flush
+    或退出 with 语句时发送。每个 Future 的结果是对应子请求的响应 body。
+
+        >>> with Batcher(api) as batcher:
+        ...     futures = [batcher.submit('/file/delete', {...}) for ...]
+        >>> results = [future.result() for future in futures]
+    """
+
+    def __init__(self, api, max_batch_size=MAX_BATCH_SIZE):
+        """
+        :param api: AliyunDriveApi 实例
+        :param max_batch_size: 单个 batch 请求包含的最大子请求数
+        """
+        self.api = api
+        self.max_batch_size = max_batch_size
+        self._queue = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+
+    def submit(self, url, body) -> Future:
+        """
+        加入一个子请求
+        :param url: 子请求的接口路径, 如 /file/move
+        :param body: 子请求的数据
+        :return: Future, 结果为子请求的响应 body
+        """
+        future = Future()
+        with self._lock:
+            self._queue.append((str(next(self._ids)), url, body, future))
+            if len(self._queue) < self.max_batch_size:
+                return future
+            requests, self._queue = self._queue, []
+        self._send(requests)
+        return future
+
+    def flush(self):
+        """发送所有排队中的子请求"""
+        with self._lock:
+            requests, self._queue = self._queue, []
+        for i in range(0, len(requests), self.max_batch_size):
+            self._send(requests[i:i + self.max_batch_size])
+
+    def _send(self, requests):
+        data = {
+            "requests": [{
+                "id": request_id,
+                "method": "POST",
+                "url": url,
+                "headers": {"Content-Type": "application/json"},
+                "body": body,
+            } for request_id, url, body, _ in requests],
+            "resource": "file",
+        }
+        try:
+            res = self.api._post('batch', data)
+        except Exception as e:
+            for *_, future in requests:
+                future.set_exception(e)
+            return
+
+        responses = {response.get('id'): response for response in res.get('responses', [])}
+        for request_id, _, _, future in requests:
+            response = responses.get(request_id)
+            if response is None:
+                future.set_result({'code': res.get('code', 'BatchFailed'), 'message': res.get('message')})
+            else:
+                future.set_result(dict(response.get('body') or {}, status=response.get('status')))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.flush()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+文件元数据和下载地址的内存缓存
+"""
+
+import calendar
+import threading
+import time
+from collections import OrderedDict
+
+# 文件元数据的有效期(秒)
+DEFAULT_INFO_TTL = 300
+# 下载地址在过期前该秒数即视为失效, 留出开始下载的时间
+URL_EXPIRY_MARGIN = 60
+# 响应中没有过期时间时下载地址的有效期(秒)
+DEFAULT_URL_TTL = 900
+DEFAULT_CACHE_SIZE = 1024
+
+
+def parse_expiration(expiration):
+    """
+    解析 get_download_url 返回的过期时间
+    :param expiration: 如 2024-01-01T00:00:00.000Z (UTC)
+    :return: 时间戳, 无法解析时返回 None
+    """
+    try:
+        return calendar.timegm(time.strptime(expiration[:19], '%Y-%m-%dT%H:%M:%S'))
+    except (TypeError, ValueError):
+        return None
+
+
+class _TTLCache:
+    """带过期时间的 LRU 缓存"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._items = OrderedDict()
+
+    def get(self, key):
+        entry = self._items.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.time():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    def put(self, key, value, expires_at):
+        self._items[key] = (value, expires_at)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def pop(self, key):
+        self._items.pop(key, None)
+
+
+class FileCache:
+    """
+    按 file_id 缓存文件元数据和下载地址
+
+    下载地址在响应的 expiration 之前有效, 同一文件的重复下载无需再请求 file/get
+    和 file/get_download_url。文件被修改、移动或删除后需要调用 forget。
+    """
+
+    def __init__(self, info_ttl=DEFAULT_INFO_TTL, max_size=DEFAULT_CACHE_SIZE):
+        """
+        :param info_ttl: 文件元数据的有效期(秒)
+        :param max_size: 每种缓存最多保存的文件数
+        """
+        self.info_ttl = info_ttl
+        self._infos = _TTLCache(max_size)
+        self._urls = _TTLCache(max_size)
+        self._lock = threading.Lock()
+
+    def get_info(self, file_id):
+        """
+        获取缓存的文件元数据
+        :param file_id: 文件ID
+        :return: dict, 不在缓存中或已过期时返回 None
+        """
+        with self._lock:
+            return self._infos.get(file_id)
+
+    def put_info(self, file_info):
+        """
+        缓存文件元数据, 如 file/get、file/list 返回的条目
+        :param file_info: 文件信息
+        """
+        if not file_info.get('file_id'):
+            return
+        with self._lock:
+            self._infos.put(file_info['file_id'], file_info, time.time() + self.info_ttl)
+
+    def get_url(self, file_id):
+        """
+        获取缓存的下载地址
+        :param file_id: 文件ID
+        :return: get_download_url 的结果, 不在缓存中或即将过期时返回 None
+        """
+        with self._lock:
+            return self._urls.get(file_id)
+
+    def put_url(self, file_id, res):
+        """
+        缓存下载地址
+        :param file_id: 文件ID
+        :param res: get_download_url 的结果
+        """
+        if not res.get('url'):
+            return
+        expires_at = parse_expiration(res.get('expiration')) or time.time() + DEFAULT_URL_TTL
+        with self._lock:
+            self._urls.put(file_id, res, expires_at - URL_EXPIRY_MARGIN)
+
+    def forget(self, file_ids):
+        """
+        删除文件的缓存
+        :param file_ids: 文件ID列表
+        """
+        with self._lock:
+            for file_id in file_ids:
+                self._infos.pop(file_id)
+                self._urls.pop(file_id)
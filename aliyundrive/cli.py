@@ -9,8 +9,13 @@ import sys
 import os
 from pathlib import Path
 import configparser
+
+import requests
+
 from .api import AliyunDriveApi
 from .auth import AliyundriveAuth
+from .upload import DEFAULT_PART_SIZE, DEFAULT_UPLOAD_WORKERS, DEFAULT_FOLDER_WORKERS
+from .sync import DriveSync
 
 
 def print_usage():
@@ -21,6 +26,8 @@ def print_usage():
         例如:
         aliyundrive upload ./test.txt
         aliyundrive upload ./test_folder x/y
+        aliyundrive --part-size 32 --threads 8 upload ./big.iso   # 32MB 分片, 8 个分片并发
+        aliyundrive --jobs 8 upload ./photos                      # 同时上传 8 个文件
     
     下载文件:
         aliyundrive download <文件路径或文件名> [保存路径]
@@ -28,6 +35,7 @@ def print_usage():
         aliyundrive download test.txt                     # 下载根目录下的 test.txt
         aliyundrive download 充电/file.txt                # 下载指定文件夹下的文件
         aliyundrive download test.txt /Users/downloads/   # 指定保存路径
+        aliyundrive --jobs 8 download 充电 ./backup       # 下载整个文件夹, 同时下载 8 个文件, 跳过本地已有的相同文件
     
     列出文件:
         aliyundrive list [文件夹名称]
@@ -45,9 +53,135 @@ def print_usage():
         例如:
         aliyundrive search test.txt         # 搜索文件名包含 test.txt 的文件
         aliyundrive search 充电             # 搜索文件名包含"充电"的文件/文件夹
+        aliyundrive --type file --ext mp4 --min-size 1048576 search 视频   # 按类型、扩展名、大小过滤
+
+    遍历目录:
+        aliyundrive ls [-R] [--depth N] [文件夹路径]
+        aliyundrive du [文件夹路径]
+        例如:
+        aliyundrive ls -R 充电              # 递归列出"充电"下的所有文件
+        aliyundrive --jobs 16 du            # 统计整个云盘各目录的占用空间
+
+    批量操作:
+        aliyundrive mkdir <文件夹路径>...
+        aliyundrive mv <文件路径>... <目标文件夹>
+        aliyundrive rm [--permanent] <文件路径>...
+        例如:
+        aliyundrive mkdir 备份/2024 备份/2025   # 一次创建多个多级文件夹
+        aliyundrive mv a.txt b.txt 备份/2024    # 移动到"备份/2024"
+        aliyundrive rm a.txt 旧文件夹           # 移入回收站, 加 --permanent 彻底删除
+
+    同步文件夹:
+        aliyundrive sync [--pull] [--delete] [--dry-run] <源路径> <目标路径>
+        例如:
+        aliyundrive sync ./photos 备份/photos              # 只上传新增或修改的文件
+        aliyundrive sync --delete ./photos 备份/photos     # 同时删除云盘中本地已不存在的文件
+        aliyundrive sync --pull 备份/photos ./photos       # 反向同步: 从云盘下载到本地
+        aliyundrive sync --dry-run ./photos 备份/photos    # 只显示同步计划, 不执行
+
+    本地索引:
+        aliyundrive index rebuild|update|refresh|clear
+        例如:
+        aliyundrive index rebuild           # 获取整个云盘的目录树并保存到本地
+        aliyundrive index update            # 只获取上次更新后修改过的文件, 只需少量请求
+        aliyundrive index refresh           # 只重新获取已过期的文件夹
+        aliyundrive --index list 充电       # list/download/search 使用本地索引
+
+    统计信息:
+        aliyundrive --stats upload ./photos                       # 命令结束后打印各接口的请求数、耗时和流量
+        aliyundrive --stats --stats-format prometheus download a.iso  # 输出 Prometheus 文本格式, 也可以是 json
     """)
 
 
+def print_upload_report(results):
+    """打印文件夹上传结果"""
+    failed = [result for result in results if not result.success]
+    print(f"\n上传完成: 成功 {len(results) - len(failed)} 个, 失败 {len(failed)} 个")
+    for result in failed:
+        print(f"  ✗ {result.path}: {result.error}")
+
+
+def format_size(size):
+    """将字节数格式化为易读的大小"""
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if size < 1024 or unit == 'TB':
+            return f"{size:.2f} {unit}" if unit != 'B' else f"{size} B"
+        size /= 1024
+
+
+def print_disk_usage(entries):
+    """按第一级目录汇总并打印占用空间"""
+    usage = {}
+    files = folders = 0
+    for path, entry in entries:
+        if entry['type'] == 'folder':
+            folders += 1
+            continue
+        files += 1
+        top = path.split('/', 1)[0]
+        usage[top] = usage.get(top, 0) + (entry.get('size') or 0)
+    for name, size in sorted(usage.items(), key=lambda item: item[1], reverse=True):
+        print(f"{format_size(size):>12}  {name}")
+    print(f"{format_size(sum(usage.values())):>12}  合计 ({files} 个文件, {folders} 个文件夹)")
+
+
+def resolve_paths(api, paths):
+    """将云盘路径转换为文件信息, 打印找不到的路径"""
+    files = []
+    for path in paths:
+        file_info = api.get_file_by_path(path)
+        if file_info:
+            files.append(file_info)
+        else:
+            print(f"未找到文件: {path}")
+    return files
+
+
+def print_batch_results(names, results, action):
+    """打印批量操作的结果"""
+    failed = 0
+    for name, res in zip(names, results):
+        if res.get('code') or (res.get('status') or 200) >= 400:
+            failed += 1
+            print(f"  ✗ {name}: {res.get('message') or res.get('code')}")
+    print(f"\n{action}完成: 成功 {len(results) - failed} 个, 失败 {failed} 个")
+
+
+SYNC_OP_NAMES = {
+    'upload': '上传', 'download': '下载', 'mkdir': '创建文件夹', 'mkdir_remote': '创建云盘文件夹',
+    'delete_remote': '删除云盘', 'delete_local': '删除本地', 'skip': '跳过',
+}
+SYNC_REASON_NAMES = {'new': '新增', 'changed': '已修改', 'deleted': '已删除', 'unchanged': '未修改'}
+
+
+def count_sync_ops(actions):
+    """按操作类型统计数量, 返回如 "上传 3 个, 跳过 10 个" 的字符串"""
+    counts = {}
+    for action in actions:
+        counts[action.op] = counts.get(action.op, 0) + 1
+    return ', '.join(f"{SYNC_OP_NAMES[op]} {count} 个" for op, count in counts.items())
+
+
+def print_sync_plan(plan):
+    """打印同步计划, 未修改的文件只计数不列出"""
+    for action in plan:
+        if action.op != 'skip':
+            print(f"  {SYNC_OP_NAMES[action.op]:<6} {action.path}  ({SYNC_REASON_NAMES[action.reason]})")
+    print(f"\n同步计划: {count_sync_ops(plan) or '没有需要同步的文件'}")
+
+
+def print_sync_report(results, action='同步'):
+    """打印同步或文件夹下载的结果"""
+    succeeded = [result.action for result in results if result.success]
+    failed = [result for result in results if not result.success]
+    transferred = sum((a.remote or {}).get('size') or 0 for a in succeeded if a.op == 'download') + \
+        sum(os.path.getsize(a.local_path) for a in succeeded if a.op == 'upload' and os.path.exists(a.local_path))
+    print(f"\n{action}完成: {count_sync_ops(succeeded) or '没有需要同步的文件'}, "
+          f"传输 {format_size(transferred)}, 失败 {len(failed)} 个")
+    for result in failed:
+        print(f"  ✗ {SYNC_OP_NAMES[result.action.op]} {result.action.path}: {result.error}")
+
+
 def init_config():
     """初始化配置"""
     auth = AliyundriveAuth()
@@ -55,45 +189,23 @@ def init_config():
     print("配置初始化完成！")
 
 
-def main():
-    """命令行入口函数"""
-    import argparse
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--init', action='store_true', help='初始化配置')
-    parser.add_argument('--debug', action='store_true', help='显示调试信息')
-    parser.add_argument('command', nargs='?', help='命令')
-    parser.add_argument('args', nargs='*', help='命令参数')
-    
-    args = parser.parse_args()
-    
-    if args.init:
-        init_config()
-        return
-        
-    if args.debug:
-        config_path = os.path.join(str(Path.home()), '.aliyundrive', 'config.ini')
-        print(f"配置文件路径: {config_path}")
-        if os.path.exists(config_path):
-            print("配置文件存在")
-            config = configparser.ConfigParser()
-            config.read(config_path)
-            print("配置内容:")
-            print(config.sections())
-        else:
-            print("配置文件不存在")
-    
-    if not args.command:
-        print_usage()
-        return
-        
-    argv = [args.command] + args.args  # 组合命令和参数
-    api = AliyunDriveApi()
+def print_stats(metrics, fmt='text'):
+    """打印请求统计"""
+    print()
+    if fmt == 'json':
+        print(metrics.to_json())
+    elif fmt == 'prometheus':
+        print(metrics.to_prometheus(), end='')
+    else:
+        print(metrics.format_summary())
 
+
+def run_command(api, argv, args):
+    """执行命令"""
     if argv[0] == 'list':
         path = argv[1] if len(argv) > 1 else 'root'
-        if path == 'root':
-            files = api.list_files()
-        else:
+        parent_file_id = 'root'
+        if path != 'root':
             file_info = api.get_file_by_path(path)
             if not file_info:
                 print(f"未找到文件夹: {path}")
@@ -101,20 +213,23 @@ def main():
             if file_info['type'] != 'folder':
                 print(f"'{path}' 不是文件夹")
                 return
-            files = api.list_files(file_info['file_id'])
+            parent_file_id = file_info['file_id']
+
+        count = 0
+        for count, file in enumerate(api.iter_files(parent_file_id), 1):
+            if count == 1:
+                print("=" * 50)
+            api.print_file_info(file, index=count)
+            print("-" * 50)
 
-        if not files:
+        if not count:
             print("\n当前文件夹为空")
             print("\n提示:")
             print("1. 使用 'aliyundrive upload 文件路径' 上传文件到当前目录")
             print("2. 使用 'aliyundrive list' 返回根目录")
             print("3. 使用 'aliyundrive search 关键词' 搜索文件")
         else:
-            print(f"\n共找到 {len(files)} 个文件/文件夹:")
-            print("=" * 50)
-            for i, file in enumerate(files, 1):
-                api.print_file_info(file, index=i)
-                print("-" * 50)
+            print(f"\n共找到 {count} 个文件/文件夹")
             print("\n提示: ")
             print("1. 使用文件/文件夹���称进行操作")
             print("2. 下载文件示例: aliyundrive download \"文件名\"")
@@ -122,40 +237,197 @@ def main():
             print("4. 如果找不到想要的文件，可以使用 'aliyundrive search 关键词' 搜索")
     elif argv[0] == 'upload':
         if len(argv) == 2:
-            api.upload_folders(argv[1])
+            print_upload_report(api.upload_folders(argv[1], max_workers=args.jobs))
         elif len(argv) == 3:
-            api.upload_folders(argv[1], argv[2])
+            print_upload_report(api.upload_folders(argv[1], argv[2], max_workers=args.jobs))
         else:
             print_usage()
     elif argv[0] == 'download':
-        if len(argv) == 2:
-            api.download_by_path(argv[1])
-        elif len(argv) == 3:
-            api.download_by_path(argv[1], argv[2])
-        else:
+        if len(argv) not in (2, 3):
             print_usage()
+            return
+        file_info = api.get_file_by_path(argv[1])
+        if not file_info:
+            print(f"未找到文件: {argv[1]}")
+        elif file_info['type'] == 'folder':
+            results = api.download_folder(file_info, *argv[2:], max_workers=args.jobs)
+            print_sync_report(results, '下载')
+        else:
+            # 路径已经解析过, 文件信息也已缓存, 直接按 file_id 下载
+            api.download_file(file_info['file_id'], *argv[2:])
     elif argv[0] == 'search':
         if len(argv) != 2:
             print_usage()
         else:
             keyword = argv[1]
             print(f"\n正在搜索: {keyword}")
-            files = api.search_file(keyword)
-            if not files:
+            filters = {key: value for key, value in (
+                ('file_type', args.type), ('extension', args.ext),
+                ('min_size', args.min_size), ('max_size', args.max_size),
+                ('updated_after', args.after), ('updated_before', args.before),
+            ) if value is not None}
+            count = 0
+            for count, file in enumerate(api.search_file(keyword, **filters), 1):
+                if count == 1:
+                    print("=" * 50)
+                api.print_file_info(file, index=count)
+                print("-" * 50)
+            if not count:
                 print(f"\n未找到包含 '{keyword}' 的文件或文件夹")
                 print("\n提示:")
                 print("1. 尝试使用不同的关键词")
                 print("2. 关键词不区分大小写")
                 print("3. 可以使用 'aliyundrive list' 浏览所有文件")
             else:
-                print(f"\n共找到 {len(files)} 个匹配项:")
-                print("=" * 50)
-                for i, file in enumerate(files, 1):
-                    api.print_file_info(file, index=i)
-                    print("-" * 50)
+                print(f"\n共找到 {count} 个匹配项")
+    elif argv[0] == 'ls':
+        root = argv[1] if len(argv) > 1 else 'root'
+        max_depth = args.depth if args.recursive else 1
+        for path, entry in api.walk(root, max_workers=args.jobs, max_depth=max_depth):
+            print(path + '/' if entry['type'] == 'folder' else path)
+    elif argv[0] == 'du':
+        root = argv[1] if len(argv) > 1 else 'root'
+        print_disk_usage(api.walk(root, max_workers=args.jobs, max_depth=args.depth))
+    elif argv[0] == 'mkdir':
+        if len(argv) < 2:
+            print_usage()
+            return
+        created = api.bulk_create_folders(argv[1:])
+        for path, file_id in created.items():
+            print(f"  {'✓' if file_id else '✗'} {path}")
+    elif argv[0] == 'mv':
+        if len(argv) < 3:
+            print_usage()
+            return
+        target = argv[-1]
+        target_id = 'root'
+        if target.strip('/') not in ('', 'root'):
+            target_info = api.get_file_by_path(target)
+            if not target_info or target_info['type'] != 'folder':
+                print(f"未找到目标文件夹: {target}")
+                return
+            target_id = target_info['file_id']
+        files = resolve_paths(api, argv[1:-1])
+        results = api.bulk_move([file['file_id'] for file in files], target_id)
+        print_batch_results([file['name'] for file in files], results, '移动')
+    elif argv[0] == 'rm':
+        if len(argv) < 2:
+            print_usage()
+            return
+        files = resolve_paths(api, argv[1:])
+        file_ids = [file['file_id'] for file in files]
+        results = api.bulk_delete(file_ids) if args.permanent else api.bulk_trash(file_ids)
+        print_batch_results([file['name'] for file in files], results, '删除')
+    elif argv[0] == 'sync':
+        if len(argv) != 3:
+            print_usage()
+            return
+        syncer = DriveSync(api, max_workers=args.jobs)
+        try:
+            if args.pull:
+                remote_root, local_root = argv[1], argv[2]
+                plan = syncer.plan_pull(remote_root, local_root, delete=args.delete)
+            else:
+                local_root, remote_root = argv[1], argv[2]
+                if not os.path.isdir(local_root):
+                    print(f"未找到本地文件夹: {local_root}")
+                    return
+                plan = syncer.plan_push(local_root, remote_root, delete=args.delete)
+        except (RuntimeError, requests.RequestException) as e:
+            # 清单不完整时生成的计划可能包含错误的删除操作, 直接放弃本次同步
+            print(f"获取云盘文件列表失败, 已取消同步: {e}")
+            return
+        except OSError as e:
+            print(f"读取本地文件夹失败, 已取消同步: {e}")
+            return
+        print_sync_plan(plan)
+        if any(action.op != 'skip' for action in plan) and not args.dry_run:
+            print_sync_report(syncer.apply(plan, remote_root, permanent=args.permanent))
+    elif argv[0] == 'index':
+        action = argv[1] if len(argv) > 1 else None
+        if action == 'rebuild':
+            print(f"\n已索引 {api.rebuild_index()} 个文件/文件夹")
+        elif action == 'update':
+            count = api.update_index()
+            if count is None:
+                print("\n索引尚未建立, 请先运行 'aliyundrive index rebuild'")
+            else:
+                print(f"\n已合并 {count} 个修改过的文件/文件夹")
+        elif action == 'refresh':
+            print(f"\n已刷新 {api.refresh_index()} 个文件夹")
+        elif action == 'clear':
+            api.index.clear()
+            print("\n本地索引已清空")
+        else:
+            print_usage()
     else:
         print_usage()
 
 
+def main():
+    """命令行入口函数"""
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--init', action='store_true', help='初始化配置')
+    parser.add_argument('--debug', action='store_true', help='显示调试信息')
+    parser.add_argument('--part-size', type=int, default=DEFAULT_PART_SIZE // (1024 * 1024),
+                        help='上传分片大小(MB)')
+    parser.add_argument('--threads', type=int, default=DEFAULT_UPLOAD_WORKERS,
+                        help='单个文件并发传输的分片数')
+    parser.add_argument('--jobs', type=int, default=DEFAULT_FOLDER_WORKERS,
+                        help='并发任务数: 上传文件夹时同时上传的文件数, 遍历目录时同时获取的文件夹数')
+    parser.add_argument('-R', '--recursive', action='store_true', help='ls 时递归列出子文件夹')
+    parser.add_argument('--depth', type=int, help='ls/du 遍历的最大深度')
+    parser.add_argument('--permanent', action='store_true', help='rm/sync 时彻底删除而不是移入回收站')
+    parser.add_argument('--pull', action='store_true', help='sync 时从云盘同步到本地')
+    parser.add_argument('--delete', action='store_true', help='sync 时删除目标中源已不存在的文件')
+    parser.add_argument('--dry-run', action='store_true', help='sync 时只显示同步计划')
+    parser.add_argument('--index', action='store_true', help='使用本地索引加速路径查找、列表和搜索')
+    parser.add_argument('--stats', action='store_true', help='命令结束后打印请求和各阶段的耗时统计')
+    parser.add_argument('--stats-format', choices=['text', 'json', 'prometheus'], default='text',
+                        help='--stats 的输出格式')
+    parser.add_argument('--type', choices=['file', 'folder'], help='搜索时只返回文件或文件夹')
+    parser.add_argument('--ext', help='搜索时只返回指定扩展名的文件')
+    parser.add_argument('--min-size', type=int, help='搜索时的最小文件大小(字节)')
+    parser.add_argument('--max-size', type=int, help='搜索时的最大文件大小(字节)')
+    parser.add_argument('--after', help='搜索时的更新时间下限, 如 2024-01-01T00:00:00')
+    parser.add_argument('--before', help='搜索时的更新时间上限')
+    parser.add_argument('command', nargs='?', help='命令')
+    parser.add_argument('args', nargs='*', help='命令参数')
+    
+    args = parser.parse_intermixed_args()
+    
+    if args.init:
+        init_config()
+        return
+        
+    if args.debug:
+        config_path = os.path.join(str(Path.home()), '.aliyundrive', 'config.ini')
+        print(f"配置文件路径: {config_path}")
+        if os.path.exists(config_path):
+            print("配置文件存在")
+            config = configparser.ConfigParser()
+            config.read(config_path)
+            print("配置内容:")
+            print(config.sections())
+        else:
+            print("配置文件不存在")
+    
+    if not args.command:
+        print_usage()
+        return
+        
+    argv = [args.command] + args.args  # 组合命令和参数
+    api = AliyunDriveApi(pool_size=args.jobs * args.threads, part_size=args.part_size * 1024 * 1024,
+                         upload_workers=args.threads, download_workers=args.threads,
+                         use_index=args.index or args.command == 'index')
+
+    try:
+        run_command(api, argv, args)
+    finally:
+        if args.stats:
+            print_stats(api.metrics, args.stats_format)
+
+
 if __name__ == '__main__':
     main() 
\ No newline at end of file
@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分段并发下载
+"""
+
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from tqdm import tqdm
+from urllib3.exceptions import DecodeError, ProtocolError, ReadTimeoutError, SSLError
+
+from .utils.file import PositionalFile
+from .utils.http import TRANSFER_TIMEOUT
+from .utils.journal import DownloadJournal
+from .utils.progress import ThrottledProgress
+from .utils.retry import TRANSFER_RETRY, is_throttled
+
+DEFAULT_SEGMENT_SIZE = 16 * 1024 * 1024
+DEFAULT_DOWNLOAD_WORKERS = 4
+# 下载过程中每写入这么多数据就更新一次下载记录, 进程被强制结束时最多重新下载这么多
+DEFAULT_CHECKPOINT_SIZE = 8 * 1024 * 1024
+# 下载地址过期或请求失败时单个分段的最大重试次数
+MAX_SEGMENT_RETRIES = TRANSFER_RETRY.max_retries
+
+DOWNLOAD_HEADERS = {
+    'Referer': 'https://www.aliyundrive.com/',
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4389.128 Safari/537.36'
+}
+
+
+def split_ranges(file_size, segment_size=DEFAULT_SEGMENT_SIZE):
+    """
+    将文件切分为若干字节区间
+    :param file_size: 文件大小
+    :param segment_size: 分段大小
+    :return: [(start, end), ...], end 不包含在区间内
+    """
+    return [(start, min(start + segment_size, file_size))
+            for start in range(0, file_size, segment_size)]
+
+
+class StreamSink:
+    """
+    把响应体写入文件的指定位置
+
+    每次把缓冲区读满后整块写入, 而不是每收到一小块就写一次和更新一次进度,
+    可选地在写入的同时计算 SHA1。offset 始终是已写入数据的结束位置, 出错后可以从这里继续。
+    提供 journal 时每写入 checkpoint_size 字节就记录一次已写入的区间, 提供 stop 时每写入一块检查一次,
+    已设置时抛出 IOError 结束读取。
+    """
+
+    def __init__(self, file, offset, buffer, callback=None, hasher=None, journal=None,
+                 checkpoint_size=DEFAULT_CHECKPOINT_SIZE, stop=None):
+        """
+        :param file: PositionalFile
+        :param offset: 写入的起始位置
+        :param buffer: 读取使用的缓冲区, 如 BufferPool.acquire 的结果
+        :param callback: 每写入一块后调用, 参数为字节数
+        :param hasher: hashlib 对象, 提供时按顺序更新写入的数据
+        :param journal: DownloadJournal, 提供时定期记录已写入的区间
+        :param checkpoint_size: 记录区间的间隔(字节)
+        :param stop: threading.Event, 设置后停止读取
+        """
+        self.file = file
+        self.begin = offset
+        self.offset = offset
+        self.buffer = buffer
+        self.callback = callback
+        self.hasher = hasher
+        self.journal = journal
+        self.checkpoint_size = checkpoint_size
+        self.stop = stop
+        self._checkpoint = offset
+
+    def consume(self, response):
+        """
+        读取整个响应体
+        :param response: 使用 stream=True 发送请求得到的 requests.Response
+        """
+        raw = response.raw
+        # 与 iter_content 一致, 服务端压缩了响应时解压后再写入
+        raw.decode_content = True
+        view = memoryview(self.buffer)
+        while True:
+            filled = 0
+            while filled < len(view):
+                n = self._readinto(raw, view[filled:])
+                if not n:
+                    break
+                filled += n
+            if not filled:
+                return
+            block = view[:filled]
+            self.file.write_at(block, self.offset)
+            if self.hasher is not None:
+                self.hasher.update(block)
+            self.offset += filled
+            if self.callback:
+                self.callback(filled)
+            if self.journal is not None and self.offset - self._checkpoint >= self.checkpoint_size:
+                self.journal.add_range(self.begin, self.offset)
+                self._checkpoint = self.offset
+            if filled < len(view):
+                return
+            if self.stop is not None and self.stop.is_set():
+                raise IOError('下载已取消')
+
+    @staticmethod
+    def _readinto(raw, view):
+        """直接读取 urllib3 的响应, 异常转换为与 iter_content 相同的 requests 异常, 以便按原有规则重试"""
+        try:
+            return raw.readinto(view)
+        except ProtocolError as e:
+            raise requests.exceptions.ChunkedEncodingError(e)
+        except DecodeError as e:
+            raise requests.exceptions.ContentDecodingError(e)
+        except ReadTimeoutError as e:
+            raise requests.ConnectionError(e)
+        except SSLError as e:
+            raise requests.exceptions.SSLError(e)
+
+
+class RangedDownloader:
+    """分段并发下载器"""
+
+    def __init__(self, api, max_workers=DEFAULT_DOWNLOAD_WORKERS, segment_size=DEFAULT_SEGMENT_SIZE,
+                 inline_hash=True):
+        """
+        :param api: AliyunDriveApi 实例
+        :param max_workers: 并发下载的分段数, 为 1 时整个文件只用一个请求顺序下载
+        :param segment_size: 分段大小
+        :param inline_hash: 从头顺序下载时是否在写入的同时计算 SHA1, 省去下载后重新读取文件校验
+        """
+        self.api = api
+        self.max_workers = max_workers
+        self.segment_size = segment_size
+        self.inline_hash = inline_hash
+        self._url = None
+        self._url_lock = threading.Lock()
+
+    def download(self, file_id, file_size, save_file_path, url=None, content_hash=None):
+        """
+        下载文件到本地, 支持断点续传
+
+        数据先写入 <save_file_path>.part, 已完成的区间记录在 <save_file_path>.part.json,
+        中断后重新下载同一文件时只下载缺失的区间。全部完成并校验 SHA1 后再重命名为目标文件。
+        整个文件由一个请求从头顺序下载时, SHA1 在下载的同时计算, 否则下载完成后重新读取文件计算。
+        :param file_id: 文件ID
+        :param file_size: 文件大小
+        :param save_file_path: 本地保存路径
+        :param url: 已获取的下载地址, 为空时自动获取
+        :param content_hash: 文件 SHA1, 为空时不校验
+        """
+        part_path = save_file_path + '.part'
+        journal = DownloadJournal.load(part_path + '.json', file_id, file_size, content_hash)
+        if not os.path.exists(part_path):
+            journal.ranges = []
+
+        segments = []
+        for start, end in journal.missing_ranges():
+            if self.max_workers == 1:
+                segments.append((start, end))
+            else:
+                segments.extend((start + s, start + e) for s, e in split_ranges(end - start, self.segment_size))
+
+        hasher = None
+        if content_hash and self.inline_hash and segments == [(0, file_size)]:
+            hasher = hashlib.sha1()
+
+        metrics = self.api.http.metrics
+        if segments:
+            self._url = url or self.api.get_download_url(file_id)['url']
+            with metrics.phase('get'):
+                self._fetch_segments(file_id, file_size, part_path, segments, journal, hasher)
+        elif not os.path.exists(part_path):
+            open(part_path, 'wb').close()
+
+        if content_hash:
+            with metrics.phase('verify'):
+                sha1 = hasher.hexdigest() if hasher is not None else self.api.get_sha1_hash(part_path)
+                verified = sha1.upper() == content_hash.upper()
+            if not verified:
+                os.remove(part_path)
+                journal.remove()
+                raise IOError(f'文件校验失败: {save_file_path}')
+
+        os.replace(part_path, save_file_path)
+        journal.remove()
+
+    def _fetch_segments(self, file_id, file_size, part_path, segments, journal, hasher=None):
+        """
+        并发下载所有缺失的区间, 提供 hasher 时只能有一个区间
+
+        任意一个区间失败或被 Ctrl-C 中断时通知其余正在下载的区间停止,
+        它们在写完当前一块并记录进度后退出, 不会等到整个区间下载完成。
+        """
+        name = os.path.basename(part_path[:-len('.part')])
+        progress = ThrottledProgress(tqdm(desc=f'Downloading {name}', total=file_size, initial=journal.completed_size,
+                                          unit='iB', unit_scale=True, unit_divisor=1024))
+        stop = threading.Event()
+
+        with progress, PositionalFile(part_path, file_size) as file, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(self._download_segment, file_id, file, start, end, progress.update, journal,
+                                hasher, stop)
+                for start, end in segments
+            ]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except BaseException:
+                stop.set()
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def _refresh_url(self, file_id, expired_url):
+        """下载地址过期时重新获取, 多个分段同时过期时只请求一次"""
+        with self._url_lock:
+            if self._url == expired_url:
+                self._url = self.api.get_download_url(file_id, use_cache=False)['url']
+            return self._url
+
+    def _download_segment(self, file_id, file, start, end, update, journal, hasher=None, stop=None):
+        """
+        下载 [start, end) 区间并写入文件对应位置, 已写入的部分定期记录到 journal
+
+        地址过期时刷新地址, 限流、服务端错误和网络错误时退避重试, 重试从已写入的位置继续,
+        因此 hasher 收到的数据始终是连续的。stop 被设置后不再发起新的请求。
+        """
+        offset = start
+        limiter = self.api.http.oss_limiter
+        buffer_pool = self.api.http.buffer_pool
+        metrics = self.api.http.metrics
+        try:
+            for attempt in range(MAX_SEGMENT_RETRIES + 1):
+                if stop is not None and stop.is_set():
+                    raise IOError('下载已取消')
+                url = self._url
+                headers = dict(DOWNLOAD_HEADERS, Range=f'bytes={offset}-{end - 1}')
+                retry = attempt < MAX_SEGMENT_RETRIES
+                begin = offset
+                started = time.perf_counter()
+                try:
+                    with limiter.slot(), buffer_pool.buffer() as buffer:
+                        # 不计入等待并发名额和缓冲区的时间
+                        started = time.perf_counter()
+                        with self.api.http.oss.get(url, headers=headers, stream=True,
+                                                   timeout=TRANSFER_TIMEOUT) as res:
+                            if retry and (res.status_code == 403 or TRANSFER_RETRY.should_retry(res)):
+                                failed = res
+                            else:
+                                failed = None
+                                res.raise_for_status()
+                                if res.status_code != 206 and offset != 0:
+                                    raise IOError('下载服务器不支持 Range 请求')
+                                sink = StreamSink(file, offset, buffer, update, hasher, journal, stop=stop)
+                                try:
+                                    sink.consume(res)
+                                finally:
+                                    offset = sink.offset
+                except requests.RequestException as e:
+                    metrics.record_request('oss:get', type(e).__name__, time.perf_counter() - started,
+                                           offset - begin, attempt)
+                    if not retry or not TRANSFER_RETRY.should_retry_error(e):
+                        raise
+                    if isinstance(e, requests.Timeout):
+                        limiter.on_throttle()
+                    time.sleep(TRANSFER_RETRY.delay(attempt))
+                    continue
+                metrics.record_request('oss:get', res.status_code, time.perf_counter() - started,
+                                       offset - begin, attempt)
+                # 刷新地址和等待都在释放并发名额之后进行
+                if failed is None:
+                    limiter.on_success()
+                elif failed.status_code == 403:
+                    self._refresh_url(file_id, url)
+                else:
+                    if is_throttled(failed):
+                        limiter.on_throttle()
+                    time.sleep(TRANSFER_RETRY.delay(attempt, failed))
+                if offset >= end:
+                    return
+            raise IOError(f'下载区间 {start}-{end - 1} 失败')
+        finally:
+            journal.add_range(start, offset)
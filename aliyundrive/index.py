@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+云盘目录树的本地索引
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# 文件夹列表在索引中的有效期(秒), 过期后重新从云盘获取
+DEFAULT_INDEX_TTL = 3600
+# 水位线相对获取开始时间提前的秒数, 覆盖获取过程中发生的修改和时钟误差
+WATERMARK_MARGIN = 300
+
+_FIELDS = ('file_id', 'parent_file_id', 'name', 'type', 'size', 'content_hash', 'updated_at')
+
+
+class DriveIndex:
+    """
+    云盘元数据的本地 SQLite 索引
+
+    files 表保存每个文件/文件夹的元数据, folders 表记录每个文件夹的子项最后一次
+    完整获取的时间。文件夹的子项超过 ttl 未刷新时视为过期, 需要重新获取。
+
+    完整重建后 meta 表记录水位线 (updated_at 时间), 之后只需获取更新时间不早于
+    水位线的条目并合并到索引中即可。
+    """
+
+    def __init__(self, drive_id, path=None, ttl=DEFAULT_INDEX_TTL):
+        """
+        :param drive_id: 云盘ID, 每个云盘使用单独的索引文件
+        :param path: 数据库路径, 默认为 ~/.aliyundrive/index_<drive_id>.db
+        :param ttl: 文件夹列表的有效期(秒)
+        """
+        self.path = path or os.path.join(str(Path.home()), '.aliyundrive', f'index_{drive_id}.db')
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS files (
+                file_id TEXT PRIMARY KEY,
+                parent_file_id TEXT,
+                name TEXT,
+                type TEXT,
+                size INTEGER,
+                content_hash TEXT,
+                updated_at TEXT
+            );
+            CREATE INDEX IF NOT EXISTS files_parent ON files (parent_file_id, name);
+            CREATE INDEX IF NOT EXISTS files_name ON files (name);
+            CREATE TABLE IF NOT EXISTS folders (
+                file_id TEXT PRIMARY KEY,
+                listed_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        ''')
+        self._conn.commit()
+
+    def children(self, parent_file_id):
+        """
+        获取文件夹的子项
+        :param parent_file_id: 父文件夹ID
+        :return: 文件列表, 未索引或已过期时返回 None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT listed_at FROM folders WHERE file_id = ?', (parent_file_id,)
+            ).fetchone()
+            if row is None or row['listed_at'] + self.ttl < time.time():
+                return None
+            rows = self._conn.execute(
+                'SELECT * FROM files WHERE parent_file_id = ? ORDER BY name', (parent_file_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def replace_children(self, parent_file_id, items):
+        """
+        用完整的列表结果替换文件夹的子项
+        :param parent_file_id: 父文件夹ID
+        :param items: file/list 返回的 items
+        """
+        new_ids = {item['file_id'] for item in items}
+        with self._lock:
+            removed = [row['file_id'] for row in self._conn.execute(
+                "SELECT file_id FROM files WHERE parent_file_id = ? AND type = 'folder'", (parent_file_id,)
+            ) if row['file_id'] not in new_ids]
+            self._delete_subtrees(removed)
+            self._conn.execute('DELETE FROM files WHERE parent_file_id = ?', (parent_file_id,))
+            self._conn.executemany(
+                f'INSERT OR REPLACE INTO files ({", ".join(_FIELDS)}) VALUES ({", ".join("?" * len(_FIELDS))})',
+                [tuple(item.get(field) for field in _FIELDS) for item in items]
+            )
+            self._conn.execute(
+                'INSERT OR REPLACE INTO folders (file_id, listed_at) VALUES (?, ?)',
+                (parent_file_id, time.time())
+            )
+            self._conn.commit()
+
+    def _delete_subtrees(self, folder_ids):
+        """删除已不存在的文件夹下的所有条目, 调用时需持有锁"""
+        while folder_ids:
+            file_id = folder_ids.pop()
+            folder_ids.extend(row['file_id'] for row in self._conn.execute(
+                "SELECT file_id FROM files WHERE parent_file_id = ? AND type = 'folder'", (file_id,)
+            ))
+            self._conn.execute('DELETE FROM files WHERE parent_file_id = ?', (file_id,))
+            self._conn.execute('DELETE FROM folders WHERE file_id = ?', (file_id,))
+
+    def remove(self, file_ids):
+        """
+        删除文件/文件夹及文件夹下的所有条目, 在移入回收站或彻底删除后调用
+        :param file_ids: 文件ID列表
+        """
+        with self._lock:
+            self._delete_subtrees(list(file_ids))
+            self._conn.executemany('DELETE FROM files WHERE file_id = ?', [(file_id,) for file_id in file_ids])
+            self._conn.commit()
+
+    def move(self, file_ids, to_parent_file_id):
+        """
+        更新移动后的父文件夹, 文件夹下的条目不受影响
+        :param file_ids: 文件ID列表
+        :param to_parent_file_id: 目标文件夹ID
+        """
+        with self._lock:
+            self._conn.executemany('UPDATE files SET parent_file_id = ? WHERE file_id = ?',
+                                   [(to_parent_file_id, file_id) for file_id in file_ids])
+            self._conn.commit()
+
+    def invalidate(self, parent_file_id):
+        """
+        标记文件夹的子项已过期, 在文件夹内创建或删除文件后调用
+        :param parent_file_id: 父文件夹ID
+        """
+        with self._lock:
+            self._conn.execute('UPDATE folders SET listed_at = 0 WHERE file_id = ?', (parent_file_id,))
+            self._conn.commit()
+
+    def get(self, file_id):
+        """
+        获取索引中的文件信息
+        :param file_id: 文件ID
+        :return: 文件信息, 不在索引中时返回 None
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM files WHERE file_id = ?', (file_id,)).fetchone()
+        return dict(row) if row else None
+
+    def stale_folders(self):
+        """
+        获取已索引但已过期的文件夹
+        :return: file_id 列表
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT file_id FROM folders WHERE listed_at < ?', (time.time() - self.ttl,)
+            ).fetchall()
+        return [row['file_id'] for row in rows]
+
+    def search(self, name):
+        """
+        按文件名搜索, 不区分大小写
+        :param name: 文件名中包含的关键字
+        :return: 文件列表
+        """
+        keyword = name.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM files WHERE name LIKE ? ESCAPE '\\' ORDER BY updated_at DESC",
+                (f'%{keyword}%',)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    @property
+    def built_at(self):
+        """最近一次完整重建索引的时间, 从未重建时为 None"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'built_at'").fetchone()
+        return float(row['value']) if row else None
+
+    @property
+    def watermark(self):
+        """增量更新的水位线, 未完整重建过时为 None"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'watermark'").fetchone()
+        return row['value'] if row else None
+
+    @staticmethod
+    def make_watermark(started_at):
+        """
+        生成与 updated_at 格式相同的水位线
+        :param started_at: 获取开始的时间戳
+        :return: str, 如 2024-01-01T00:00:00.000Z
+        """
+        return time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(started_at - WATERMARK_MARGIN))
+
+    def rebuild(self, list_children, root_id='root'):
+        """
+        从云盘重新获取整个目录树
+        :param list_children: 获取文件夹完整子项的函数, 参数为文件夹ID
+        :param root_id: 起始文件夹ID
+        :return: 索引的文件/文件夹数量
+        """
+        started_at = time.time()
+        with self._lock:
+            # 获取中途出错时索引不再被视为完整, 搜索会回退到云盘
+            self._conn.executescript('DELETE FROM files; DELETE FROM folders; DELETE FROM meta;')
+            self._conn.commit()
+        count = self._crawl([root_id], list_children)
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', [
+                ('built_at', str(time.time())),
+                ('watermark', self.make_watermark(started_at)),
+            ])
+            self._conn.commit()
+        return count
+
+    def apply_changes(self, items, watermark):
+        """
+        合并增量获取到的新增或修改的条目, 并更新水位线
+        :param items: 更新时间不早于旧水位线的文件信息
+        :param watermark: 新的水位线
+        :return: 合并的条目数
+        """
+        with self._lock:
+            # 移动过的条目直接更新 parent_file_id, 其子项随之移动
+            self._conn.executemany(
+                f'INSERT OR REPLACE INTO files ({", ".join(_FIELDS)}) VALUES ({", ".join("?" * len(_FIELDS))})',
+                [tuple(item.get(field) for field in _FIELDS) for item in items]
+            )
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('watermark', ?)", (watermark,))
+            self._conn.commit()
+        return len(items)
+
+    def refresh(self, list_children):
+        """
+        重新获取所有已过期的文件夹
+        :param list_children: 获取文件夹完整子项的函数, 参数为文件夹ID
+        :return: 重新获取的文件夹数量
+        """
+        stale = self.stale_folders()
+        for file_id in stale:
+            items = list_children(file_id)
+            self.replace_children(file_id, items)
+            # 新出现的子文件夹还没有索引, 需要完整获取
+            new_folders = [item['file_id'] for item in items
+                           if item['type'] == 'folder' and not self._is_indexed(item['file_id'])]
+            self._crawl(new_folders, list_children)
+        return len(stale)
+
+    def _is_indexed(self, file_id):
+        with self._lock:
+            return self._conn.execute(
+                'SELECT 1 FROM folders WHERE file_id = ?', (file_id,)
+            ).fetchone() is not None
+
+    def _crawl(self, folder_ids, list_children):
+        """逐层获取文件夹, 返回获取到的条目数"""
+        count = 0
+        while folder_ids:
+            file_id = folder_ids.pop()
+            items = list_children(file_id)
+            self.replace_children(file_id, items)
+            count += len(items)
+            folder_ids.extend(item['file_id'] for item in items if item['type'] == 'folder')
+        return count
+
+    def clear(self):
+        """清空索引"""
+        with self._lock:
+            self._conn.executescript('DELETE FROM files; DELETE FROM folders; DELETE FROM meta;')
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
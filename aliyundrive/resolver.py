@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+云盘路径到 file_id 的解析与缓存
+"""
+
+import threading
+
+
+class _Node:
+    """路径树中的一个文件夹"""
+
+    __slots__ = ('file_id', 'children', 'lock')
+
+    def __init__(self, file_id=None):
+        self.file_id = file_id
+        self.children = {}
+        self.lock = threading.Lock()
+
+
+class RemotePathResolver:
+    """
+    将云盘文件夹路径解析为 file_id, 不存在的文件夹会被创建
+
+    已解析的路径缓存在内存中的树里, 每个文件夹只创建一次。多个线程同时解析同一路径时,
+    只有一个线程会调用 create_folder, 其他线程等待其结果。
+    """
+
+    def __init__(self, api):
+        """
+        :param api: AliyunDriveApi 实例
+        """
+        self.api = api
+        self._root = _Node('root')
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _split(path):
+        return [part for part in path.strip('/').split('/') if part]
+
+    def resolve(self, path):
+        """
+        获取文件夹的 file_id, 路径中不存在的文件夹会被依次创建
+        :param path: 文件夹路径，格式：xxx/xxx/xxx
+        :return: str
+        """
+        node = self._root
+        for name in self._split(path):
+            node = self._get_child(node, name)
+        return node.file_id
+
+    def lookup(self, path):
+        """
+        只查询缓存, 不创建文件夹
+        :param path: 文件夹路径
+        :return: file_id, 不在缓存中时返回 None
+        """
+        node = self._root
+        with self._lock:
+            for name in self._split(path):
+                node = node.children.get(name)
+                if node is None:
+                    return None
+        return node.file_id
+
+    def remember(self, path, file_id):
+        """
+        将已知的文件夹 file_id 写入缓存
+        :param path: 文件夹路径
+        :param file_id: 文件夹ID
+        """
+        parts = self._split(path)
+        if not parts:
+            return
+        node = self._root
+        with self._lock:
+            for name in parts:
+                node = node.children.setdefault(name, _Node())
+            node.file_id = file_id
+
+    def forget(self, path):
+        """
+        删除文件夹及其子文件夹的缓存, 文件夹被删除或移动后调用
+        :param path: 文件夹路径
+        """
+        parts = self._split(path)
+        if not parts:
+            return
+        node = self._root
+        with self._lock:
+            for name in parts[:-1]:
+                node = node.children.get(name)
+                if node is None:
+                    return
+            node.children.pop(parts[-1], None)
+
+    def forget_file_ids(self, file_ids):
+        """
+        删除指定 file_id 的文件夹及其子文件夹的缓存
+        :param file_ids: 被删除或移动的 file_id
+        """
+        file_ids = set(file_ids)
+        with self._lock:
+            stack = [self._root]
+            while stack:
+                node = stack.pop()
+                for name in [name for name, child in node.children.items() if child.file_id in file_ids]:
+                    del node.children[name]
+                stack.extend(node.children.values())
+
+    def _get_child(self, node, name):
+        """获取子文件夹, 不在缓存中时创建 (create_folder 对已存在的文件夹会直接返回其 file_id)"""
+        with self._lock:
+            child = node.children.get(name)
+            if child is None:
+                child = node.children[name] = _Node()
+        if child.file_id is None:
+            with child.lock:
+                if child.file_id is None:
+                    res = self.api.create_folder(name, node.file_id)
+                    if not res.get('file_id'):
+                        raise RuntimeError(f"创建文件夹失败: {name}: {res.get('message') or res.get('code')}")
+                    child.file_id = res['file_id']
+        return child
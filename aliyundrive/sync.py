@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+本地目录与云盘文件夹的单向同步
+"""
+
+import os
+import shutil
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .download import RangedDownloader
+from .upload import DEFAULT_FOLDER_WORKERS
+from .walk import TreeWalker
+
+SyncAction = namedtuple('SyncAction', ['op', 'path', 'reason', 'local_path', 'remote'])
+SyncAction.__doc__ = """
+同步计划中的一项操作
+
+op 为 upload / download / mkdir / mkdir_remote / delete_remote / delete_local / skip,
+mkdir 在本地创建文件夹, mkdir_remote 在云盘创建文件夹,
+reason 为 new / changed / deleted / unchanged, path 为相对同步根目录的路径,
+remote 为云盘中对应的文件信息 (不存在时为 None)。
+"""
+
+SyncResult = namedtuple('SyncResult', ['action', 'success', 'error'])
+SyncResult.__doc__ = """同步中单项操作的结果"""
+
+
+def scan_local(root):
+    """
+    获取本地目录的清单
+
+    不进入指向文件夹的符号链接, 避免链接成环时无限遍历。任意一个文件夹无法读取时抛出 OSError,
+    与云盘清单一样, 不完整的清单会让其中缺失的条目被当作已删除。
+    :param root: 本地目录
+    :return: ({相对路径: (绝对路径, 大小)}, {相对路径的文件夹集合})
+    """
+    files, dirs = {}, set()
+    stack = ['']
+    while stack:
+        rel_dir = stack.pop()
+        with os.scandir(os.path.join(root, rel_dir)) as entries:
+            for entry in entries:
+                rel_path = f'{rel_dir}/{entry.name}' if rel_dir else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.add(rel_path)
+                    stack.append(rel_path)
+                elif entry.is_file():
+                    files[rel_path] = (entry.path, entry.stat().st_size)
+    return files, dirs
+
+
+def _under_deleted(path, deleted_dirs):
+    """路径是否位于已计划删除的文件夹中"""
+    parts = path.split('/')
+    return any('/'.join(parts[:i]) in deleted_dirs for i in range(1, len(parts)))
+
+
+class DriveSync:
+    """
+    单向同步: 按相对路径比较本地清单和云盘列表, 只传输新增或修改的文件
+
+    大小不同视为已修改; 大小相同时比较 SHA1, 本地 SHA1 由 HashCache 缓存,
+    未修改的文件不会被重新计算, 因此同步耗时取决于变更的文件而不是目录大小。
+    """
+
+    def __init__(self, api, max_workers=DEFAULT_FOLDER_WORKERS):
+        """
+        :param api: AliyunDriveApi 实例
+        :param max_workers: 同时传输的文件数, 同时也是遍历云盘时的并发数
+        """
+        self.api = api
+        self.max_workers = max_workers
+
+    def _scan_remote(self, remote_root, folder_id=None):
+        """
+        获取云盘文件夹的清单, 文件夹不存在时返回空清单
+
+        任意一个文件夹获取失败时抛出异常, 不会返回不完整的清单,
+        否则缺失的条目会被当作已删除, 同步计划中会出现错误的删除操作。
+        :param remote_root: 云盘文件夹路径, 为 None 时必须提供 folder_id
+        :param folder_id: 已知的文件夹ID, 提供时不再按路径查找
+        :return: ({相对路径: 文件信息}, {相对路径: 文件夹信息})
+        """
+        files, dirs = {}, {}
+        if remote_root is not None:
+            remote_root = remote_root.strip('/')
+            if remote_root == 'root':
+                remote_root = ''
+        if folder_id is None:
+            folder_id = 'root'
+            if remote_root:
+                folder = self.api.get_file_by_path(remote_root)
+                if not folder or folder['type'] != 'folder':
+                    return files, dirs
+                folder_id = folder['file_id']
+
+        for path, entry in TreeWalker(self.api, self.max_workers).walk(folder_id):
+            if entry['type'] == 'folder':
+                dirs[path] = entry
+                # 上传时直接使用已知的文件夹ID, 不再逐级调用 create_folder
+                if remote_root is not None:
+                    self.api.resolver.remember('/'.join(p for p in (remote_root, path) if p), entry['file_id'])
+            else:
+                files[path] = entry
+        return files, dirs
+
+    def _is_same(self, local_path, size, remote):
+        """本地文件与云盘文件内容是否相同"""
+        if size != remote.get('size'):
+            return False
+        content_hash = remote.get('content_hash')
+        return bool(content_hash) and self.api.hash_cache.sha1(local_path).upper() == content_hash.upper()
+
+    def plan_push(self, local_root, remote_root, delete=False):
+        """
+        生成本地到云盘的同步计划
+        :param local_root: 本地目录
+        :param remote_root: 云盘文件夹路径
+        :param delete: 是否删除云盘中本地已不存在的文件和文件夹
+        :return: [SyncAction, ...]
+        """
+        local_files, local_dirs = scan_local(local_root)
+        remote_files, remote_dirs = self._scan_remote(remote_root)
+
+        # 空文件夹也要在云盘创建, 保持目录结构一致
+        plan = [SyncAction('mkdir_remote', path, 'new', os.path.join(local_root, *path.split('/')), None)
+                for path in sorted(local_dirs) if path not in remote_dirs]
+        for path in sorted(local_files):
+            local_path, size = local_files[path]
+            remote = remote_files.get(path)
+            if remote is None:
+                plan.append(SyncAction('upload', path, 'new', local_path, None))
+            elif not self._is_same(local_path, size, remote):
+                plan.append(SyncAction('upload', path, 'changed', local_path, remote))
+            else:
+                plan.append(SyncAction('skip', path, 'unchanged', local_path, remote))
+
+        if delete:
+            deleted_dirs = set()
+            for path in sorted(remote_dirs):
+                if path not in local_dirs and not _under_deleted(path, deleted_dirs):
+                    deleted_dirs.add(path)
+                    plan.append(SyncAction('delete_remote', path, 'deleted', None, remote_dirs[path]))
+            for path in sorted(remote_files):
+                if path not in local_files and not _under_deleted(path, deleted_dirs):
+                    plan.append(SyncAction('delete_remote', path, 'deleted', None, remote_files[path]))
+        return plan
+
+    def plan_pull(self, remote_root, local_root, delete=False, folder_id=None):
+        """
+        生成云盘到本地的同步计划
+        :param remote_root: 云盘文件夹路径, 提供 folder_id 时可以为 None
+        :param local_root: 本地目录
+        :param delete: 是否删除本地中云盘已不存在的文件和文件夹
+        :param folder_id: 已知的云盘文件夹ID, 提供时不再按路径查找
+        :return: [SyncAction, ...]
+        """
+        remote_files, remote_dirs = self._scan_remote(remote_root, folder_id)
+        local_files, local_dirs = scan_local(local_root) if os.path.isdir(local_root) else ({}, set())
+
+        # 空文件夹也要在本地创建, 保持目录结构一致
+        plan = [SyncAction('mkdir', path, 'new', os.path.join(local_root, *path.split('/')), remote_dirs[path])
+                for path in sorted(remote_dirs) if path not in local_dirs]
+        for path in sorted(remote_files):
+            remote = remote_files[path]
+            local_path = os.path.join(local_root, *path.split('/'))
+            if path not in local_files:
+                plan.append(SyncAction('download', path, 'new', local_path, remote))
+            elif not self._is_same(local_path, local_files[path][1], remote):
+                plan.append(SyncAction('download', path, 'changed', local_path, remote))
+            else:
+                plan.append(SyncAction('skip', path, 'unchanged', local_path, remote))
+
+        if delete:
+            deleted_dirs = set()
+            for path in sorted(local_dirs):
+                if path not in remote_dirs and not _under_deleted(path, deleted_dirs):
+                    deleted_dirs.add(path)
+                    plan.append(SyncAction('delete_local', path, 'deleted',
+                                           os.path.join(local_root, *path.split('/')), None))
+            for path in sorted(local_files):
+                if path not in remote_files and not _under_deleted(path, deleted_dirs):
+                    plan.append(SyncAction('delete_local', path, 'deleted', local_files[path][0], None))
+        return plan
+
+    def apply(self, plan, remote_root='', permanent=False):
+        """
+        执行同步计划, 单项失败不会中断其余操作
+        :param plan: plan_push 或 plan_pull 的结果
+        :param remote_root: 云盘文件夹路径, 上传时使用
+        :param permanent: 删除云盘文件时是否彻底删除而不是移入回收站
+        :return: [SyncResult, ...]
+        """
+        results = [SyncResult(action, True, None) for action in plan if action.op == 'skip']
+        for action in plan:
+            if action.op == 'mkdir':
+                try:
+                    os.makedirs(action.local_path, exist_ok=True)
+                    results.append(SyncResult(action, True, None))
+                except OSError as e:
+                    results.append(SyncResult(action, False, str(e)))
+
+        remote_deletes = [action for action in plan if action.op == 'delete_remote']
+        if remote_deletes:
+            file_ids = [action.remote['file_id'] for action in remote_deletes]
+            responses = self.api.bulk_delete(file_ids) if permanent else self.api.bulk_trash(file_ids)
+            for action, res in zip(remote_deletes, responses):
+                error = res.get('message') or res.get('code') or None
+                if error is None and (res.get('status') or 200) >= 400:
+                    error = f"HTTP {res['status']}"
+                results.append(SyncResult(action, error is None, error))
+
+        remote_mkdirs = [action for action in plan if action.op == 'mkdir_remote']
+        if remote_mkdirs:
+            root = remote_root.strip('/')
+            paths = ['/'.join(p for p in (root, action.path) if p) for action in remote_mkdirs]
+            # 创建的文件夹会写入 resolver, 之后上传到这些文件夹时不再逐级查找
+            ids = self.api.bulk_create_folders(paths)
+            for action, path in zip(remote_mkdirs, paths):
+                results.append(SyncResult(action, True, None) if ids.get(path)
+                               else SyncResult(action, False, f'创建文件夹失败: {path}'))
+
+        transfers = [action for action in plan if action.op in ('upload', 'download')]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results.extend(executor.map(lambda action: self._transfer(action, remote_root), transfers))
+
+        for action in plan:
+            if action.op == 'delete_local':
+                results.append(self._delete_local(action))
+        return results
+
+    def _transfer(self, action, remote_root):
+        try:
+            if action.op == 'upload':
+                parent = '/'.join(p for p in (remote_root.strip('/'), os.path.dirname(action.path)) if p)
+                res = self.api.upload_file(action.local_path, parent or None, check_name_mode='overwrite')
+                if isinstance(res, dict) and res.get('code'):
+                    raise RuntimeError(res.get('message') or res['code'])
+            else:
+                os.makedirs(os.path.dirname(action.local_path), exist_ok=True)
+                downloader = RangedDownloader(self.api, self.api.download_workers)
+                downloader.download(action.remote['file_id'], action.remote['size'], action.local_path,
+                                    content_hash=action.remote.get('content_hash'))
+            return SyncResult(action, True, None)
+        except Exception as e:
+            return SyncResult(action, False, str(e))
+
+    @staticmethod
+    def _delete_local(action):
+        try:
+            if os.path.isdir(action.local_path):
+                shutil.rmtree(action.local_path)
+            else:
+                os.remove(action.local_path)
+            return SyncResult(action, True, None)
+        except OSError as e:
+            return SyncResult(action, False, str(e))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+access token 管理
+"""
+
+import threading
+import time
+
+import requests
+
+from .utils.http import API_HEADERS
+from .utils.retry import API_WRITE_RETRY
+
+# 距离过期不足该秒数时提前刷新
+REFRESH_MARGIN = 300
+# 提前刷新失败后, 等待该秒数再尝试
+RETRY_INTERVAL = 60
+
+
+class TokenManager:
+    """
+    线程安全的 access token 管理器
+
+    记录 token 的过期时间并在过期前主动刷新, 请求不会因为 token 过期而失败后重试。
+    多个线程同时需要刷新时只发送一次刷新请求, 其他线程等待并使用新的 token。
+    """
+
+    def __init__(self, api, access_token, refresh_token, expires_at=None, on_refresh=None):
+        """
+        :param api: AliyunDriveApi 实例, 使用其连接池和 token_api
+        :param access_token: 当前的 access token
+        :param refresh_token: 当前的 refresh token
+        :param expires_at: access token 的过期时间戳, 未知时第一次使用前会先刷新
+        :param on_refresh: 刷新成功后调用, 参数为 (access_token, refresh_token, expires_at), 用于保存到配置文件
+        """
+        self.api = api
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.expires_at = expires_at
+        self.on_refresh = on_refresh
+        self._lock = threading.Lock()
+        self._retry_at = 0
+
+    def get_token(self):
+        """
+        获取可用的 access token, 即将过期时先刷新
+        :return: str
+        """
+        if self._expiring() and time.time() >= self._retry_at:
+            with self._lock:
+                # 等待锁的期间其他线程可能已经刷新, 持有锁后重新检查
+                if self._expiring() and time.time() >= self._retry_at and not self._refresh_locked():
+                    self._retry_at = time.time() + RETRY_INTERVAL
+        return self.access_token
+
+    def _expiring(self):
+        """access token 是否即将过期"""
+        expires_at = self.expires_at
+        return expires_at is None or expires_at - REFRESH_MARGIN <= time.time()
+
+    def refresh(self, expired_token=None):
+        """
+        刷新 access token
+        :param expired_token: 调用方认为已失效的 token, 若已被其他线程刷新则直接返回
+        :return: bool, 是否刷新成功
+        """
+        with self._lock:
+            if expired_token is not None and expired_token != self.access_token:
+                return True
+            return self._refresh_locked()
+
+    def _refresh_locked(self):
+        """发送刷新请求并记录耗时, 调用时需持有锁"""
+        start = time.perf_counter()
+        success = self._request_token()
+        self.api.http.metrics.record_token_refresh(success, time.perf_counter() - start)
+        return success
+
+    def _request_token(self):
+        """发送刷新请求并更新 token, 调用时需持有锁"""
+        try:
+            # refresh token 使用后可能随即失效, 读取超时后重发可能用旧的 refresh token 再刷新一次,
+            # 因此按写接口的策略只在限流时重试
+            res = self.api.http.post_json(self.api.token_api, {"refresh_token": self.refresh_token},
+                                          headers=API_HEADERS, policy=API_WRITE_RETRY, endpoint='token/refresh')
+        except (requests.RequestException, ValueError):
+            # 提前刷新失败时继续使用当前 token, 由调用方决定如何处理
+            return False
+        if not res.get('access_token'):
+            return False
+        # 先更新过期时间, 不持有锁读取的线程看到新 token 时过期时间一定也是新的
+        self.expires_at = time.time() + int(res.get('expires_in', 7200))
+        self.access_token = res['access_token']
+        self.refresh_token = res.get('refresh_token') or self.refresh_token
+        if self.on_refresh:
+            self.on_refresh(self.access_token, self.refresh_token, self.expires_at)
+        return True
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分片并发上传
+"""
+
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from tqdm import tqdm
+
+from .utils.buffer import FileBody
+from .utils.http import TRANSFER_TIMEOUT
+from .utils.progress import ThrottledProgress
+from .utils.retry import TRANSFER_RETRY, is_throttled
+
+DEFAULT_PART_SIZE = 10 * 1024 * 1024
+DEFAULT_UPLOAD_WORKERS = 4
+DEFAULT_FOLDER_WORKERS = 4
+# 阿里云盘单个文件最多 10000 个分片
+MAX_PART_COUNT = 10000
+# 单个分片上传地址过期或请求失败时的最大重试次数
+MAX_PART_RETRIES = TRANSFER_RETRY.max_retries
+
+
+def calc_part_size(file_size, part_size=DEFAULT_PART_SIZE):
+    """
+    计算实际使用的分片大小, 保证分片数不超过上限
+    :param file_size: 文件大小
+    :param part_size: 期望的分片大小
+    :return: int
+    """
+    return max(part_size, math.ceil(file_size / MAX_PART_COUNT))
+
+
+def make_part_info_list(file_size, part_size=DEFAULT_PART_SIZE):
+    """
+    生成创建文件时使用的 part_info_list
+    :param file_size: 文件大小
+    :param part_size: 期望的分片大小
+    :return: list
+    """
+    part_size = calc_part_size(file_size, part_size)
+    part_count = max(1, math.ceil(file_size / part_size))
+    return [{'part_number': i} for i in range(1, part_count + 1)]
+
+
+UploadResult = namedtuple('UploadResult', ['path', 'parent', 'success', 'error'])
+UploadResult.__doc__ = """文件夹上传中单个文件的结果"""
+
+
+def iter_local_files(path, onerror=None):
+    """
+    遍历本地目录下的所有文件, 边遍历边返回, 不递归
+
+    不进入指向文件夹的符号链接, 避免链接成环时无限遍历。
+    :param path: 目录或文件路径
+    :param onerror: 无法读取某个文件夹时调用, 参数为 (文件夹路径, OSError), 之后继续遍历其余文件夹;
+                    为 None 时抛出异常
+    :return: 文件路径的生成器
+    """
+    if not os.path.isdir(path):
+        yield path
+        return
+    stack = [path]
+    while stack:
+        dir_path = stack.pop()
+        try:
+            with os.scandir(dir_path) as entries:
+                entries = sorted(entries, key=lambda e: e.name)
+        except OSError as e:
+            if onerror is None:
+                raise
+            onerror(dir_path, e)
+            continue
+        dirs = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                dirs.append(entry.path)
+            elif entry.is_file():
+                yield entry.path
+        stack.extend(reversed(dirs))
+
+
+def _is_url_expired(response):
+    """OSS 上传地址过期时返回 403 AccessDenied"""
+    return response.status_code == 403 and 'AccessDenied' in response.text
+
+
+class MultipartUploader:
+    """分片并发上传器"""
+
+    def __init__(self, api, part_size=DEFAULT_PART_SIZE, max_workers=DEFAULT_UPLOAD_WORKERS):
+        """
+        :param api: AliyunDriveApi 实例
+        :param part_size: 分片大小
+        :param max_workers: 并发上传的分片数
+        """
+        self.api = api
+        self.part_size = part_size
+        self.max_workers = max_workers
+
+    def upload(self, filepath, file_id, upload_id, part_info_list, file_size, on_part=None):
+        """
+        并发上传分片
+        :param filepath: 本地文件路径
+        :param file_id: file/create 返回的 file_id
+        :param upload_id: file/create 返回的 upload_id
+        :param part_info_list: 需要上传的分片及其上传地址, 续传时只包含未完成的分片
+        :param file_size: 文件大小
+        :param on_part: 每个分片上传完成后调用, 参数为分片序号
+        """
+        part_size = calc_part_size(file_size, self.part_size)
+        pending_size = sum(min(part_size, file_size - (part['part_number'] - 1) * part_size)
+                           for part in part_info_list)
+        progress = ThrottledProgress(tqdm(desc='上传中...', total=file_size, initial=file_size - pending_size,
+                                          unit='iB', unit_scale=True, unit_divisor=1024))
+
+        with progress, ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(self._upload_part, filepath, file_id, upload_id,
+                                part, part_size, file_size, progress.update)
+                for part in part_info_list
+            ]
+            try:
+                for future in as_completed(futures):
+                    part_number = future.result()
+                    if on_part:
+                        on_part(part_number)
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def _upload_part(self, filepath, file_id, upload_id, part, part_size, file_size, update):
+        """上传单个分片, 地址过期时刷新后重试, 限流、服务端错误和网络错误时退避重试"""
+        part_number = part['part_number']
+        upload_url = part['upload_url']
+        offset = (part_number - 1) * part_size
+        length = min(part_size, file_size - offset)
+        limiter = self.api.http.oss_limiter
+        buffer_pool = self.api.http.buffer_pool
+        metrics = self.api.http.metrics
+
+        for attempt in range(MAX_PART_RETRIES + 1):
+            sent = [0]
+
+            def callback(n):
+                sent[0] += n
+                update(n)
+
+            start = time.perf_counter()
+            try:
+                # 缓冲区在请求结束后才放回, 同时上传的分片数受缓冲区内存上限约束
+                with limiter.slot(), buffer_pool.buffer() as buffer, open(filepath, 'rb', buffering=0) as f:
+                    start = time.perf_counter()
+                    data = FileBody(f, offset, length, buffer, callback=callback)
+                    res = self.api.http.oss.put(upload_url, data=data if length else b'', timeout=TRANSFER_TIMEOUT)
+                metrics.record_request('oss:put', res.status_code, time.perf_counter() - start, sent[0], attempt)
+            except requests.RequestException as e:
+                metrics.record_request('oss:put', type(e).__name__, time.perf_counter() - start, sent[0], attempt)
+                update(-sent[0])
+                if attempt >= MAX_PART_RETRIES or not TRANSFER_RETRY.should_retry_error(e):
+                    raise
+                if isinstance(e, requests.Timeout):
+                    limiter.on_throttle()
+                time.sleep(TRANSFER_RETRY.delay(attempt))
+                continue
+            # 分片已存在视为上传成功
+            if res.ok or res.status_code == 409:
+                limiter.on_success()
+                return part_number
+            update(-sent[0])
+            if attempt < MAX_PART_RETRIES and _is_url_expired(res):
+                upload_url = self.api.get_upload_url(file_id, upload_id, [part_number])[0]['upload_url']
+                continue
+            if attempt < MAX_PART_RETRIES and TRANSFER_RETRY.should_retry(res):
+                if is_throttled(res):
+                    limiter.on_throttle()
+                time.sleep(TRANSFER_RETRY.delay(attempt, res))
+                continue
+            res.raise_for_status()
+
+
+class FolderUploader:
+    """文件夹并发上传器, 单个文件失败不会中断整个上传"""
+
+    def __init__(self, api, max_workers=DEFAULT_FOLDER_WORKERS):
+        """
+        :param api: AliyunDriveApi 实例
+        :param max_workers: 同时上传的文件数
+        """
+        self.api = api
+        self.max_workers = max_workers
+
+    def upload(self, folder_path, parent=None):
+        """
+        上传文件夹, 保留目录结构
+        :param folder_path: 本地文件夹路径
+        :param parent: 云盘中的父文件夹路径，格式：xxx/xxx/xxx
+        :return: [UploadResult, ...]
+        """
+        base = os.path.dirname(os.path.abspath(folder_path))
+        results = []
+        # 限制已提交但未完成的任务数, 避免遍历大目录时一次性提交所有文件
+        slots = threading.BoundedSemaphore(self.max_workers * 2)
+
+        def to_remote(local_dir):
+            remote_dir = os.path.relpath(os.path.abspath(local_dir), base)
+            remote_dir = '' if remote_dir == '.' else remote_dir.replace(os.sep, '/')
+            if parent:
+                remote_dir = '/'.join(p for p in (parent.strip('/'), remote_dir) if p)
+            return remote_dir
+
+        def on_done(future):
+            results.append(future.result())
+            slots.release()
+
+        def on_error(dir_path, error):
+            # 无法读取的文件夹记为一项失败, 其余文件照常上传
+            results.append(UploadResult(dir_path, to_remote(dir_path), False, str(error)))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for path in iter_local_files(folder_path, on_error):
+                slots.acquire()
+                executor.submit(self._upload_one, path, to_remote(os.path.dirname(path))).add_done_callback(on_done)
+        return results
+
+    def _upload_one(self, path, remote_dir):
+        try:
+            res = self.api.upload_file(path, remote_dir)
+            if isinstance(res, dict) and res.get('code'):
+                raise RuntimeError(res.get('message') or res['code'])
+            return UploadResult(path, remote_dir, True, None)
+        except Exception as e:
+            return UploadResult(path, remote_dir, False, str(e))
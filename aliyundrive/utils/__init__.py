@@ -3,6 +3,16 @@
 """
 
 from .config import Config
-from .file import ChunksIter
+from .file import ChunksIter, PositionalFile
+from .buffer import BufferPool, FileBody
+from .progress import ThrottledProgress
+from .http import HttpSession
+from .retry import RetryPolicy, AdaptiveLimiter
+from .metrics import Metrics, MetricEvent
+from .journal import DownloadJournal, UploadJournal
+from .hashing import HashCache, sha1_file, pre_hash_file, get_proof_code
 
-__all__ = ['Config', 'ChunksIter'] 
\ No newline at end of file
+__all__ = [
+    'Config', 'ChunksIter', 'PositionalFile', 'BufferPool', 'FileBody', 'ThrottledProgress', 'HttpSession', 'RetryPolicy', 'AdaptiveLimiter',
+    'Metrics', 'MetricEvent', 'DownloadJournal', 'UploadJournal', 'HashCache', 'sha1_file', 'pre_hash_file', 'get_proof_code',
+]
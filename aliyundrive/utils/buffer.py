@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+可复用的传输缓冲区
+"""
+
+import threading
+from contextlib import contextmanager
+
+# 单个缓冲区的大小, 也是每次读取文件和发送数据的块大小
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+# 所有传输同时占用的缓冲区内存上限
+DEFAULT_MAX_BUFFER_MEMORY = 64 * 1024 * 1024
+
+
+class BufferPool:
+    """
+    固定大小的缓冲区池
+
+    缓冲区在第一次需要时分配, 用完后放回池中复用, 不会随每次读取产生新的 bytes 对象。
+    缓冲区总数不超过 max_memory / buffer_size, 所有缓冲区都被占用时 acquire 会等待,
+    因此无论同时有多少个传输, 缓冲区占用的内存都有上限。
+    """
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE, max_memory=DEFAULT_MAX_BUFFER_MEMORY):
+        """
+        :param buffer_size: 单个缓冲区的大小
+        :param max_memory: 缓冲区内存上限, 至少可以分配一个缓冲区
+        """
+        self.buffer_size = buffer_size
+        self.max_buffers = max(1, max_memory // buffer_size)
+        self._free = []
+        self._allocated = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """
+        取出一个缓冲区, 没有空闲缓冲区且已达到上限时等待
+        :return: bytearray
+        """
+        with self._cond:
+            while not self._free and self._allocated >= self.max_buffers:
+                self._cond.wait()
+            if self._free:
+                return self._free.pop()
+            self._allocated += 1
+        return bytearray(self.buffer_size)
+
+    def release(self, buffer):
+        """放回缓冲区"""
+        with self._cond:
+            self._free.append(buffer)
+            self._cond.notify()
+
+    @contextmanager
+    def buffer(self):
+        """在 with 语句中占用一个缓冲区"""
+        buffer = self.acquire()
+        try:
+            yield buffer
+        finally:
+            self.release(buffer)
+
+
+class FileBody:
+    """
+    文件中从 offset 开始、长度为 length 的一段, 作为流式请求体
+
+    用 readinto 把数据直接读入给定的缓冲区, 逐块返回缓冲区的 memoryview, 不复制数据。
+    返回的 memoryview 在下一次迭代时会被覆盖, 调用方必须在取下一块之前发送完当前块,
+    requests/urllib3 发送迭代器请求体时就是这样。
+    """
+
+    def __init__(self, file, offset, length, buffer, callback=None):
+        """
+        :param file: 以二进制模式打开的文件对象, 建议使用 buffering=0 以免多一次复制
+        :param offset: 起始位置
+        :param length: 长度
+        :param buffer: 读取使用的缓冲区, 如 BufferPool.acquire 的结果
+        :param callback: 每读取一块后调用, 参数为读取的字节数
+        """
+        self.file = file
+        self.offset = offset
+        self.length = length
+        self.buffer = buffer
+        self.callback = callback
+
+    def __iter__(self):
+        view = memoryview(self.buffer)
+        self.file.seek(self.offset)
+        remaining = self.length
+        while remaining > 0:
+            n = self.file.readinto(view[:min(len(view), remaining)])
+            if not n:
+                raise IOError(f'文件长度不足, 还差 {remaining} 字节')
+            remaining -= n
+            if self.callback:
+                self.callback(n)
+            yield view[:n]
+
+    def __len__(self):
+        return self.length
@@ -5,6 +5,7 @@
 配置文件处理模块
 """
 
+import os
 from configparser import ConfigParser
 
 
@@ -30,6 +31,7 @@ class Config:
         self._access_token = self.config.get('account', 'access_token')
         self._refresh_token = self.config.get('account', 'refresh_token')
         self._drive_id = self.config.get('account', 'drive_id', fallback=None)
+        self._expires_at = self.config.getfloat('account', 'expires_at', fallback=None)
 
     @property
     def access_token(self):
@@ -46,6 +48,27 @@ class Config:
         """获取 drive_id"""
         return self._drive_id
 
+    @property
+    def expires_at(self):
+        """获取 access_token 的过期时间戳, 未知时为 None"""
+        return self._expires_at
+
+    def update_tokens(self, access_token, refresh_token, expires_at=None):
+        """
+        同时更新 access_token、refresh_token 和过期时间, 只写一次文件
+        :param access_token: 新的 access_token
+        :param refresh_token: 新的 refresh_token
+        :param expires_at: access_token 的过期时间戳
+        """
+        self._access_token = access_token
+        self._refresh_token = refresh_token
+        self._expires_at = expires_at
+        self.config.set('account', 'access_token', access_token)
+        self.config.set('account', 'refresh_token', refresh_token)
+        if expires_at is not None:
+            self.config.set('account', 'expires_at', str(expires_at))
+        self._save_config()
+
     def update_access_token(self, access_token):
         """
         更新 access_token
@@ -65,6 +88,8 @@ class Config:
         self._save_config()
 
     def _save_config(self):
-        """保存配置到文件"""
-        with open(self.config_path, 'w') as f:
-            self.config.write(f) 
\ No newline at end of file
+        """保存配置到文件, 先写临时文件再替换, 避免中断时留下不完整的配置"""
+        tmp_path = self.config_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            self.config.write(f)
+        os.replace(tmp_path, self.config_path) 
\ No newline at end of file
@@ -5,6 +5,9 @@
 文件处理工具模块
 """
 
+import os
+import threading
+
 
 class ChunksIter:
     """文件分块迭代器"""
@@ -30,4 +33,47 @@ class ChunksIter:
         return data
 
     def __len__(self):
-        return self.total_size 
\ No newline at end of file
+        return self.total_size
+
+
+class PositionalFile:
+    """支持多线程按位置写入的文件"""
+
+    def __init__(self, path, size=None):
+        """
+        打开(不存在则创建)文件
+        :param path: 文件路径
+        :param size: 预分配的文件大小, 为 None 时不改变文件大小
+        """
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+        self.fd = os.open(path, flags, 0o644)
+        # 不支持 pwrite 的平台(Windows)退化为加锁的 seek + write
+        self._lock = None if hasattr(os, 'pwrite') else threading.Lock()
+        if size is not None:
+            os.ftruncate(self.fd, size)
+
+    def write_at(self, data, offset):
+        """
+        在指定位置写入数据
+        :param data: bytes 或 memoryview
+        :param offset: 写入位置
+        """
+        view = memoryview(data)
+        while view:
+            if self._lock is None:
+                written = os.pwrite(self.fd, view, offset)
+            else:
+                with self._lock:
+                    os.lseek(self.fd, offset, os.SEEK_SET)
+                    written = os.write(self.fd, view)
+            view = view[written:]
+            offset += written
+
+    def close(self):
+        os.close(self.fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
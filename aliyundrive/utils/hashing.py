@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+文件哈希计算与缓存模块
+"""
+
+import base64
+import hashlib
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+# hashlib 处理大于 2KB 的数据时会释放 GIL, 大块读取既减少系统调用也便于多线程并行计算
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+# pre_hash 只计算文件开头的 1KB
+PRE_HASH_SIZE = 1024
+
+
+def sha1_file(filepath, block_size=HASH_BLOCK_SIZE):
+    """
+    计算文件的 SHA1, 使用固定大小的缓冲区按块读取
+    :param filepath: 文件路径
+    :param block_size: 每次读取的字节数
+    :return: 小写十六进制字符串
+    """
+    sha1 = hashlib.sha1()
+    buffer = bytearray(block_size)
+    view = memoryview(buffer)
+    with open(filepath, 'rb', buffering=0) as f:
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            sha1.update(view[:size])
+    return sha1.hexdigest()
+
+
+class HashCache:
+    """
+    本地 SHA1 缓存, 保存在 SQLite 数据库中
+
+    以文件路径为键, 同时记录 inode、大小和修改时间, 任意一项变化即视为文件已修改。
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path: 数据库路径, 默认为 ~/.aliyundrive/hash_cache.db
+        """
+        self.path = path or os.path.join(str(Path.home()), '.aliyundrive', 'hash_cache.db')
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS hashes ('
+            'path TEXT PRIMARY KEY, inode INTEGER, size INTEGER, mtime_ns INTEGER, sha1 TEXT)'
+        )
+        self._conn.commit()
+
+    def get(self, filepath, stat=None):
+        """
+        获取缓存的 SHA1
+        :param filepath: 文件路径
+        :param stat: 已获取的 os.stat 结果
+        :return: SHA1, 无缓存或文件已修改时返回 None
+        """
+        stat = stat or os.stat(filepath)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT inode, size, mtime_ns, sha1 FROM hashes WHERE path = ?',
+                (os.path.abspath(filepath),)
+            ).fetchone()
+        if row and tuple(row[:3]) == (stat.st_ino, stat.st_size, stat.st_mtime_ns):
+            return row[3]
+        return None
+
+    def put(self, filepath, sha1, stat=None):
+        """
+        写入缓存
+        :param filepath: 文件路径
+        :param sha1: 文件 SHA1
+        :param stat: 计算哈希前获取的 os.stat 结果
+        """
+        stat = stat or os.stat(filepath)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO hashes (path, inode, size, mtime_ns, sha1) VALUES (?, ?, ?, ?, ?)',
+                (os.path.abspath(filepath), stat.st_ino, stat.st_size, stat.st_mtime_ns, sha1)
+            )
+            self._conn.commit()
+
+    def sha1(self, filepath):
+        """
+        获取文件 SHA1, 优先使用缓存
+        :param filepath: 文件路径
+        :return: SHA1
+        """
+        stat = os.stat(filepath)
+        sha1 = self.get(filepath, stat)
+        if sha1 is None:
+            sha1 = sha1_file(filepath)
+            self.put(filepath, sha1, stat)
+        return sha1
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def pre_hash_file(filepath, size=PRE_HASH_SIZE):
+    """
+    计算文件开头 size 字节的 SHA1, 用于创建文件时判断是否可能秒传
+    :param filepath: 文件路径
+    :param size: 参与计算的字节数
+    :return: 小写十六进制字符串
+    """
+    with open(filepath, 'rb') as f:
+        return hashlib.sha1(f.read(size)).hexdigest()
+
+
+def get_proof_code(filepath, size, access_token):
+    """
+    计算秒传所需的 proof_code (proof_version v1)
+
+    由 access_token 的 MD5 确定文件中的一个位置, 取该位置开始的 8 个字节做 base64。
+    :param filepath: 文件路径
+    :param size: 文件大小
+    :param access_token: 当前的 access token
+    :return: str
+    """
+    if not size:
+        return ''
+    start = int(hashlib.md5(access_token.encode()).hexdigest()[:16], 16) % size
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        return base64.b64encode(f.read(min(8, size - start))).decode()
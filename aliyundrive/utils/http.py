@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+HTTP 连接池模块
+"""
+
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .buffer import BufferPool, DEFAULT_MAX_BUFFER_MEMORY
+from .metrics import Metrics
+from .retry import AdaptiveLimiter, API_READ_RETRY, is_throttled
+
+DEFAULT_POOL_SIZE = 10
+# (连接超时, 读取超时) 秒
+API_TIMEOUT = (10, 60)
+TRANSFER_TIMEOUT = (10, 120)
+
+API_HEADERS = {
+    "accept": "application/json, text/plain, */*",
+    "content-type": "application/json;charset=UTF-8",
+    "origin": "https://www.aliyundrive.com",
+    "referer": "https://www.aliyundrive.com/",
+    "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4389.128 Safari/537.36"
+}
+
+
+class HttpSession:
+    """
+    带连接池的 HTTP 会话
+
+    API 域名和 OSS 上传/下载域名分别使用独立的连接池, 连接默认保持 keep-alive。
+    连接池由所有线程共享, 每个线程持有自己的 requests.Session (cookie 等状态不共享),
+    因此可以在线程池中直接使用。
+
+    每个连接池带有一个 AdaptiveLimiter, 上传、下载、列表等所有线程池共享,
+    被限流时自动降低实际并发。上传/下载使用的缓冲区同样来自共享的 BufferPool。
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, metrics=None, max_buffer_memory=DEFAULT_MAX_BUFFER_MEMORY):
+        """
+        初始化会话
+        :param pool_size: 每个域名的最大连接数
+        :param metrics: 记录请求统计的 Metrics, 默认新建一个
+        :param max_buffer_memory: 所有传输同时占用的缓冲区内存上限
+        """
+        self.pool_size = pool_size
+        self.metrics = metrics or Metrics()
+        # API 只有少数几个域名, OSS 的上传/下载域名则可能有多个
+        self._api_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self._oss_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=pool_size)
+        self._local = threading.local()
+        self.api_limiter = AdaptiveLimiter(pool_size)
+        self.oss_limiter = AdaptiveLimiter(pool_size)
+        self.buffer_pool = BufferPool(max_memory=max_buffer_memory)
+
+    @property
+    def api(self) -> requests.Session:
+        """访问 API 域名使用的会话"""
+        return self._get_session('api', self._api_adapter)
+
+    @property
+    def oss(self) -> requests.Session:
+        """访问 OSS 上传/下载域名使用的会话"""
+        return self._get_session('oss', self._oss_adapter)
+
+    def post_json(self, url, data, headers=None, policy=API_READ_RETRY, endpoint=None):
+        """
+        发送 JSON 请求, 限流、服务端错误和超时时按策略退避重试
+        :param url: 请求地址
+        :param data: 请求数据
+        :param headers: 请求头
+        :param policy: RetryPolicy
+        :param endpoint: 统计中使用的接口名, 默认为 url
+        :return: 响应的 JSON
+        """
+        limiter = self.api_limiter
+        endpoint = endpoint or url
+        for attempt in range(policy.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                with limiter.slot():
+                    # 不计入等待并发名额的时间
+                    start = time.perf_counter()
+                    res = self.api.post(url, headers=headers, json=data, timeout=API_TIMEOUT)
+                self.metrics.record_request(endpoint, res.status_code, time.perf_counter() - start,
+                                            len(res.content), attempt)
+            except requests.RequestException as e:
+                self.metrics.record_request(endpoint, type(e).__name__, time.perf_counter() - start, 0, attempt)
+                if attempt >= policy.max_retries or not policy.should_retry_error(e):
+                    raise
+                if isinstance(e, requests.Timeout):
+                    limiter.on_throttle()
+                time.sleep(policy.delay(attempt))
+                continue
+            if attempt < policy.max_retries and policy.should_retry(res):
+                if is_throttled(res):
+                    limiter.on_throttle()
+                time.sleep(policy.delay(attempt, res))
+                continue
+            if res.ok:
+                limiter.on_success()
+            return res.json()
+
+    def _get_session(self, name, adapter):
+        session = getattr(self._local, name, None)
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            setattr(self._local, name, session)
+        return session
+
+    def close(self):
+        """关闭所有连接"""
+        self._api_adapter.close()
+        self._oss_adapter.close()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+断点续传记录模块
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+
+def _atomic_write_json(path, data):
+    """先写临时文件再替换, 避免中断时留下损坏的记录"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class DownloadJournal:
+    """
+    下载记录, 保存在 .part 文件旁边, 记录已完成的字节区间
+
+    只有 file_id、size、content_hash 都一致时才会复用已有记录,
+    否则视为新的下载。
+    """
+
+    def __init__(self, path, file_id, size, content_hash=None, ranges=None):
+        """
+        :param path: 记录文件路径
+        :param file_id: 文件ID
+        :param size: 文件大小
+        :param content_hash: 文件 SHA1
+        :param ranges: 已完成的区间 [[start, end], ...], end 不包含在区间内
+        """
+        self.path = path
+        self.file_id = file_id
+        self.size = size
+        self.content_hash = content_hash
+        self.ranges = ranges or []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, file_id, size, content_hash=None):
+        """
+        读取记录, 不存在或与当前文件不符时返回空记录
+        :return: DownloadJournal
+        """
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        if (data.get('file_id'), data.get('size'), data.get('content_hash')) != (file_id, size, content_hash):
+            return cls(path, file_id, size, content_hash)
+        return cls(path, file_id, size, content_hash, data.get('ranges'))
+
+    @property
+    def completed_size(self):
+        """已完成的字节数"""
+        return sum(end - start for start, end in self.ranges)
+
+    def missing_ranges(self):
+        """
+        获取尚未下载的区间
+        :return: [(start, end), ...]
+        """
+        missing = []
+        position = 0
+        for start, end in self.ranges:
+            if start > position:
+                missing.append((position, start))
+            position = max(position, end)
+        if position < self.size:
+            missing.append((position, self.size))
+        return missing
+
+    def add_range(self, start, end):
+        """
+        记录一个已完成的区间并立即保存, 可在多个线程中调用
+        :param start: 起始位置
+        :param end: 结束位置(不包含)
+        """
+        if start >= end:
+            return
+        with self._lock:
+            merged = []
+            for s, e in sorted(self.ranges + [[start, end]]):
+                if merged and s <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], e)
+                else:
+                    merged.append([s, e])
+            self.ranges = merged
+            self.save()
+
+    def save(self):
+        """保存记录"""
+        _atomic_write_json(self.path, {
+            'file_id': self.file_id,
+            'size': self.size,
+            'content_hash': self.content_hash,
+            'ranges': self.ranges,
+        })
+
+    def remove(self):
+        """删除记录文件"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class UploadJournal:
+    """
+    上传记录, 所有未完成的上传保存在同一个 JSON 文件中
+
+    以本地文件路径、大小、修改时间作为键, 记录 file_id、upload_id、分片大小
+    以及已完成的分片序号。文件被修改后键随之变化, 旧记录不再复用。
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path: 记录文件路径, 默认为 ~/.aliyundrive/uploads.json
+        """
+        self.path = path or os.path.join(str(Path.home()), '.aliyundrive', 'uploads.json')
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    @staticmethod
+    def make_key(filepath):
+        """
+        生成本地文件的记录键
+        :param filepath: 本地文件路径
+        :return: str
+        """
+        stat = os.stat(filepath)
+        return f'{os.path.abspath(filepath)}|{stat.st_size}|{stat.st_mtime_ns}'
+
+    def get(self, key):
+        """获取记录, 不存在时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return dict(entry) if entry else None
+
+    def set(self, key, entry):
+        """
+        保存记录, 同一路径的旧记录会被删除
+        :param key: make_key 生成的键
+        :param entry: dict, 包含 file_id、upload_id、parent_file_id、part_size、parts
+        """
+        path = key.rsplit('|', 2)[0]
+        with self._lock:
+            for old_key in [k for k in self._entries if k.rsplit('|', 2)[0] == path]:
+                del self._entries[old_key]
+            self._entries[key] = dict(entry, parts=list(entry.get('parts', [])))
+            self._save()
+
+    def add_part(self, key, part_number):
+        """记录一个已完成的分片, 可在多个线程中调用"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and part_number not in entry['parts']:
+                entry['parts'].append(part_number)
+                self._save()
+
+    def remove(self, key):
+        """删除记录"""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        _atomic_write_json(self.path, self._entries)
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+请求和阶段耗时统计
+"""
+
+import json
+import threading
+import time
+import unicodedata
+from collections import namedtuple
+from contextlib import contextmanager
+
+# 耗时直方图的桶上限(秒)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+MetricEvent = namedtuple('MetricEvent', ['kind', 'name', 'status', 'duration', 'bytes', 'attempt'])
+MetricEvent.__doc__ = """
+传给钩子函数的事件
+
+kind 为 request / phase / token_refresh; request 的 name 为接口 (如 file/list、oss:put),
+status 为 HTTP 状态码或异常类名, attempt 为重试序号 (0 表示第一次请求);
+phase 的 name 为阶段名 (如 hash、create、put、complete), status 为 ok 或 error。
+"""
+
+
+class Histogram:
+    """累计直方图, 与 Prometheus 的 histogram 相同"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """
+        估算分位数, 返回所在桶的上限
+        :param q: 0 到 1 之间的分位
+        :return: float, 超过最大桶时返回 inf
+        """
+        target = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                return self.buckets[i] if i < len(self.buckets) else float('inf')
+        return 0.0
+
+    def to_dict(self):
+        cumulative, seen = {}, 0
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            seen += count
+            cumulative[str(bound)] = seen
+        return {'buckets': cumulative, 'sum': self.sum, 'count': self.count}
+
+
+def _pad(text, width, right=False):
+    """按终端显示宽度补齐空格, 中文字符占两列"""
+    display = sum(2 if unicodedata.east_asian_width(char) in 'WF' else 1 for char in text)
+    padding = ' ' * max(0, width - display)
+    return padding + text if right else text + padding
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+
+
+class Metrics:
+    """
+    汇总请求耗时、状态码、流量、重试和 token 刷新, 以及上传/下载各阶段的耗时
+
+    可以通过 add_hook 注册钩子函数, 每个事件都会以 MetricEvent 调用钩子,
+    钩子在发起请求的线程中同步执行, 应当尽量快且不抛出异常。
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        :param buckets: 耗时直方图的桶上限(秒)
+        """
+        self.buckets = buckets
+        self.started_at = time.time()
+        self._hooks = []
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._requests = {}
+        self._bytes = {}
+        self._retries = {}
+        self._phases = {}
+        self._token_refreshes = {}
+
+    def add_hook(self, hook):
+        """
+        注册钩子函数
+        :param hook: 参数为 MetricEvent 的函数
+        """
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        """移除钩子函数"""
+        self._hooks.remove(hook)
+
+    def _emit(self, event):
+        for hook in self._hooks:
+            hook(event)
+
+    def record_request(self, endpoint, status, duration, nbytes=0, attempt=0):
+        """
+        记录一次请求
+        :param endpoint: 接口名, 如 file/list、oss:put
+        :param status: HTTP 状态码, 请求异常时为异常类名
+        :param duration: 耗时(秒)
+        :param nbytes: 发送或接收的数据量
+        :param attempt: 重试序号, 0 表示第一次请求
+        """
+        with self._lock:
+            self._latency.setdefault(endpoint, Histogram(self.buckets)).observe(duration)
+            key = (endpoint, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            self._bytes[endpoint] = self._bytes.get(endpoint, 0) + nbytes
+            if attempt:
+                self._retries[endpoint] = self._retries.get(endpoint, 0) + 1
+        self._emit(MetricEvent('request', endpoint, status, duration, nbytes, attempt))
+
+    def record_token_refresh(self, success, duration):
+        """
+        记录一次 token 刷新
+        :param success: 是否成功
+        :param duration: 耗时(秒)
+        """
+        result = 'success' if success else 'failure'
+        with self._lock:
+            self._token_refreshes[result] = self._token_refreshes.get(result, 0) + 1
+        self._emit(MetricEvent('token_refresh', 'token/refresh', result, duration, 0, 0))
+
+    @contextmanager
+    def phase(self, name):
+        """
+        在 with 语句中统计一个阶段的耗时
+        :param name: 阶段名, 如 hash、create、put、complete
+        """
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            yield
+            status = 'ok'
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                self._phases.setdefault(name, Histogram(self.buckets)).observe(duration)
+            self._emit(MetricEvent('phase', name, status, duration, 0, 0))
+
+    def snapshot(self):
+        """
+        获取当前的统计结果
+        :return: dict
+        """
+        with self._lock:
+            endpoints = {}
+            for endpoint, histogram in self._latency.items():
+                endpoints[endpoint] = {
+                    'latency': histogram.to_dict(),
+                    'status': {status: count for (name, status), count in self._requests.items()
+                               if name == endpoint},
+                    'bytes': self._bytes.get(endpoint, 0),
+                    'retries': self._retries.get(endpoint, 0),
+                }
+            return {
+                'elapsed': time.time() - self.started_at,
+                'endpoints': endpoints,
+                'phases': {name: histogram.to_dict() for name, histogram in self._phases.items()},
+                'token_refreshes': dict(self._token_refreshes),
+            }
+
+    def to_json(self):
+        """导出为 JSON 字符串"""
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix='aliyundrive'):
+        """
+        导出为 Prometheus 文本格式
+        :param prefix: 指标名前缀
+        :return: str
+        """
+        data = self.snapshot()
+        lines = []
+
+        def histogram(name, help_text, label, items):
+            lines.append(f'# HELP {prefix}_{name} {help_text}')
+            lines.append(f'# TYPE {prefix}_{name} histogram')
+            for key, value in items:
+                for bound, count in value['buckets'].items():
+                    lines.append(f'{prefix}_{name}_bucket{_labels(**{label: key, "le": bound})} {count}')
+                lines.append(f'{prefix}_{name}_sum{_labels(**{label: key})} {value["sum"]}')
+                lines.append(f'{prefix}_{name}_count{_labels(**{label: key})} {value["count"]}')
+
+        def counter(name, help_text, samples):
+            lines.append(f'# HELP {prefix}_{name} {help_text}')
+            lines.append(f'# TYPE {prefix}_{name} counter')
+            for labels, value in samples:
+                lines.append(f'{prefix}_{name}{_labels(**labels)} {value}')
+
+        endpoints = data['endpoints']
+        histogram('request_duration_seconds', 'Request latency in seconds.', 'endpoint',
+                  [(endpoint, value['latency']) for endpoint, value in endpoints.items()])
+        counter('requests_total', 'Requests by endpoint and status.',
+                [({'endpoint': endpoint, 'status': status}, count)
+                 for endpoint, value in endpoints.items() for status, count in value['status'].items()])
+        counter('transfer_bytes_total', 'Bytes sent or received by endpoint.',
+                [({'endpoint': endpoint}, value['bytes']) for endpoint, value in endpoints.items()])
+        counter('request_retries_total', 'Retried requests by endpoint.',
+                [({'endpoint': endpoint}, value['retries']) for endpoint, value in endpoints.items()])
+        counter('token_refreshes_total', 'Access token refreshes by result.',
+                [({'result': result}, count) for result, count in data['token_refreshes'].items()])
+        histogram('phase_duration_seconds', 'Upload and download phase duration in seconds.', 'phase',
+                  data['phases'].items())
+        return '\n'.join(lines) + '\n'
+
+    def format_summary(self):
+        """
+        生成便于阅读的统计摘要
+        :return: str
+        """
+        with self._lock:
+            elapsed = time.time() - self.started_at
+            lines = [_pad('接口', 28) + ''.join(_pad(title, width, right=True) for title, width in (
+                ('请求', 6), ('失败', 6), ('重试', 6), ('平均', 9), ('P95', 9), ('流量', 12)))]
+            total_bytes = 0
+            for endpoint, histogram in sorted(self._latency.items()):
+                errors = sum(count for (name, status), count in self._requests.items()
+                             if name == endpoint and not (str(status).isdigit() and int(status) < 400))
+                nbytes = self._bytes.get(endpoint, 0)
+                total_bytes += nbytes
+                lines.append(f"{endpoint:<28}{histogram.count:>6}{errors:>6}{self._retries.get(endpoint, 0):>6}"
+                             f"{histogram.sum / histogram.count:>8.3f}s{histogram.quantile(0.95):>8.3f}s"
+                             f"{nbytes / 1024 / 1024:>10.1f}MB")
+            for name, histogram in sorted(self._phases.items()):
+                lines.append(f"{_pad('阶段 ' + name, 28)}{histogram.count:>6}{'':>12}"
+                             f"{histogram.sum / histogram.count:>8.3f}s{histogram.quantile(0.95):>8.3f}s")
+            if self._token_refreshes:
+                refreshes = ', '.join(f'{result} {count}' for result, count in self._token_refreshes.items())
+                lines.append(f"token 刷新: {refreshes}")
+            lines.append(f"总耗时 {elapsed:.1f}s, 总流量 {total_bytes / 1024 / 1024:.1f}MB, "
+                         f"平均 {total_bytes / 1024 / 1024 / max(elapsed, 1e-9):.2f}MB/s")
+        return '\n'.join(lines)
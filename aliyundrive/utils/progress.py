@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按时间间隔刷新的进度条
+"""
+
+import threading
+
+# 进度条的刷新间隔(秒)
+DEFAULT_PROGRESS_INTERVAL = 0.5
+
+
+class ThrottledProgress:
+    """
+    包装 tqdm 进度条, 传输线程只累加字节数, 由后台线程定时刷新
+
+    读写循环中调用 update 只是一次加锁的加法, 不涉及计时和终端输出,
+    多个线程同时更新时也不会在 tqdm 内部的锁上竞争。
+    """
+
+    def __init__(self, progress, interval=DEFAULT_PROGRESS_INTERVAL):
+        """
+        :param progress: tqdm 进度条
+        :param interval: 刷新间隔(秒)
+        """
+        self.progress = progress
+        self.interval = interval
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def update(self, n):
+        """
+        记录传输的字节数, 重试时可以传入负数回退
+        :param n: 字节数
+        """
+        with self._lock:
+            self._pending += n
+
+    def flush(self):
+        """把累计的字节数刷新到进度条"""
+        with self._lock:
+            n, self._pending = self._pending, 0
+        if n:
+            self.progress.update(n)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.flush()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stopped.set()
+        self._thread.join()
+        self.flush()
+        self.progress.close()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+请求重试与自适应并发控制
+"""
+
+import asyncio
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+import requests
+
+# 表示服务端限流的状态码, 收到时降低并发
+THROTTLE_STATUSES = (429, 503)
+# 可以重试的状态码
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# 多个请求同时被限流时, 该时间内只降低一次并发
+DECREASE_INTERVAL = 1.0
+
+
+class RetryPolicy:
+    """
+    重试策略, 使用带随机抖动的指数退避
+
+    idempotent 为 False 的请求 (如创建文件) 只在请求确定没有被处理时重试:
+    连接超时和限流状态码。
+    """
+
+    def __init__(self, max_retries=3, base_delay=0.5, max_delay=30.0, statuses=RETRY_STATUSES, idempotent=True):
+        """
+        :param max_retries: 最大重试次数
+        :param base_delay: 第一次重试前的最长等待秒数, 之后每次翻倍
+        :param max_delay: 单次等待的最长秒数
+        :param statuses: 需要重试的状态码
+        :param idempotent: 请求是否可以安全地重复发送
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.statuses = statuses
+        self.idempotent = idempotent
+
+    def should_retry(self, response):
+        """
+        响应是否需要重试
+        :param response: requests.Response
+        :return: bool
+        """
+        return response.status_code in self.statuses
+
+    def should_retry_error(self, error):
+        """
+        请求异常是否需要重试
+        :param error: requests.RequestException
+        :return: bool
+        """
+        if isinstance(error, requests.ConnectTimeout):
+            return True
+        return self.idempotent and isinstance(
+            error, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError))
+
+    def delay(self, attempt, response=None):
+        """
+        计算第 attempt 次重试前的等待秒数, 响应中有 Retry-After 时以其为准
+        :param attempt: 已失败的次数, 从 0 开始
+        :param response: 失败的响应
+        :return: float
+        """
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+# 查询类接口
+API_READ_RETRY = RetryPolicy(max_retries=5)
+# 创建、移动、删除等接口
+API_WRITE_RETRY = RetryPolicy(max_retries=3, statuses=THROTTLE_STATUSES, idempotent=False)
+# 上传分片和下载分段
+TRANSFER_RETRY = RetryPolicy(max_retries=5, base_delay=1.0, max_delay=60.0)
+
+
+def is_throttled(response):
+    """
+    响应是否表示被限流
+    :param response: requests.Response
+    :return: bool
+    """
+    return response.status_code in THROTTLE_STATUSES
+
+
+class _AIMDLimit:
+    """AIMD 并发上限的计算, 由线程和 asyncio 两种限制器共用, 调用时需持有各自的锁"""
+
+    def __init__(self, max_limit, min_limit=1):
+        """
+        :param max_limit: 并发上限的最大值, 初始并发即为该值
+        :param min_limit: 并发上限的最小值
+        """
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max_limit)
+        self._in_flight = 0
+        self._last_decrease = 0.0
+
+    def _increase(self):
+        """线性增加上限, 上限变化时返回 True"""
+        if self.limit >= self.max_limit:
+            return False
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        return True
+
+    def _decrease(self):
+        """上限减半, DECREASE_INTERVAL 内只生效一次"""
+        now = time.monotonic()
+        if now - self._last_decrease < DECREASE_INTERVAL:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit / 2)
+
+
+class AdaptiveLimiter(_AIMDLimit):
+    """
+    AIMD 并发限制器
+
+    每个成功的请求使并发上限增加 1/limit (每轮约加 1), 被限流或超时时上限减半,
+    多个线程池共享同一个限制器时, 总并发会稳定在服务端能承受的最大值附近。
+    """
+
+    def __init__(self, max_limit, min_limit=1):
+        """
+        :param max_limit: 并发上限的最大值, 初始并发即为该值
+        :param min_limit: 并发上限的最小值
+        """
+        super().__init__(max_limit, min_limit)
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """等待直到正在进行的请求数低于当前上限"""
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self):
+        """请求结束"""
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        """在 with 语句中占用一个并发名额"""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def on_success(self):
+        """请求成功, 线性增加上限"""
+        with self._cond:
+            if self._increase():
+                self._cond.notify_all()
+
+    def on_throttle(self):
+        """请求被限流或超时, 上限减半"""
+        with self._cond:
+            self._decrease()
+
+
+class AsyncAdaptiveLimiter(_AIMDLimit):
+    """
+    AdaptiveLimiter 的 asyncio 版本, 供 AsyncAliyunDriveApi 使用
+
+    所有方法都在同一个事件循环中调用, 不需要锁; 等待名额的协程在名额释放或上限增加时被唤醒后重新检查。
+    """
+
+    def __init__(self, max_limit, min_limit=1):
+        """
+        :param max_limit: 并发上限的最大值, 初始并发即为该值
+        :param min_limit: 并发上限的最小值
+        """
+        super().__init__(max_limit, min_limit)
+        self._waiters = []
+
+    async def acquire(self):
+        """等待直到正在进行的请求数低于当前上限"""
+        while self._in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                elif not waiter.cancelled():
+                    # 已被唤醒但随即被取消, 把名额让给下一个等待的协程
+                    self._wake(1)
+                raise
+        self._in_flight += 1
+
+    def release(self):
+        """请求结束"""
+        self._in_flight -= 1
+        self._wake(1)
+
+    @asynccontextmanager
+    async def slot(self):
+        """在 async with 语句中占用一个并发名额"""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def on_success(self):
+        """请求成功, 线性增加上限"""
+        if self._increase():
+            self._wake(len(self._waiters))
+
+    def on_throttle(self):
+        """请求被限流或超时, 上限减半"""
+        self._decrease()
+
+    def _wake(self, count):
+        """唤醒最多 count 个等待中的协程, 已取消的不计入"""
+        while count > 0 and self._waiters:
+            waiter = self._waiters.pop(0)
+            if not waiter.done():
+                waiter.set_result(None)
+                count -= 1
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+云盘目录树的并发遍历
+"""
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+DEFAULT_WALK_WORKERS = 8
+
+
+class TreeWalker:
+    """
+    按层并发遍历云盘目录树
+
+    每个文件夹的列表请求作为一个任务提交到线程池, 任意一个文件夹获取完成后立即返回其中的条目,
+    并把子文件夹加入队列, 因此遍历耗时随并发数而不是文件夹数量增长。
+    """
+
+    def __init__(self, api, max_workers=DEFAULT_WALK_WORKERS):
+        """
+        :param api: AliyunDriveApi 实例
+        :param max_workers: 同时获取的文件夹数
+        """
+        self.api = api
+        self.max_workers = max_workers
+
+    def walk(self, folder_id='root', prefix='', max_depth=None):
+        """
+        遍历文件夹下的所有文件和文件夹
+        :param folder_id: 起始文件夹ID
+        :param prefix: 返回路径的前缀
+        :param max_depth: 最大深度, 1 表示只返回直接子项, None 表示不限制
+        :return: (路径, 文件信息) 的生成器, 顺序不固定
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {executor.submit(self.api.list_files, folder_id): (prefix, 1)}
+            try:
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        path, depth = pending.pop(future)
+                        for entry in future.result():
+                            entry_path = f"{path}/{entry['name']}" if path else entry['name']
+                            if entry['type'] == 'folder' and (max_depth is None or depth < max_depth):
+                                pending[executor.submit(self.api.list_files, entry['file_id'])] = (entry_path, depth + 1)
+                            yield entry_path, entry
+            finally:
+                for future in pending:
+                    future.cancel()
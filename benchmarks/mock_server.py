@@ -0,0 +1,465 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+本地模拟的阿里云盘服务, 用于离线测试和性能基准
+
+实现了客户端用到的接口: user/get、file/list、file/search、file/get、file/create (含 pre_hash
+和秒传)、file/get_upload_url、file/list_uploaded_parts、file/complete、file/get_download_url、
+batch (move / trash / delete) 和 token 刷新, 以及分片 PUT 和 Range 下载。
+可以设置每个请求的延迟、单个连接的带宽和出错概率。
+"""
+
+import hashlib
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 传输数据时每次读写的大小
+IO_CHUNK_SIZE = 64 * 1024
+
+
+def _timestamp(seconds):
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds)) + '.%03dZ' % (seconds * 1000 % 1000)
+
+
+class MockDrive:
+    """内存中的云盘状态, 所有方法都是线程安全的"""
+
+    def __init__(self):
+        self.files = {'root': {'file_id': 'root', 'type': 'folder', 'name': 'root', 'parent_file_id': None}}
+        self.blobs = {}
+        self.uploads = {}
+        self.lock = threading.RLock()
+        self._clock = itertools.count()
+
+    def _updated_at(self):
+        # 保证 updated_at 严格递增, 同一毫秒内的修改也能按时间排序
+        return _timestamp(time.time() + next(self._clock) / 1e6)
+
+    def _find(self, parent_file_id, name):
+        for entry in self.files.values():
+            if entry['parent_file_id'] == parent_file_id and entry['name'] == name:
+                return entry
+        return None
+
+    def _new_entry(self, parent_file_id, name, file_type, size=0):
+        entry = {
+            'file_id': uuid.uuid4().hex,
+            'parent_file_id': parent_file_id,
+            'name': name,
+            'type': file_type,
+            'size': size,
+            'content_hash': None,
+            'updated_at': self._updated_at(),
+        }
+        if file_type == 'file':
+            entry['file_extension'] = name.rsplit('.', 1)[-1] if '.' in name else ''
+        return entry
+
+    def add_folder(self, parent_file_id, name):
+        """
+        直接创建文件夹, 用于准备测试数据
+        :return: 文件夹信息
+        """
+        with self.lock:
+            entry = self._find(parent_file_id, name) or self._new_entry(parent_file_id, name, 'folder')
+            self.files[entry['file_id']] = entry
+            return entry
+
+    def add_file(self, parent_file_id, name, data=b''):
+        """
+        直接创建文件, 用于准备测试数据
+        :return: 文件信息
+        """
+        with self.lock:
+            entry = self._new_entry(parent_file_id, name, 'file', len(data))
+            entry['content_hash'] = hashlib.sha1(data).hexdigest().upper()
+            self.files[entry['file_id']] = entry
+            self.blobs[entry['file_id']] = data
+            return entry
+
+    def list(self, parent_file_id, order_by='name', order_direction='ASC'):
+        with self.lock:
+            items = [dict(entry) for entry in self.files.values()
+                     if entry['parent_file_id'] == parent_file_id and not entry.get('_upload_id')]
+        items.sort(key=lambda entry: entry.get(order_by) or '', reverse=order_direction == 'DESC')
+        return items
+
+    def search(self, keyword='', updated_after=None, file_type=None):
+        with self.lock:
+            items = [dict(entry) for entry in self.files.values()
+                     if entry['file_id'] != 'root' and not entry.get('_upload_id')
+                     and keyword.lower() in entry['name'].lower()
+                     and (updated_after is None or entry['updated_at'] >= updated_after)
+                     and (file_type is None or entry['type'] == file_type)]
+        items.sort(key=lambda entry: entry['updated_at'], reverse=True)
+        return items
+
+    def create(self, data, base_url):
+        """处理 file/create, 返回 (状态码, 响应)"""
+        with self.lock:
+            parent_file_id, name = data['parent_file_id'], data['name']
+            mode = data.get('check_name_mode') or ('auto_rename' if data.get('auto_rename') else 'refuse')
+            existing = self._find(parent_file_id, name)
+            if existing is not None:
+                if mode == 'refuse':
+                    return 200, dict(existing, exist=True)
+                if mode == 'auto_rename':
+                    stem, dot, ext = name.rpartition('.') if '.' in name else (name, '', '')
+                    for i in itertools.count(1):
+                        name = f'{stem}({i}){dot}{ext}'
+                        if self._find(parent_file_id, name) is None:
+                            break
+
+            if data['type'] == 'folder':
+                entry = self._new_entry(parent_file_id, name, 'folder')
+                self.files[entry['file_id']] = entry
+                return 200, dict(entry)
+
+            size = data.get('size') or 0
+            if data.get('pre_hash'):
+                for blob in self.blobs.values():
+                    if len(blob) == size and hashlib.sha1(blob[:1024]).hexdigest() == data['pre_hash']:
+                        return 409, {'code': 'PreHashMatched', 'message': 'Pre hash matched.'}
+            if data.get('content_hash'):
+                content_hash = data['content_hash'].upper()
+                for file_id, blob in self.blobs.items():
+                    if self.files.get(file_id, {}).get('content_hash') == content_hash:
+                        entry = self._replace(existing, mode, parent_file_id, name, size)
+                        entry['content_hash'] = content_hash
+                        self.blobs[entry['file_id']] = blob
+                        return 200, dict(entry, rapid_upload=True)
+
+            entry = self._replace(existing, mode, parent_file_id, name, size)
+            upload_id = uuid.uuid4().hex
+            entry['_upload_id'] = upload_id
+            self.uploads[upload_id] = {'file_id': entry['file_id'], 'parts': {}, 'existing': existing, 'mode': mode}
+            part_numbers = [part['part_number'] for part in data.get('part_info_list') or [{'part_number': 1}]]
+            result = {key: value for key, value in entry.items() if not key.startswith('_')}
+            result.update(upload_id=upload_id, rapid_upload=False,
+                          part_info_list=self.part_urls(base_url, upload_id, part_numbers))
+            return 200, result
+
+    def _replace(self, existing, mode, parent_file_id, name, size):
+        """创建文件条目, overwrite 时先删除同名文件 (未完成的上传在 complete 时再删除)"""
+        entry = self._new_entry(parent_file_id, name, 'file', size)
+        self.files[entry['file_id']] = entry
+        if existing is not None and mode == 'overwrite' and existing['type'] == 'file':
+            self.files.pop(existing['file_id'], None)
+            self.blobs.pop(existing['file_id'], None)
+        return entry
+
+    @staticmethod
+    def part_urls(base_url, upload_id, part_numbers):
+        return [{'part_number': n, 'upload_url': f'{base_url}/upload/{upload_id}/{n}'} for n in part_numbers]
+
+    def put_part(self, upload_id, part_number, data):
+        with self.lock:
+            upload = self.uploads.get(upload_id)
+            if upload is None:
+                return False
+            upload['parts'][part_number] = data
+            return True
+
+    def complete(self, file_id, upload_id):
+        with self.lock:
+            upload = self.uploads.pop(upload_id, None)
+            entry = self.files.get(file_id)
+            if upload is None or entry is None:
+                return 404, {'code': 'NotFound.UploadId', 'message': 'The upload id cannot be found.'}
+            parts = upload['parts']
+            blob = b''.join(parts[n] for n in sorted(parts))
+            entry.pop('_upload_id', None)
+            entry.update(size=len(blob), content_hash=hashlib.sha1(blob).hexdigest().upper(),
+                         updated_at=self._updated_at())
+            self.blobs[file_id] = blob
+            return 200, dict(entry)
+
+    def move(self, file_id, to_parent_file_id):
+        with self.lock:
+            entry = self.files.get(file_id)
+            if entry is None:
+                return 404, {'code': 'NotFound.File'}
+            entry.update(parent_file_id=to_parent_file_id, updated_at=self._updated_at())
+            return 200, {'file_id': file_id, 'drive_id': 'mock'}
+
+    def delete(self, file_id):
+        with self.lock:
+            stack = [file_id]
+            while stack:
+                current = stack.pop()
+                self.files.pop(current, None)
+                self.blobs.pop(current, None)
+                stack.extend(entry['file_id'] for entry in self.files.values()
+                             if entry['parent_file_id'] == current)
+            return 204, None
+
+
+class MockDriveHandler(BaseHTTPRequestHandler):
+    """HTTP 请求处理, 服务端配置在 self.server.mock 中"""
+
+    protocol_version = 'HTTP/1.1'
+    # 响应头和响应体分开写入, 不关闭 Nagle 算法时每个请求会多出约 40ms 的延迟确认
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def mock(self):
+        return self.server.mock
+
+    def _read_body(self):
+        if self.headers.get('Transfer-Encoding') == 'chunked':
+            chunks = []
+            while True:
+                length = int(self.rfile.readline().strip(), 16)
+                if length == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self._read_exact(length))
+                self.rfile.readline()
+            return b''.join(chunks)
+        return self._read_exact(int(self.headers.get('Content-Length') or 0))
+
+    def _read_exact(self, length):
+        """按带宽限制读取请求体"""
+        chunks = []
+        while length > 0:
+            chunk = self.rfile.read(min(IO_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            length -= len(chunk)
+            self.mock.throttle(len(chunk))
+        return b''.join(chunks)
+
+    def _send(self, status, body=b'', content_type='application/json', headers=None):
+        self.send_response(status)
+        if body:
+            self.send_header('Content-Type', content_type)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        for i in range(0, len(body), IO_CHUNK_SIZE):
+            chunk = body[i:i + IO_CHUNK_SIZE]
+            self.wfile.write(chunk)
+            if content_type != 'application/json':
+                self.mock.throttle(len(chunk))
+
+    def _send_json(self, status, data):
+        self._send(status, json.dumps(data).encode() if data is not None else b'')
+
+    def _inject_error(self):
+        """按出错概率返回错误, 已返回错误时返回 True"""
+        if self.mock.should_fail():
+            self._send_json(self.mock.error_status, {'code': 'TooManyRequests' if self.mock.error_status == 429
+                                                     else 'ServiceUnavailable', 'message': 'Injected error.'})
+            return True
+        return False
+
+    def do_POST(self):
+        body = self._read_body()
+        self.mock.before_request(self.path)
+        if self._inject_error():
+            return
+        data = json.loads(body or b'{}')
+        if self.path.endswith('/token/refresh'):
+            return self._send_json(200, self.mock.refresh_token(data))
+        uri = self.path.split('/v2/', 1)[-1].lstrip('/')
+        if uri == 'batch':
+            responses = []
+            for request in data.get('requests', []):
+                status, result = self.mock.call(request['url'].lstrip('/'), request.get('body') or {})
+                responses.append({'id': request['id'], 'status': status, 'body': result})
+            return self._send_json(200, {'responses': responses})
+        self._send_json(*self.mock.call(uri, data))
+
+    def do_PUT(self):
+        body = self._read_body()
+        self.mock.before_request('upload')
+        if self._inject_error():
+            return
+        _, _, upload_id, part_number = self.path.split('/')
+        if not self.mock.drive.put_part(upload_id, int(part_number), body):
+            return self._send(403, b'<Error><Code>AccessDenied</Code></Error>', 'application/xml')
+        self._send(200, headers={'ETag': hashlib.md5(body).hexdigest()})
+
+    def do_GET(self):
+        self.mock.before_request('download')
+        if self._inject_error():
+            return
+        blob = self.mock.drive.blobs.get(self.path.rsplit('/', 1)[-1])
+        if blob is None:
+            return self._send(404, b'<Error><Code>NoSuchKey</Code></Error>', 'application/xml')
+        range_header = self.headers.get('Range')
+        if not range_header:
+            return self._send(200, blob, 'application/octet-stream')
+        start, _, end = range_header.split('=', 1)[1].partition('-')
+        start, end = int(start), min(int(end) if end else len(blob) - 1, len(blob) - 1)
+        self._send(206, blob[start:end + 1], 'application/octet-stream',
+                   {'Content-Range': f'bytes {start}-{end}/{len(blob)}'})
+
+
+class MockDriveServer:
+    """
+    模拟服务端
+
+        >>> with MockDriveServer(latency=0.02, bandwidth=10 * 1024 * 1024) as server:
+        ...     class Api(AliyunDriveApi):
+        ...         base_api = server.base_api
+        ...         token_api = server.token_api
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, bandwidth=None, error_rate=0.0,
+                 error_status=503, seed=None):
+        """
+        :param host: 监听地址
+        :param port: 监听端口, 0 表示随机选择
+        :param latency: 每个请求的额外延迟(秒)
+        :param bandwidth: 单个连接的带宽(字节/秒), None 表示不限制
+        :param error_rate: 请求返回错误的概率
+        :param error_status: 注入的错误状态码, 如 503 或 429
+        :param seed: 随机数种子, 用于复现错误注入
+        """
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.drive = MockDrive()
+        self.calls = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), MockDriveHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def base_api(self):
+        return self.base_url + '/v2/'
+
+    @property
+    def token_api(self):
+        return self.base_url + '/token/refresh'
+
+    def start(self):
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def before_request(self, name):
+        """记录请求次数并模拟延迟"""
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def should_fail(self):
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def throttle(self, nbytes):
+        """模拟单个连接的带宽"""
+        if self.bandwidth:
+            time.sleep(nbytes / self.bandwidth)
+
+    @staticmethod
+    def refresh_token(data):
+        return {
+            'access_token': uuid.uuid4().hex,
+            'refresh_token': data.get('refresh_token') or uuid.uuid4().hex,
+            'expires_in': 7200,
+            'default_drive_id': 'mock',
+        }
+
+    def call(self, uri, data):
+        """
+        处理 API 接口
+        :return: (状态码, 响应)
+        """
+        drive = self.drive
+        if uri == 'user/get':
+            return 200, {'default_drive_id': 'mock', 'user_id': 'mock', 'nick_name': 'mock'}
+        if uri == 'file/list':
+            if data.get('parent_file_id', 'root') not in drive.files:
+                return 404, {'code': 'NotFound.File', 'message': 'The resource file cannot be found.'}
+            items = drive.list(data.get('parent_file_id', 'root'), data.get('order_by') or 'name',
+                               data.get('order_direction') or 'ASC')
+            return 200, self._page(items, data)
+        if uri == 'file/search':
+            query = data.get('query') or ''
+            keyword = _query_value(query, 'name match')
+            file_type = _query_value(query, 'type =')
+            updated_after = _query_value(query, 'updated_at >=')
+            return 200, self._page(drive.search(keyword or '', updated_after, file_type), data)
+        if uri == 'file/get':
+            entry = drive.files.get(data.get('file_id'))
+            if entry is None:
+                return 404, {'code': 'NotFound.File', 'message': 'The resource file cannot be found.'}
+            return 200, dict(entry)
+        if uri == 'file/create':
+            return drive.create(data, self.base_url)
+        if uri == 'file/get_upload_url':
+            part_numbers = [part['part_number'] for part in data.get('part_info_list', [])]
+            return 200, {'part_info_list': drive.part_urls(self.base_url, data['upload_id'], part_numbers)}
+        if uri == 'file/list_uploaded_parts':
+            upload = drive.uploads.get(data.get('upload_id'))
+            if upload is None:
+                return 404, {'code': 'NotFound.UploadId', 'message': 'The upload id cannot be found.'}
+            return 200, {'uploaded_parts': [{'part_number': n, 'size': len(part)}
+                                            for n, part in sorted(upload['parts'].items())]}
+        if uri == 'file/complete':
+            return drive.complete(data['file_id'], data['upload_id'])
+        if uri == 'file/get_download_url':
+            entry = drive.files.get(data.get('file_id'))
+            if entry is None:
+                return 404, {'code': 'NotFound.File', 'message': 'The resource file cannot be found.'}
+            return 200, {'url': f"{self.base_url}/download/{entry['file_id']}", 'size': entry['size'],
+                         'expiration': _timestamp(time.time() + 4 * 3600)}
+        if uri == 'file/move':
+            return drive.move(data['file_id'], data['to_parent_file_id'])
+        if uri in ('file/delete', 'recyclebin/trash'):
+            return drive.delete(data['file_id'])
+        return 404, {'code': 'NotFound', 'message': f'Unknown api: {uri}'}
+
+    @staticmethod
+    def _page(items, data):
+        start = int(data.get('marker') or 0)
+        limit = int(data.get('limit') or 100)
+        end = start + limit
+        return {'items': items[start:end], 'next_marker': str(end) if end < len(items) else ''}
+
+
+def _query_value(query, prefix):
+    """从 file/search 的 query 表达式中取出条件的值, 如 name match "xxx" """
+    index = query.find(prefix + ' "')
+    if index < 0:
+        return None
+    start = index + len(prefix) + 2
+    return query[start:query.index('"', start)]
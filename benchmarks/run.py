@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+基于本地模拟服务端的性能基准
+
+    python -m benchmarks.run
+    python -m benchmarks.run --latency 0.03 --bandwidth 20 --error-rate 0.02 --only upload,download
+
+每项基准使用新的客户端实例, 报告耗时、吞吐量、请求数、重试数和请求延迟的分位数。
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from aliyundrive.api import AliyunDriveApi
+from benchmarks.mock_server import MockDriveServer
+
+BENCHMARKS = ('upload', 'download', 'list', 'search', 'folder_upload')
+MB = 1024 * 1024
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class BenchmarkContext:
+    """模拟服务端、临时目录和客户端配置"""
+
+    def __init__(self, server, args):
+        self.server = server
+        self.args = args
+        self.workdir = tempfile.mkdtemp(prefix='aliyundrive-bench-')
+        self.config_path = os.path.join(self.workdir, 'config.ini')
+        home = os.path.join(self.workdir, 'home')
+        os.makedirs(os.path.join(home, '.aliyundrive'))
+        # 认证信息、SHA1 缓存和上传日志都写在临时目录中, 不影响真实配置
+        os.environ['HOME'] = os.environ['USERPROFILE'] = home
+        config = '[account]\naccess_token = bench\nrefresh_token = bench\ndrive_id = mock\n'
+        for path in (self.config_path, os.path.join(home, '.aliyundrive', 'config.ini')):
+            with open(path, 'w') as f:
+                f.write(config)
+
+        class BenchApi(AliyunDriveApi):
+            base_api = server.base_api
+            token_api = server.token_api
+
+        self.api_class = BenchApi
+        self.state = {}
+
+    def new_api(self):
+        return self.api_class(self.config_path, upload_workers=self.args.threads,
+                              download_workers=self.args.threads)
+
+    def path(self, *parts):
+        return os.path.join(self.workdir, *parts)
+
+    def close(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def bench_upload(ctx, api):
+    """上传一个随机内容的大文件, 内容每次不同, 不会触发秒传"""
+    path = ctx.path('upload.bin')
+    with open(path, 'wb') as f:
+        for _ in range(ctx.args.size):
+            f.write(os.urandom(MB))
+    start = time.perf_counter()
+    res = api.upload_file(path, check_name_mode='overwrite')
+    elapsed = time.perf_counter() - start
+    ctx.state['uploaded'] = res
+    return elapsed, ctx.args.size * MB, 1
+
+
+def bench_download(ctx, api):
+    """下载上传基准的文件, 没有运行上传基准时先在服务端准备一个"""
+    file_info = ctx.state.get('uploaded')
+    if not isinstance(file_info, dict) or not file_info.get('file_id'):
+        file_info = ctx.server.drive.add_file('root', 'download.bin', os.urandom(ctx.args.size * MB))
+    save_path = ctx.path('download')
+    start = time.perf_counter()
+    api.download_file(file_info['file_id'], save_path)
+    elapsed = time.perf_counter() - start
+    return elapsed, os.path.getsize(os.path.join(save_path, file_info['name'])), 1
+
+
+def _seed_folder(ctx, name):
+    folder = ctx.server.drive.add_folder('root', name)
+    for i in range(ctx.args.files):
+        ctx.server.drive.add_file(folder['file_id'], f'file_{i:06d}.txt', b'x' * (i % 100))
+    return folder
+
+
+def bench_list(ctx, api):
+    """列出包含 --files 个文件的文件夹"""
+    folder = ctx.state.get('listing') or _seed_folder(ctx, 'listing')
+    ctx.state['listing'] = folder
+    start = time.perf_counter()
+    items = api.list_files(folder['file_id'])
+    return time.perf_counter() - start, 0, len(items)
+
+
+def bench_search(ctx, api):
+    """在 --files 个文件中按文件名前缀和后缀各搜索一次"""
+    ctx.state['listing'] = ctx.state.get('listing') or _seed_folder(ctx, 'listing')
+    start = time.perf_counter()
+    items = list(api.search_file('file_0000'))
+    if ctx.args.files > 10:
+        items += list(api.search_file('0.txt'))
+    return time.perf_counter() - start, 0, len(items)
+
+
+def bench_folder_upload(ctx, api):
+    """并发上传包含 --files 个小文件的文件夹"""
+    root = ctx.path('folder_upload')
+    for i in range(ctx.args.files):
+        sub_dir = os.path.join(root, f'dir_{i % 10}')
+        os.makedirs(sub_dir, exist_ok=True)
+        with open(os.path.join(sub_dir, f'small_{i:06d}.bin'), 'wb') as f:
+            f.write(os.urandom(ctx.args.small_size))
+    start = time.perf_counter()
+    results = api.upload_folders(root, 'bench', max_workers=ctx.args.jobs)
+    elapsed = time.perf_counter() - start
+    failed = [result for result in results if not result.success]
+    if failed:
+        print(f'  {len(failed)} 个文件上传失败', file=sys.stderr)
+    return elapsed, ctx.args.files * ctx.args.small_size, len(results)
+
+
+def run_benchmark(ctx, name):
+    """
+    运行一项基准
+    :return: 结果 dict
+    """
+    api = ctx.new_api()
+    durations = []
+    api.metrics.add_hook(lambda event: durations.append(event.duration) if event.kind == 'request' else None)
+    calls_before = sum(ctx.server.calls.values())
+    # 客户端的提示信息输出到 stderr, 保证 --json 的输出可以直接解析
+    with contextlib.redirect_stdout(sys.stderr):
+        elapsed, nbytes, items = globals()['bench_' + name](ctx, api)
+    snapshot = api.metrics.snapshot()
+    return {
+        'name': name,
+        'seconds': round(elapsed, 4),
+        'mb_per_second': round(nbytes / MB / elapsed, 2) if nbytes else None,
+        'items': items,
+        'items_per_second': round(items / elapsed, 1),
+        'requests': len(durations),
+        'server_requests': sum(ctx.server.calls.values()) - calls_before,
+        'retries': sum(endpoint['retries'] for endpoint in snapshot['endpoints'].values()),
+        'p50_ms': round(_percentile(durations, 0.5) * 1000, 2),
+        'p95_ms': round(_percentile(durations, 0.95) * 1000, 2),
+        'max_ms': round(max(durations, default=0) * 1000, 2),
+    }
+
+
+def format_results(results):
+    lines = [f"{'benchmark':<14}{'seconds':>9}{'MB/s':>9}{'items/s':>10}{'requests':>10}"
+             f"{'retries':>9}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}"]
+    for r in results:
+        throughput = f"{r['mb_per_second']:.2f}" if r['mb_per_second'] is not None else '-'
+        lines.append(f"{r['name']:<14}{r['seconds']:>9.3f}{throughput:>9}{r['items_per_second']:>10.1f}"
+                     f"{r['requests']:>10}{r['retries']:>9}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['max_ms']:>9.2f}")
+    return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='阿里云盘客户端性能基准 (本地模拟服务端)')
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求的额外延迟(秒)')
+    parser.add_argument('--bandwidth', type=float, default=None, help='单个连接的带宽(MB/s), 默认不限制')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='请求返回 503 的概率')
+    parser.add_argument('--size', type=int, default=64, help='上传/下载基准的文件大小(MB)')
+    parser.add_argument('--files', type=int, default=500, help='列表、搜索和文件夹上传基准的文件数')
+    parser.add_argument('--small-size', type=int, default=4096, help='文件夹上传基准中每个文件的大小(字节)')
+    parser.add_argument('--threads', type=int, default=4, help='单个文件的并发分片/分段数')
+    parser.add_argument('--jobs', type=int, default=4, help='文件夹上传时同时上传的文件数')
+    parser.add_argument('--only', default=','.join(BENCHMARKS), help='要运行的基准, 逗号分隔')
+    parser.add_argument('--seed', type=int, default=None, help='错误注入的随机数种子')
+    parser.add_argument('--json', action='store_true', help='以 JSON 格式输出结果')
+    args = parser.parse_args(argv)
+    names = [name.strip() for name in args.only.split(',') if name.strip()]
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"未知的基准: {', '.join(sorted(unknown))}, 可选: {', '.join(BENCHMARKS)}")
+    args.names = names
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    bandwidth = args.bandwidth * MB if args.bandwidth else None
+    with MockDriveServer(latency=args.latency, bandwidth=bandwidth, error_rate=args.error_rate,
+                         seed=args.seed) as server:
+        ctx = BenchmarkContext(server, args)
+        try:
+            results = [run_benchmark(ctx, name) for name in args.names]
+        finally:
+            ctx.close()
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(format_results(results))
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -15,17 +15,20 @@ setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/luoluoluo22/aliyundrive-api",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-    python_requires=">=3.6",
+    python_requires=">=3.7",
     install_requires=[
         "requests>=2.25.1",
         "tqdm>=4.61.0",
     ],
+    extras_require={
+        "async": ["httpx>=0.23.0"],
+    },
     entry_points={
         'console_scripts': [
             'aliyundrive=aliyundrive.cli:main',
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试使用的模拟服务端和客户端
+"""
+
+import pytest
+
+from aliyundrive.api import AliyunDriveApi
+from benchmarks.mock_server import MockDriveServer
+
+CONFIG = '[account]\naccess_token = test\nrefresh_token = test\ndrive_id = mock\n'
+
+
+@pytest.fixture
+def server():
+    with MockDriveServer() as server:
+        yield server
+
+
+@pytest.fixture
+def config_path(tmp_path, monkeypatch):
+    """临时的配置文件, 认证信息、SHA1 缓存和上传记录也都写在临时目录中"""
+    home = tmp_path / 'home'
+    (home / '.aliyundrive').mkdir(parents=True)
+    (home / '.aliyundrive' / 'config.ini').write_text(CONFIG)
+    path = tmp_path / 'config.ini'
+    path.write_text(CONFIG)
+    monkeypatch.setenv('HOME', str(home))
+    monkeypatch.setenv('USERPROFILE', str(home))
+    return str(path)
+
+
+@pytest.fixture
+def make_api(server, config_path):
+    """创建连接模拟服务端的客户端"""
+    class TestApi(AliyunDriveApi):
+        base_api = server.base_api
+        token_api = server.token_api
+
+    def make(**kwargs):
+        return TestApi(config_path, **kwargs)
+
+    return make
+
+
+@pytest.fixture
+def api(make_api):
+    return make_api()
+
+
+@pytest.fixture
+def fail_listing(server, monkeypatch):
+    """让指定文件夹的 file/list 请求返回错误"""
+    failing = set()
+    call = server.call
+
+    def patched(uri, data):
+        if uri == 'file/list' and data.get('parent_file_id') in failing:
+            return 403, {'code': 'ForbiddenNoPermission.File', 'message': 'Injected listing error.'}
+        return call(uri, data)
+
+    monkeypatch.setattr(server, 'call', patched)
+    return failing.add
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip('httpx')
+
+from aliyundrive.aio import AsyncAliyunDriveApi  # noqa: E402
+from aliyundrive.utils.retry import AsyncAdaptiveLimiter, RetryPolicy  # noqa: E402
+from benchmarks.mock_server import MockDriveHandler  # noqa: E402
+
+MB = 1024 * 1024
+PART_SIZE = 256 * 1024
+
+
+@pytest.fixture
+def run_api(server, config_path):
+    """在新的事件循环中以连接模拟服务端的异步客户端运行协程函数"""
+    class TestAsyncApi(AsyncAliyunDriveApi):
+        base_api = server.base_api
+        token_api = server.token_api
+
+    def run(func, **kwargs):
+        async def main():
+            async with TestAsyncApi(config_path, **kwargs) as api:
+                return await func(api)
+        return asyncio.run(main())
+
+    return run
+
+
+@pytest.fixture
+def no_delay(monkeypatch):
+    monkeypatch.setattr(RetryPolicy, 'delay', lambda self, attempt, response=None: 0)
+
+
+def test_upload_and_download_retry_injected_errors(server, run_api, tmp_path, no_delay):
+    data = os.urandom(4 * PART_SIZE + 3)
+    path = tmp_path / 'a.bin'
+    path.write_bytes(data)
+    server.error_rate = 0.2
+    server._random.seed(3)
+
+    async def roundtrip(api):
+        res = await api.upload_file(str(path), 'docs')
+        return await api.download_file(res['file_id'], str(tmp_path / 'out'))
+
+    saved = run_api(roundtrip, part_size=PART_SIZE)
+    with open(saved, 'rb') as f:
+        assert f.read() == data
+    # 5 个分片上传和 1 次下载, 多出的都是重试
+    assert server.calls['upload'] + server.calls['download'] > 6
+
+
+def test_download_segment_retries_5xx_and_dropped_connection(server, run_api, tmp_path, monkeypatch, no_delay):
+    data = os.urandom(2 * MB)
+    entry = server.drive.add_file('root', 'a.bin', data)
+    do_get = MockDriveHandler.do_GET
+    ranges = []
+
+    def flaky_get(handler):
+        ranges.append(handler.headers.get('Range'))
+        if len(ranges) == 1:
+            return handler._send(503, b'busy', 'text/plain')
+        if len(ranges) == 2:
+            # 只发送一部分数据就断开连接
+            handler.send_response(206)
+            handler.send_header('Content-Length', str(len(data)))
+            handler.end_headers()
+            handler.wfile.write(data[:MB + 1000])
+            handler.close_connection = True
+            return
+        return do_get(handler)
+
+    monkeypatch.setattr(MockDriveHandler, 'do_GET', flaky_get)
+    saved = run_api(lambda api: api.download_file(entry['file_id'], str(tmp_path)))
+    with open(saved, 'rb') as f:
+        assert f.read() == data
+    # 不足一块的数据没有写入, 从已写入的位置继续
+    assert ranges == [f'bytes=0-{len(data) - 1}'] * 2 + [f'bytes={MB}-{len(data) - 1}']
+
+
+def test_error_code_raises(server, run_api):
+    with pytest.raises(RuntimeError, match='NotFound|cannot be found'):
+        run_api(lambda api: api.download_file('missing'))
+
+
+def test_listing_shares_sync_payloads(server, run_api):
+    for i in range(5):
+        server.drive.add_file('root', f'report_{i}.txt', b'x')
+
+    async def collect(api):
+        listed = [item['name'] async for item in api.iter_files(page_size=2)]
+        found = [item['name'] async for item in api.search_file('report_3')]
+        return listed, found
+
+    listed, found = run_api(collect)
+    assert listed == [f'report_{i}.txt' for i in range(5)]
+    assert server.calls['/v2/file/list'] == 3
+    assert found == ['report_3.txt']
+
+
+def test_check_name_mode(server, run_api, tmp_path):
+    path = tmp_path / 'a.txt'
+    path.write_bytes(b'hello')
+
+    async def upload_twice(api, mode):
+        await api.upload_file(str(path), check_name_mode=mode)
+        await api.upload_file(str(path), check_name_mode=mode)
+
+    run_api(lambda api: upload_twice(api, 'overwrite'))
+    assert [entry['name'] for entry in server.drive.list('root')] == ['a.txt']
+    run_api(lambda api: upload_twice(api, 'auto_rename'))
+    assert len(server.drive.list('root')) == 3
+
+
+def test_async_limiter_caps_concurrency():
+    async def main():
+        limiter = AsyncAdaptiveLimiter(4)
+        limiter.on_throttle()
+        state = {'running': 0, 'peak': 0}
+
+        async def task():
+            async with limiter.slot():
+                state['running'] += 1
+                state['peak'] = max(state['peak'], state['running'])
+                await asyncio.sleep(0.01)
+                state['running'] -= 1
+                limiter.on_success()
+
+        await asyncio.gather(*(task() for _ in range(10)))
+        return limiter, state['peak']
+
+    limiter, peak = asyncio.run(main())
+    assert peak <= 3
+    assert 2 < limiter.limit <= 4
@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from aliyundrive.batch import Batcher
+
+
+def test_batcher_splits_requests_and_routes_responses(server, api):
+    dest = server.drive.add_folder('root', 'dest')
+    files = [server.drive.add_file('root', f'{i}.txt', b'x') for i in range(6)]
+    file_ids = [entry['file_id'] for entry in files] + ['missing']
+
+    with Batcher(api, max_batch_size=3) as batcher:
+        futures = [batcher.submit('/file/move', {'drive_id': api.drive_id, 'file_id': file_id,
+                                                 'to_parent_file_id': dest['file_id']})
+                   for file_id in file_ids]
+    results = [future.result() for future in futures]
+
+    # 7 个子请求按 3 个一组发送
+    assert server.calls['/v2/batch'] == 3
+    assert [res.get('file_id') for res in results[:-1]] == file_ids[:-1]
+    assert all(res['status'] == 200 for res in results[:-1])
+    assert results[-1]['status'] == 404 and results[-1]['code'] == 'NotFound.File'
+    assert all(server.drive.files[file_id]['parent_file_id'] == dest['file_id'] for file_id in file_ids[:-1])
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+import threading
+
+import pytest
+
+from aliyundrive.utils.buffer import BufferPool, FileBody
+
+
+def test_buffer_pool_caps_memory():
+    pool = BufferPool(buffer_size=1024, max_memory=2048)
+    first, second = pool.acquire(), pool.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    # 已达到上限, 第三个 acquire 等待其他缓冲区被放回
+    waiter.join(0.2)
+    assert waiter.is_alive() and not acquired
+    pool.release(first)
+    waiter.join(1)
+    assert acquired[0] is first
+    assert pool._allocated == 2
+    pool.release(second)
+    pool.release(acquired[0])
+
+
+def test_buffer_pool_allocates_at_least_one_buffer():
+    pool = BufferPool(buffer_size=1024, max_memory=100)
+    with pool.buffer() as buffer:
+        assert len(buffer) == 1024
+    with pool.buffer() as again:
+        assert again is buffer
+
+
+def test_file_body_reads_slice_through_buffer():
+    data = bytes(range(256)) * 40
+    read = []
+    body = FileBody(io.BytesIO(data), 100, 5000, bytearray(1024), read.append)
+    assert len(body) == 5000
+    assert b''.join(bytes(chunk) for chunk in body) == data[100:5100]
+    assert read == [1024] * 4 + [904]
+
+
+def test_file_body_raises_on_short_file():
+    body = FileBody(io.BytesIO(b'x' * 10), 0, 20, bytearray(8))
+    with pytest.raises(IOError):
+        list(body)
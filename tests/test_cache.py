@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import calendar
+
+from aliyundrive import cache
+from aliyundrive.cache import FileCache, URL_EXPIRY_MARGIN
+
+
+def test_info_expires_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'time', lambda: now[0])
+    file_cache = FileCache(info_ttl=10)
+    file_cache.put_info({'file_id': 'a', 'name': 'a.txt'})
+    now[0] += 9
+    assert file_cache.get_info('a')['name'] == 'a.txt'
+    now[0] += 1
+    assert file_cache.get_info('a') is None
+
+
+def test_url_expires_before_expiration(monkeypatch):
+    now = [float(calendar.timegm((2024, 1, 1, 0, 0, 0)))]
+    monkeypatch.setattr(cache.time, 'time', lambda: now[0])
+    file_cache = FileCache()
+    res = {'url': 'http://example.com/a', 'expiration': '2024-01-01T01:00:00.000Z'}
+    file_cache.put_url('a', res)
+    now[0] += 3600 - URL_EXPIRY_MARGIN - 1
+    assert file_cache.get_url('a') == res
+    now[0] += 1
+    assert file_cache.get_url('a') is None
+
+
+def test_lru_eviction_and_forget():
+    file_cache = FileCache(max_size=2)
+    for file_id in 'abc':
+        file_cache.put_info({'file_id': file_id})
+    assert file_cache.get_info('a') is None
+    assert file_cache.get_info('c') == {'file_id': 'c'}
+    file_cache.forget(['c'])
+    assert file_cache.get_info('c') is None
+    assert file_cache.get_info('b') == {'file_id': 'b'}
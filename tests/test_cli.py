@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from types import SimpleNamespace
+
+from aliyundrive.cli import run_command
+
+
+def test_download_resolves_path_once(server, api, tmp_path):
+    docs = server.drive.add_folder('root', 'docs')
+    server.drive.add_file(docs['file_id'], 'a.txt', b'hello')
+    run_command(api, ['download', 'docs/a.txt', str(tmp_path)], SimpleNamespace(jobs=2))
+    assert (tmp_path / 'a.txt').read_bytes() == b'hello'
+    # 根目录和 docs 各列出一次, 不再按路径重新解析, 也不再请求 file/get
+    assert server.calls['/v2/file/list'] == 2
+    assert '/v2/file/get' not in server.calls
+
+
+def test_download_missing_path(server, api, capsys):
+    run_command(api, ['download', 'missing.txt'], SimpleNamespace(jobs=2))
+    assert '未找到文件: missing.txt' in capsys.readouterr().out
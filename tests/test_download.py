@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import io
+import os
+import threading
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from aliyundrive import download
+from aliyundrive.download import RangedDownloader, StreamSink
+from aliyundrive.utils.file import PositionalFile
+from aliyundrive.utils.journal import DownloadJournal
+from benchmarks.mock_server import MockDriveHandler
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def ranges(monkeypatch):
+    """记录下载请求的 Range 头"""
+    requested = []
+    do_get = MockDriveHandler.do_GET
+
+    def recording_get(handler):
+        requested.append(handler.headers.get('Range'))
+        return do_get(handler)
+
+    monkeypatch.setattr(MockDriveHandler, 'do_GET', recording_get)
+    return requested
+
+
+def truncate_next_download(monkeypatch, nbytes):
+    """下一个下载请求只发送 nbytes 字节就断开连接, 之后的请求正常处理"""
+    do_get = MockDriveHandler.do_GET
+    state = {'done': False}
+
+    def truncated_get(handler):
+        if state['done']:
+            return do_get(handler)
+        state['done'] = True
+        blob = handler.mock.drive.blobs[handler.path.rsplit('/', 1)[-1]]
+        handler.send_response(200)
+        handler.send_header('Content-Length', str(len(blob)))
+        handler.end_headers()
+        handler.wfile.write(blob[:nbytes])
+        handler.close_connection = True
+
+    monkeypatch.setattr(MockDriveHandler, 'do_GET', truncated_get)
+
+
+def test_download_file(server, api, tmp_path):
+    data = os.urandom(3 * MB + 17)
+    entry = server.drive.add_file('root', 'a.bin', data)
+    assert api.download_file(entry['file_id'], str(tmp_path))
+    assert (tmp_path / 'a.bin').read_bytes() == data
+
+
+def test_resume_download_interrupted_mid_segment(server, api, tmp_path, monkeypatch, ranges):
+    data = os.urandom(4 * MB)
+    entry = server.drive.add_file('root', 'a.bin', data)
+    save_path = str(tmp_path / 'a.bin')
+
+    monkeypatch.setattr(download, 'MAX_SEGMENT_RETRIES', 0)
+    truncate_next_download(monkeypatch, 2 * MB + 100)
+    downloader = RangedDownloader(api, max_workers=1)
+    with pytest.raises(requests.RequestException):
+        downloader.download(entry['file_id'], len(data), save_path, content_hash=entry['content_hash'])
+    assert not os.path.exists(save_path)
+    # 只有完整写入的块被记录, 不足一块的数据会重新下载
+    assert DownloadJournal.load(save_path + '.part.json', entry['file_id'], len(data),
+                                entry['content_hash']).ranges == [[0, 2 * MB]]
+
+    ranges.clear()
+    RangedDownloader(api, max_workers=1).download(entry['file_id'], len(data), save_path,
+                                                  content_hash=entry['content_hash'])
+    assert ranges == [f'bytes={2 * MB}-{4 * MB - 1}']
+    with open(save_path, 'rb') as f:
+        assert f.read() == data
+    assert not os.path.exists(save_path + '.part')
+    assert not os.path.exists(save_path + '.part.json')
+
+
+def test_download_rejects_corrupted_file(server, api, tmp_path):
+    entry = server.drive.add_file('root', 'a.bin', os.urandom(MB))
+    save_path = str(tmp_path / 'a.bin')
+    with pytest.raises(IOError):
+        RangedDownloader(api).download(entry['file_id'], MB, save_path, content_hash='0' * 40)
+    assert not os.path.exists(save_path)
+    assert not os.path.exists(save_path + '.part')
+
+
+class Killed(Exception):
+    pass
+
+
+def test_stream_sink_checkpoints_journal(tmp_path):
+    data = os.urandom(5 * MB)
+    journal_path = str(tmp_path / 'a.part.json')
+    journal = DownloadJournal(journal_path, 'id', len(data))
+    written = []
+
+    def callback(n):
+        written.append(n)
+        if sum(written) == 3 * MB:
+            raise Killed()
+
+    with PositionalFile(str(tmp_path / 'a.part'), len(data)) as file:
+        sink = StreamSink(file, 0, bytearray(MB), callback, journal=journal, checkpoint_size=2 * MB)
+        with pytest.raises(Killed):
+            sink.consume(SimpleNamespace(raw=io.BytesIO(data)))
+    # 进程被强制结束时没有机会再记录, 已保存的检查点仍然有效
+    assert DownloadJournal.load(journal_path, 'id', len(data)).ranges == [[0, 2 * MB]]
+
+
+def test_stream_sink_stops_when_cancelled(tmp_path):
+    stop = threading.Event()
+    with PositionalFile(str(tmp_path / 'a.part'), 4 * MB) as file:
+        sink = StreamSink(file, 0, bytearray(MB), lambda n: stop.set(), stop=stop)
+        with pytest.raises(IOError):
+            sink.consume(SimpleNamespace(raw=io.BytesIO(os.urandom(4 * MB))))
+    assert sink.offset == MB
+
+
+def test_stream_sink_hashes_written_data(tmp_path):
+    data = os.urandom(3 * MB + 5)
+    hasher = hashlib.sha1()
+    with PositionalFile(str(tmp_path / 'a.part'), len(data)) as file:
+        sink = StreamSink(file, 0, bytearray(MB), hasher=hasher)
+        sink.consume(SimpleNamespace(raw=io.BytesIO(data)))
+    assert sink.offset == len(data)
+    assert hasher.hexdigest() == hashlib.sha1(data).hexdigest()
+    assert (tmp_path / 'a.part').read_bytes() == data
+
+
+def test_single_stream_download_verifies_inline(server, api, tmp_path, monkeypatch):
+    data = os.urandom(3 * MB)
+    entry = server.drive.add_file('root', 'a.bin', data)
+
+    def reread(path):
+        raise AssertionError('整个文件顺序下载时不应重新读取文件计算 SHA1')
+
+    monkeypatch.setattr(api, 'get_sha1_hash', reread)
+    save_path = str(tmp_path / 'a.bin')
+    RangedDownloader(api, max_workers=1).download(entry['file_id'], len(data), save_path,
+                                                  content_hash=entry['content_hash'])
+    with open(save_path, 'rb') as f:
+        assert f.read() == data
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+
+def test_trash_and_move_update_built_index(server, make_api):
+    drive = server.drive
+    docs = drive.add_folder('root', 'docs')
+    inner = drive.add_folder(docs['file_id'], 'inner')
+    drive.add_file(inner['file_id'], 'secret_report.txt', b'secret')
+    moved = drive.add_file('root', 'notes.txt', b'notes')
+    dest = drive.add_folder('root', 'archive')
+
+    api = make_api(use_index=True)
+    api.rebuild_index()
+    assert [item['name'] for item in api.search_file('secret')] == ['secret_report.txt']
+
+    api.bulk_trash([docs['file_id']])
+    assert list(api.search_file('secret')) == []
+    assert api.index.get(inner['file_id']) is None
+
+    api.bulk_move([moved['file_id']], dest['file_id'])
+    assert api.index.get(moved['file_id'])['parent_file_id'] == dest['file_id']
+
+
+def test_failed_listing_is_not_indexed(server, make_api, fail_listing):
+    docs = server.drive.add_folder('root', 'docs')
+    server.drive.add_file(docs['file_id'], 'a.txt', b'a')
+    api = make_api(use_index=True)
+    fail_listing(docs['file_id'])
+
+    with pytest.raises(RuntimeError):
+        api.list_files(docs['file_id'])
+    assert api.index.children(docs['file_id']) is None
+
+    with pytest.raises(RuntimeError):
+        api.rebuild_index()
+    # 重建未完成, 搜索不能使用不完整的索引
+    assert api.index.built_at is None
+    assert [item['name'] for item in api.search_file('a.txt')] == ['a.txt']
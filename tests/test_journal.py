@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from aliyundrive.utils.journal import DownloadJournal, UploadJournal
+
+
+def test_missing_ranges_of_new_journal(tmp_path):
+    journal = DownloadJournal(str(tmp_path / 'a.part.json'), 'f1', 100)
+    assert journal.missing_ranges() == [(0, 100)]
+    assert journal.completed_size == 0
+
+
+def test_add_range_merges_adjacent_and_overlapping(tmp_path):
+    journal = DownloadJournal(str(tmp_path / 'a.part.json'), 'f1', 100)
+    journal.add_range(10, 20)
+    journal.add_range(40, 50)
+    journal.add_range(20, 30)
+    journal.add_range(45, 60)
+    journal.add_range(5, 5)
+    assert journal.ranges == [[10, 30], [40, 60]]
+    assert journal.missing_ranges() == [(0, 10), (30, 40), (60, 100)]
+    assert journal.completed_size == 40
+
+    journal.add_range(0, 100)
+    assert journal.ranges == [[0, 100]]
+    assert journal.missing_ranges() == []
+
+
+def test_load_reuses_only_matching_journal(tmp_path):
+    path = str(tmp_path / 'a.part.json')
+    journal = DownloadJournal(path, 'f1', 100, 'ABC')
+    journal.add_range(0, 50)
+
+    assert DownloadJournal.load(path, 'f1', 100, 'ABC').ranges == [[0, 50]]
+    assert DownloadJournal.load(path, 'f1', 100, 'DEF').ranges == []
+    assert DownloadJournal.load(path, 'f2', 100, 'ABC').ranges == []
+    assert DownloadJournal.load(str(tmp_path / 'missing.json'), 'f1', 100, 'ABC').ranges == []
+
+
+def test_upload_journal_replaces_old_entries_of_same_path(tmp_path):
+    path = str(tmp_path / 'uploads.json')
+    journal = UploadJournal(path)
+    journal.set('/data/a.bin|10|1', {'file_id': 'f1', 'upload_id': 'u1', 'parent_file_id': 'root', 'part_size': 4})
+    journal.add_part('/data/a.bin|10|1', 1)
+    journal.add_part('/data/a.bin|10|1', 1)
+    assert UploadJournal(path).get('/data/a.bin|10|1')['parts'] == [1]
+
+    journal.set('/data/a.bin|12|2', {'file_id': 'f2', 'upload_id': 'u2', 'parent_file_id': 'root', 'part_size': 4})
+    reloaded = UploadJournal(path)
+    assert reloaded.get('/data/a.bin|10|1') is None
+    assert reloaded.get('/data/a.bin|12|2')['parts'] == []
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+
+
+def test_concurrent_resolve_creates_each_folder_once(server, api):
+    server.latency = 0.02
+    barrier = threading.Barrier(8)
+    ids = []
+
+    def worker(i):
+        barrier.wait()
+        ids.append(api.resolver.resolve('a/b/c' if i % 2 else 'a/b/d'))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # a、b、c、d 各创建一次
+    assert server.calls['/v2/file/create'] == 4
+    assert len(set(ids)) == 2
+    names = sorted(entry['name'] for entry in server.drive.files.values() if entry['file_id'] != 'root')
+    assert names == ['a', 'b', 'c', 'd']
+
+
+def test_resolve_uses_cache(server, api):
+    folder_id = api.resolver.resolve('a/b')
+    calls = server.calls['/v2/file/create']
+    assert api.resolver.resolve('/a/b/') == folder_id
+    assert api.resolver.lookup('a/b') == folder_id
+    assert server.calls['/v2/file/create'] == calls
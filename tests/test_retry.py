@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+import requests
+
+from aliyundrive.utils import retry
+from aliyundrive.utils.http import HttpSession
+from aliyundrive.utils.retry import AdaptiveLimiter, API_READ_RETRY, API_WRITE_RETRY, RetryPolicy
+from benchmarks.mock_server import MockDriveServer
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可以手动推进的 time.monotonic"""
+    now = [1000.0]
+    monkeypatch.setattr(retry.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_limiter_halves_once_per_interval(clock):
+    limiter = AdaptiveLimiter(16)
+    limiter.on_throttle()
+    assert limiter.limit == 8
+    # 同一批被限流的请求只降低一次
+    limiter.on_throttle()
+    clock[0] += retry.DECREASE_INTERVAL / 2
+    limiter.on_throttle()
+    assert limiter.limit == 8
+    clock[0] += retry.DECREASE_INTERVAL
+    limiter.on_throttle()
+    assert limiter.limit == 4
+    for _ in range(5):
+        clock[0] += retry.DECREASE_INTERVAL
+        limiter.on_throttle()
+    assert limiter.limit == limiter.min_limit
+
+
+def test_limiter_increases_by_one_per_round(clock):
+    limiter = AdaptiveLimiter(8)
+    limiter.on_throttle()
+    assert limiter.limit == 4
+    # 每个成功的请求加 1/limit, 一轮 (limit 个请求) 约加 1
+    for _ in range(4):
+        limiter.on_success()
+    assert 4.8 < limiter.limit < 5
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.limit == 8
+
+
+def test_write_policy_does_not_retry_read_timeout():
+    assert not API_WRITE_RETRY.should_retry_error(requests.ReadTimeout())
+    assert not API_WRITE_RETRY.should_retry_error(requests.ConnectionError())
+    assert API_WRITE_RETRY.should_retry_error(requests.ConnectTimeout())
+    assert API_READ_RETRY.should_retry_error(requests.ReadTimeout())
+
+
+def test_post_json_sends_write_once_on_read_timeout(monkeypatch):
+    http = HttpSession()
+    calls = []
+
+    def timed_out(*args, **kwargs):
+        calls.append(args)
+        raise requests.ReadTimeout()
+
+    monkeypatch.setattr(http.api, 'post', timed_out)
+    with pytest.raises(requests.ReadTimeout):
+        http.post_json('http://127.0.0.1:1/v2/file/create', {}, policy=API_WRITE_RETRY)
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize('status', [429, 503])
+def test_post_json_retries_injected_errors(status):
+    policy = RetryPolicy(max_retries=20, base_delay=0)
+    with MockDriveServer(error_rate=0.3, error_status=status, seed=1) as server:
+        http = HttpSession()
+        for _ in range(20):
+            res = http.post_json(server.base_api + 'file/list', {'parent_file_id': 'root'},
+                                 policy=policy, endpoint='file/list')
+            assert 'code' not in res
+    retries = http.metrics.snapshot()['endpoints']['file/list']['retries']
+    assert retries > 0
+    assert server.calls['/v2/file/list'] == 20 + retries
+    assert http.api_limiter.limit < http.api_limiter.max_limit
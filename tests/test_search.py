@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from aliyundrive.api import AliyunDriveApi
+
+build_search_query = AliyunDriveApi.build_search_query
+
+
+def test_build_search_query():
+    assert build_search_query('report') == 'name match "report"'
+    assert build_search_query('a', file_type='file', min_size=10, max_size=20, extension='.mp4') == \
+        'name match "a" and type = "file" and size >= 10 and size <= 20 and file_extension = "mp4"'
+    assert build_search_query(updated_after='2024-01-01T00:00:00', updated_before='2024-02-01T00:00:00') == \
+        'updated_at >= "2024-01-01T00:00:00" and updated_at <= "2024-02-01T00:00:00"'
+    assert build_search_query() == ''
+
+
+def test_build_search_query_escapes_quotes():
+    assert build_search_query('say "hi" \\') == 'name match "say \\"hi\\" \\\\"'
+
+
+def test_search_pages_through_results(server, api):
+    for i in range(250):
+        server.drive.add_file('root', f'report_{i:03d}.txt', b'x')
+    server.drive.add_file('root', 'other.txt', b'x')
+    names = [item['name'] for item in api.search_file('report')]
+    assert sorted(names) == [f'report_{i:03d}.txt' for i in range(250)]
+    assert server.calls['/v2/file/search'] == 3
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from aliyundrive.sync import DriveSync, scan_local
+
+
+def write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+def ops(plan):
+    return {(action.op, action.path, action.reason) for action in plan}
+
+
+def remote_tree(server, folder_id, prefix=''):
+    tree = {}
+    for entry in server.drive.list(folder_id):
+        path = prefix + entry['name']
+        if entry['type'] == 'folder':
+            tree[path + '/'] = None
+            tree.update(remote_tree(server, entry['file_id'], path + '/'))
+        else:
+            tree[path] = server.drive.blobs[entry['file_id']]
+    return tree
+
+
+def seed_remote(server):
+    drive = server.drive
+    root = drive.add_folder('root', 'sync')
+    drive.add_file(root['file_id'], 'same.txt', b'same')
+    drive.add_file(root['file_id'], 'changed.txt', b'old')
+    drive.add_file(root['file_id'], 'remote_only.txt', b'remote')
+    old = drive.add_folder(root['file_id'], 'old')
+    drive.add_file(old['file_id'], 'inner.txt', b'inner')
+    docs = drive.add_folder(root['file_id'], 'docs')
+    drive.add_file(docs['file_id'], 'readme.md', b'readme')
+    drive.add_folder(root['file_id'], 'empty')
+    return root
+
+
+def seed_local(root):
+    write(root / 'same.txt', b'same')
+    write(root / 'changed.txt', b'new')
+    write(root / 'local_only.txt', b'local')
+    write(root / 'docs' / 'readme.md', b'readme')
+    write(root / 'docs' / 'guide.md', b'guide')
+    write(root / 'stale' / 'leftover.txt', b'leftover')
+    (root / 'local_empty').mkdir()
+
+
+def test_plan_push_with_delete(server, api, tmp_path):
+    seed_remote(server)
+    seed_local(tmp_path / 'local')
+    plan = DriveSync(api).plan_push(str(tmp_path / 'local'), 'sync', delete=True)
+    assert ops(plan) == {
+        ('skip', 'same.txt', 'unchanged'),
+        ('skip', 'docs/readme.md', 'unchanged'),
+        ('upload', 'changed.txt', 'changed'),
+        ('upload', 'local_only.txt', 'new'),
+        ('upload', 'docs/guide.md', 'new'),
+        ('upload', 'stale/leftover.txt', 'new'),
+        ('mkdir_remote', 'stale', 'new'),
+        ('mkdir_remote', 'local_empty', 'new'),
+        ('delete_remote', 'remote_only.txt', 'deleted'),
+        ('delete_remote', 'empty', 'deleted'),
+        # 文件夹下的文件随文件夹一起删除, 不单独列出
+        ('delete_remote', 'old', 'deleted'),
+    }
+    plan = DriveSync(api).plan_push(str(tmp_path / 'local'), 'sync')
+    assert {action.op for action in plan} == {'skip', 'upload', 'mkdir_remote'}
+
+
+def test_apply_push_makes_remote_match_local(server, api, tmp_path):
+    root = seed_remote(server)
+    seed_local(tmp_path / 'local')
+    syncer = DriveSync(api)
+    results = syncer.apply(syncer.plan_push(str(tmp_path / 'local'), 'sync', delete=True), remote_root='sync')
+    assert all(result.success for result in results), [result.error for result in results if not result.success]
+    assert remote_tree(server, root['file_id']) == {
+        'changed.txt': b'new',
+        'docs/': None,
+        'docs/guide.md': b'guide',
+        'docs/readme.md': b'readme',
+        'local_empty/': None,
+        'local_only.txt': b'local',
+        'same.txt': b'same',
+        'stale/': None,
+        'stale/leftover.txt': b'leftover',
+    }
+    assert {action.op for action in syncer.plan_push(str(tmp_path / 'local'), 'sync', delete=True)} == {'skip'}
+
+
+def test_plan_pull_with_delete(server, api, tmp_path):
+    seed_remote(server)
+    seed_local(tmp_path / 'local')
+    plan = DriveSync(api).plan_pull('sync', str(tmp_path / 'local'), delete=True)
+    assert ops(plan) == {
+        ('mkdir', 'old', 'new'),
+        ('mkdir', 'empty', 'new'),
+        ('skip', 'same.txt', 'unchanged'),
+        ('skip', 'docs/readme.md', 'unchanged'),
+        ('download', 'changed.txt', 'changed'),
+        ('download', 'remote_only.txt', 'new'),
+        ('download', 'old/inner.txt', 'new'),
+        ('delete_local', 'local_only.txt', 'deleted'),
+        ('delete_local', 'docs/guide.md', 'deleted'),
+        ('delete_local', 'stale', 'deleted'),
+        ('delete_local', 'local_empty', 'deleted'),
+    }
+
+
+def test_apply_pull_makes_local_match_remote(server, api, tmp_path):
+    seed_remote(server)
+    local = tmp_path / 'local'
+    seed_local(local)
+    syncer = DriveSync(api)
+    results = syncer.apply(syncer.plan_pull('sync', str(local), delete=True))
+    assert all(result.success for result in results), [result.error for result in results if not result.success]
+    tree = {path.relative_to(local).as_posix(): path.read_bytes() if path.is_file() else None
+            for path in local.rglob('*')}
+    assert tree == {
+        'changed.txt': b'old',
+        'docs': None,
+        'docs/readme.md': b'readme',
+        'empty': None,
+        'old': None,
+        'old/inner.txt': b'inner',
+        'remote_only.txt': b'remote',
+        'same.txt': b'same',
+    }
+
+
+@pytest.mark.parametrize('direction', ['push', 'pull'])
+def test_listing_error_aborts_plan(server, api, tmp_path, fail_listing, direction):
+    root = seed_remote(server)
+    local = tmp_path / 'local'
+    seed_local(local)
+    docs = next(entry for entry in server.drive.list(root['file_id']) if entry['name'] == 'docs')
+    fail_listing(docs['file_id'])
+    syncer = DriveSync(api)
+    # 清单不完整时不能生成计划, 否则 docs 下的文件会被当作已删除
+    with pytest.raises(RuntimeError):
+        if direction == 'push':
+            syncer.plan_push(str(local), 'sync', delete=True)
+        else:
+            syncer.plan_pull('sync', str(local), delete=True)
+    assert (local / 'docs' / 'guide.md').read_bytes() == b'guide'
+
+
+def test_scan_local_does_not_follow_directory_symlinks(tmp_path):
+    write(tmp_path / 'docs' / 'a.txt', b'a')
+    (tmp_path / 'docs' / 'loop').symlink_to(tmp_path, target_is_directory=True)
+    files, dirs = scan_local(str(tmp_path))
+    assert sorted(files) == ['docs/a.txt']
+    assert dirs == {'docs'}
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+
+
+def test_concurrent_get_token_refreshes_once(server, api):
+    server.latency = 0.05
+    manager = api.token_manager
+    manager.expires_at = time.time()
+    barrier = threading.Barrier(8)
+    tokens = []
+
+    def worker():
+        barrier.wait()
+        tokens.append(manager.get_token())
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert server.calls['/token/refresh'] == 1
+    assert set(tokens) == {manager.access_token}
+    assert manager.access_token != 'test'
+
+
+def test_expired_token_refreshes_once(server, api):
+    server.latency = 0.05
+    manager = api.token_manager
+    stale = manager.get_token()
+    before = server.calls.get('/token/refresh', 0)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(manager.refresh(stale))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(results)
+    assert server.calls['/token/refresh'] == before + 1
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+
+import pytest
+import requests
+
+from aliyundrive.upload import MultipartUploader
+
+PART_SIZE = 256 * 1024
+
+
+def uploaded_files(server):
+    return {entry['name']: server.drive.blobs.get(file_id)
+            for file_id, entry in server.drive.files.items() if entry['type'] == 'file'}
+
+
+def test_multipart_upload(server, make_api, tmp_path):
+    data = os.urandom(4 * PART_SIZE + 5)
+    path = tmp_path / 'a.bin'
+    path.write_bytes(data)
+    res = make_api(part_size=PART_SIZE).upload_file(str(path))
+    assert res['content_hash'] == hashlib.sha1(data).hexdigest().upper()
+    assert uploaded_files(server) == {'a.bin': data}
+    assert server.calls['upload'] == 5
+
+
+def test_rapid_upload_sends_no_parts(server, api, tmp_path):
+    data = os.urandom(PART_SIZE)
+    server.drive.add_file('root', 'existing.bin', data)
+    path = tmp_path / 'a.bin'
+    path.write_bytes(data)
+    assert api.upload_file(str(path)) is True
+    assert 'upload' not in server.calls
+    assert uploaded_files(server)['a.bin'] == data
+
+
+def test_pre_hash_match_falls_back_to_full_hash(server, api, tmp_path):
+    head = os.urandom(1024)
+    server.drive.add_file('root', 'existing.bin', head + os.urandom(PART_SIZE))
+    data = head + os.urandom(PART_SIZE)
+    path = tmp_path / 'a.bin'
+    path.write_bytes(data)
+    api.upload_file(str(path))
+    # pre_hash 相同但内容不同: 先探测, 再带 content_hash 创建, 不能秒传
+    assert server.calls['/v2/file/create'] == 2
+    assert server.calls['upload'] == 1
+    assert uploaded_files(server)['a.bin'] == data
+
+
+def test_pre_hash_miss_creates_file_once(server, api, tmp_path):
+    path = tmp_path / 'a.bin'
+    path.write_bytes(os.urandom(PART_SIZE))
+    api.upload_file(str(path))
+    assert server.calls['/v2/file/create'] == 1
+
+
+def test_resume_upload_sends_only_missing_parts(server, make_api, tmp_path, monkeypatch):
+    data = os.urandom(4 * PART_SIZE)
+    path = tmp_path / 'a.bin'
+    path.write_bytes(data)
+    upload_part = MultipartUploader._upload_part
+    interrupted = [True]
+
+    def failing_upload_part(self, filepath, file_id, upload_id, part, *args):
+        if interrupted[0] and part['part_number'] == 3:
+            raise requests.ConnectionError('interrupted')
+        return upload_part(self, filepath, file_id, upload_id, part, *args)
+
+    monkeypatch.setattr(MultipartUploader, '_upload_part', failing_upload_part)
+    with pytest.raises(requests.ConnectionError):
+        make_api(part_size=PART_SIZE, upload_workers=1).upload_file(str(path))
+    (upload,) = server.drive.uploads.values()
+    received = set(upload['parts'])
+    assert 3 not in received and {1, 2} <= received
+
+    interrupted[0] = False
+    puts_before = server.calls['upload']
+    # 续传使用记录中的分片大小, 与当前客户端的设置无关
+    res = make_api(upload_workers=1).upload_file(str(path))
+    assert server.calls['/v2/file/list_uploaded_parts'] == 1
+    assert server.calls['upload'] - puts_before == 4 - len(received)
+    assert res['content_hash'] == hashlib.sha1(data).hexdigest().upper()
+    assert uploaded_files(server) == {'a.bin': data}
+
+
+def test_folder_upload_skips_unreadable_dirs_and_symlinks(server, api, tmp_path, monkeypatch):
+    root = tmp_path / 'photos'
+    (root / 'locked').mkdir(parents=True)
+    (root / 'a.txt').write_bytes(b'a')
+    (root / 'locked' / 'b.txt').write_bytes(b'b')
+    (root / 'loop').symlink_to(root, target_is_directory=True)
+
+    scandir = os.scandir
+
+    def failing_scandir(path):
+        if os.path.basename(path) == 'locked':
+            raise PermissionError(13, 'Permission denied', path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, 'scandir', failing_scandir)
+    results = api.upload_folders(str(root))
+    assert sorted((os.path.basename(r.path), r.parent, r.success) for r in results) == [
+        ('a.txt', 'photos', True),
+        ('locked', 'photos/locked', False),
+    ]
+    assert uploaded_files(server) == {'a.txt': b'a'}